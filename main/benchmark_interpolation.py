@@ -0,0 +1,107 @@
+import os
+import time as tm
+
+import numpy as np
+import pandas as pd
+
+import alert
+import rads_extraction
+import tec_interpolation
+from directory_paths import project_dir
+
+# compares the vectorized gathers of tec_interpolation (TEC lookup in tec_kriging and
+# index_to_geo) against the element-by-element np.append loops they replaced, which
+# copy the whole array for every element (quadratic in the number of points)
+sizes   = [100, 1000, 10000, 30000]
+repeats = 3
+
+def append_tec(gim_matrix, x_array, y_array):
+    z_array = np.array([])
+    for i in range(len(x_array)):
+        x = x_array[i] % 360
+        z_array = np.append(z_array, gim_matrix[y_array[i], x])
+    return z_array
+
+def append_index_to_geo(x, y):
+    lon, lat = np.array([]), np.array([])
+    for xi in x:
+        lon = np.append(lon, xi + 180.5 if xi <= 179.5 else xi - 179.5)
+    for yi in y:
+        lat = np.append(lat, -yi + 89.5)
+    return lon, lat
+
+def best_time(function, *args):
+    runtimes = []
+    for _ in range(repeats):
+        start = tm.perf_counter()
+        result = function(*args)
+        runtimes.append(tm.perf_counter() - start)
+    return min(runtimes), result
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    gim_matrix = rng.uniform(0, 100, (180, 360))
+
+    rows = []
+    for size in sizes:
+        # points as in tec_kriging: longitudes in [-180, 180), latitudes in [-90, 90)
+        lon = rng.uniform(-180, 180, size)
+        lat = rng.uniform(-90, 90, size)
+        x_array = (179.5 + lon).astype(int)
+        y_array = abs(lat - 89.5).astype(int)
+
+        alert.print_status(f'Start benchmark ({size} points)')
+        t_append, z_append = best_time(append_tec, gim_matrix, x_array, y_array)
+        t_gather, z_gather = best_time(lambda: np.array(tec_interpolation.tec(gim_matrix, x_array, y_array), dtype=float))
+        assert np.array_equal(z_append, z_gather), 'TEC lookups do not match'
+        rows.append(['tec lookup', size, t_append, t_gather, t_append / t_gather])
+
+        t_append, geo_append = best_time(append_index_to_geo, x_array, y_array)
+        t_gather, geo_gather = best_time(tec_interpolation.index_to_geo, x_array, y_array)
+        assert all(np.array_equal(a, b) for a, b in zip(geo_append, geo_gather)), 'Coordinates do not match'
+        rows.append(['index_to_geo', size, t_append, t_gather, t_append / t_gather])
+
+    # the runtime per point of the append loops grows with the number of points
+    df_tab = pd.DataFrame(rows, columns=['Path', 'Points', 'Append (s)', 'Gather (s)', 'Speed-up'])
+    df_tab['Append per point (us)'] = df_tab['Append (s)'] / df_tab['Points'] * 1e6
+    df_tab['Gather per point (us)'] = df_tab['Gather (s)'] / df_tab['Points'] * 1e6
+    print(df_tab.to_string())
+
+    # compares the throughput of the batched kriging engine (batch_kriging) against kriging
+    # every point with pykrige (tec_kriging), on the points of the bundled RADS passes. Both
+    # use the same variogram, so their estimates must match
+    files    = ['c2_240122.asc', 'j3_240122.asc', 's3a_240122.asc']
+    data_dir = os.path.join(project_dir, 'RADS', '03_22_01_data')
+    pass_n   = 2
+    n_points = 200 # points per pass, pykrige takes tens of milliseconds per point
+    radius, max_points = 500, 300
+    variogram_parameters = [30.0, 1500.0, 0.1]
+
+    rows = []
+    for file in files:
+        extraction = rads_extraction.extract_rads(os.path.join(data_dir, file), pass_n=pass_n, as_seconds=True)
+        step = max(1, extraction.size // n_points)
+        lon, lat = extraction.lon[::step], extraction.lat[::step]
+
+        alert.print_status(f'Start kriging benchmark ({file}, {lon.size} points)')
+        tec_interpolation.variogram_cache.clear()
+        for i in range(lon.size):
+            key = tec_interpolation.variogram_key('benchmark', lat[i], 180, 75, radius, max_points, 'nearest')
+            tec_interpolation.variogram_cache.put(key, variogram_parameters)
+
+        def point_kriging():
+            return np.array([tec_interpolation.tec_kriging(gim_matrix, lon[i], lat[i], radius=radius, max_points=max_points,
+                                                           selection='nearest', variogram_band=180, 
+                                                           gim_key='benchmark')[0] for i in range(lon.size)])
+
+        t_point, z_point = best_time(point_kriging)
+        t_batch, z_batch = best_time(tec_interpolation.batch_kriging, gim_matrix, lon, lat, variogram_parameters, 
+                                     75, radius, max_points)
+        assert np.allclose(z_point, z_batch, rtol=0, atol=1e-6), 'Kriging estimates do not match'
+        rows.append([file, lon.size, t_point, t_batch, t_point / t_batch, lon.size / t_point, lon.size / t_batch])
+
+    df_tab = pd.DataFrame(rows, columns=['File', 'Points', 'tec_kriging (s)', 'batch_kriging (s)', 'Speed-up',
+                                         'tec_kriging (points/s)', 'batch_kriging (points/s)'])
+    print(df_tab.to_string())
+
+    alert.print_status('Program Complete')
@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# default of the bounds that are not changed by LRUCache.resize
+unchanged = object()
+
+
+def nbytes(value)->int:
+    ''' Function to estimate the memory (in bytes) held by a cached value. '''
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    elif isinstance(value, (tuple, list)):
+        return sum(nbytes(v) for v in value)
+    else:
+        return 64
+
+
+class LRUCache:
+    '''
+    Least-recently-used cache, bounded by the number of entries and/or by the
+    memory held by the stored values. When a bound is exceeded, the entries
+    that were used the longest time ago are evicted first. The cache can be
+    shared between threads.
+
+    Parameters
+    ----------
+    max_entries: INT (default: None)
+        Maximum number of entries. None means no limit.
+    max_bytes: INT (default: None)
+        Maximum memory of the stored values, in bytes (see nbytes). None means
+        no limit.
+    '''
+
+    def __init__(self, max_entries:int=None, max_bytes:int=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        ''' Return the value stored under key (or default), marking it as recently used. '''
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key][0]
+
+    def put(self, key, value)->None:
+        ''' Store value under key, evicting the least recently used entries if needed. '''
+        size = nbytes(value)
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self.nbytes += size
+            self._evict()
+
+    def resize(self, max_entries:int=unchanged, max_bytes:int=unchanged)->None:
+        ''' Change the bounds of the cache that are given (None for no limit), evicting entries if needed. '''
+        with self._lock:
+            if max_entries is not unchanged:
+                self.max_entries = max_entries
+            if max_bytes is not unchanged:
+                self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self)->None:
+        ''' Remove all entries from the cache. '''
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def _evict(self):
+        while self._data and ((self.max_entries is not None and len(self._data) > self.max_entries) or
+                              (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            self.nbytes -= self._data.popitem(last=False)[1][1]
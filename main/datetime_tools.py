@@ -4,8 +4,11 @@ import datetime as dt
 
 import numpy as np
     
-# initialise days of month
-months = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+# initialise days of month (of a non-leap year, see days_in_month)
+months = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# reference of the times in seconds, as numpy.datetime64
+epoch_1985 = np.datetime64('1985-01-01T00:00:00', 'us')
 
 def get_time_date(seconds_since_1985:float)->str:
     '''
@@ -60,8 +63,7 @@ def get_sec_since_1985(date:list)->float:
     init_date = dt.datetime(1985, 1, 1)
 
     if type(date) is list:
-        date.reverse()
-        date = dt.datetime(*date)
+        date = dt.datetime(*date[::-1])
 
     time_since = date - init_date
     seconds = int(time_since.total_seconds())
@@ -77,13 +79,20 @@ def isleap(year:int)->bool:
     else:           # Julian Calendar
         return (year % 4 == 0)
 
+def days_in_month(year:int)->list:
+    '''
+    Function to get the number of days of every month of a year
+    '''
+    days = list(months)
+    if isleap(year):
+        days[1] = 29
+    return days
+
 def get_day_num(date:list)->int:
     '''
     Function to get the number of days since the first of January of that year
     ''' 
-
-    if isleap(date[-1]):
-        months[1] = 29
+    months = days_in_month(date[-1])
 
     day = 0
     for i in range(date[1]-1):
@@ -96,8 +105,7 @@ def inv_day_number(day:int, year:int):
     '''
     Function to get the date from the day number of the year
     '''
-
-    if isleap(year): months[1] = 29
+    months = days_in_month(year)
 
     for i in range(len(months)):
         if day > 0:
@@ -122,6 +130,45 @@ def get_next_day(date:list)->list:
     
     return new_date
 
+# ----------- array versions, for times in seconds since 00:00:00 01/01/1985 -----------
+
+def get_datetime64(seconds)->np.ndarray:
+    '''
+    Function to convert times in seconds since 00:00:00 01/01/1985 to 
+    numpy.datetime64 (with microsecond resolution, as get_time_date). Raises a 
+    ValueError for times that are NaN or infinite, which have no date (as in 
+    get_time_date), instead of converting them to NaT.
+    '''
+    seconds = np.asarray(seconds, dtype=np.float64)
+    if not np.isfinite(seconds).all():
+        raise ValueError(f'{np.count_nonzero(~np.isfinite(seconds))} time(s) are not finite')
+    return epoch_1985 + np.round(seconds * 1e6).astype('timedelta64[us]')
+
+def get_dates(seconds)->tuple:
+    '''
+    Function to get the dates of times in seconds since 00:00:00 01/01/1985.
+
+    Returns
+    -------
+    (day, month, year)
+        Integer arrays with the day of the month, month and year.
+    '''
+    days = get_datetime64(seconds).astype('datetime64[D]')
+    years = days.astype('datetime64[Y]')
+    month_starts = days.astype('datetime64[M]')
+    day = (days - month_starts).astype(int) + 1
+    month = (month_starts - years).astype(int) + 1
+    year = years.astype(int) + 1970
+    return day, month, year
+
+def get_time_dates(seconds)->list:
+    '''
+    Function to get the time dates, in the form 'hh:mm:ss DD/MM/YYYY', of many 
+    times in seconds since 00:00:00 01/01/1985 (array version of get_time_date).
+    '''
+    iso = np.datetime_as_string(get_datetime64(seconds), unit='s')
+    return [f'{t[11:19]} {t[8:10]}/{t[5:7]}/{t[:4]}' for t in iso.tolist()]
+
 
 if __name__ == '__main__':
     test = '2024-01-22 02:11:21'
@@ -12,8 +12,17 @@ temp_dir = project_dir + '/temp/'
 # result directory
 res_dir = project_dir + '/results/'
 
+# GIM file cache directory (see gim_tools.fetch_GIM_files)
+gim_dir = project_dir + '/gim_cache/'
+
+# binary cache of the parsed RADS files (see rads_extraction.load_asc)
+rads_cache_dir = project_dir + '/rads_cache/'
+
+# GIM store directory (see gim_store.py)
+store_dir = project_dir + '/gim_store/'
+
 # directory list
-dir_lst = [plot_dir, temp_dir, res_dir]
+dir_lst = [plot_dir, temp_dir, res_dir, gim_dir, store_dir, rads_cache_dir]
 
 for idir in dir_lst:
     if not os.path.exists(idir):
@@ -0,0 +1,229 @@
+# An Extraction holds the RADS measurements of a satellite (see rads_extraction.
+# extract_rads) as contiguous columns: times, latitudes, longitudes and sea level
+# anomalies. Rows are never deleted: filtering an extraction returns a new one that
+# shares the columns and carries a validity mask, and the columns are only gathered
+# (or, for the time strings, computed) when a stage reads them. For compatibility
+# with the list [time, lat, lon, sla] used before, an extraction can be unpacked and
+# indexed like that list.
+
+import numpy as np
+
+import datetime_tools as dt_extra
+
+columns = ('time', 'lat', 'lon', 'sla')
+
+
+class Extraction:
+    '''
+    Columnar extraction of satellite measurements.
+
+    Parameters
+    ----------
+    lat, lon, sla: np.ndarray
+        Latitude, longitude and sea level anomaly of the measurements.
+    seconds: np.ndarray (default: None)
+        Times in seconds since 00:00:00 01/01/1985.
+    time_str: np.ndarray or CALLABLE (default: None)
+        Times as 'hh:mm:ss DD/MM/YYYY'. If None, they are computed from the seconds
+        when they are first read. A callable is called (once) at that moment instead.
+    as_seconds: BOOL (default: False)
+        Unpack the times as seconds instead of time strings, see the time property.
+    valid: np.ndarray (default: None)
+        Mask of the valid rows. None means all rows are valid.
+
+    Notes
+    -----
+    - At least one of seconds and time_str must be given.
+    - The columns of an extraction are never written in place: every filter returns
+      a new extraction, and item assignment (see __setitem__) replaces the column.
+    '''
+    __slots__ = ('_lat', '_lon', '_sla', '_seconds', '_time_str', 'as_seconds', 'valid', '_gathered')
+
+    def __init__(self, lat, lon, sla, seconds=None, time_str=None, as_seconds:bool=False, valid=None):
+        assert seconds is not None or time_str is not None, 'Specify the times of the extraction'
+        self._lat, self._lon, self._sla = np.asarray(lat), np.asarray(lon), np.asarray(sla)
+        self._seconds = None if seconds is None else np.asarray(seconds, dtype=float)
+        self._time_str = time_str
+        self.as_seconds = as_seconds
+        self.valid = None if valid is None or np.all(valid) else np.asarray(valid, dtype=bool)
+        self._gathered = {}
+
+    @classmethod
+    def from_list(cls, extraction:list):
+        ''' Make an extraction from the list [time, lat, lon, sla], with the times as strings or seconds. '''
+        if isinstance(extraction, Extraction):
+            return extraction
+        time, lat, lon, sla = extraction
+        time = np.asarray(time)
+        if time.dtype.kind in 'iuf':
+            return cls(lat, lon, sla, seconds=time, as_seconds=True)
+        return cls(lat, lon, sla, time_str=time)
+
+    # ---------------- columns ----------------
+
+    def _column(self, name:str)->np.ndarray:
+        # the valid rows of a column, gathered once
+        if name not in self._gathered:
+            if name == 'seconds' and self._seconds is None:
+                self._seconds = np.array([dt_extra.get_sec_since_1985(dt_extra.get_datetime_obj(time))
+                                          for time in self._all_time_str().tolist()])
+            column = self._all_time_str() if name == 'time_str' else getattr(self, '_' + name)
+            self._gathered[name] = column if self.valid is None else column[self.valid]
+        return self._gathered[name]
+
+    def _all_time_str(self)->np.ndarray:
+        if self._time_str is None:
+            self._time_str = np.array(dt_extra.get_time_dates(self._seconds))
+        elif callable(self._time_str):
+            self._time_str = np.asarray(self._time_str())
+        return np.asarray(self._time_str)
+
+    @property
+    def lat(self)->np.ndarray:
+        return self._column('lat')
+
+    @property
+    def lon(self)->np.ndarray:
+        return self._column('lon')
+
+    @property
+    def sla(self)->np.ndarray:
+        return self._column('sla')
+
+    @property
+    def seconds(self)->np.ndarray:
+        ''' Times in seconds since 00:00:00 01/01/1985. '''
+        return self._column('seconds')
+
+    @property
+    def time_str(self)->np.ndarray:
+        ''' Times as 'hh:mm:ss DD/MM/YYYY'. '''
+        return self._column('time_str')
+
+    @property
+    def time(self)->np.ndarray:
+        '''
+        Times as seconds if as_seconds, else as time strings. The column is gathered 
+        once, and every read returns a read-only view of it: reading an element or the
+        length costs no copy, and callers cannot modify the column.
+        '''
+        time = (self.seconds if self.as_seconds else self.time_str).view()
+        time.flags.writeable = False
+        return time
+
+    @property
+    def size(self)->int:
+        ''' Number of valid rows. '''
+        return self._lat.size if self.valid is None else int(np.count_nonzero(self.valid))
+
+    # ---------------- list compatibility ----------------
+
+    def __iter__(self):
+        return (getattr(self, name) for name in columns)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [getattr(self, name) for name in columns[key]]
+        return getattr(self, columns[key])
+
+    def __setitem__(self, key, value):
+        '''
+        Replace a column (or, with a slice, columns) of the list [time, lat, lon, sla] 
+        by values over the valid rows. The times are taken as seconds if they are
+        numbers, else as time strings. The extraction gets its own columns, the 
+        extractions sharing them are not changed.
+        '''
+        names = columns[key] if isinstance(key, slice) else (columns[key],)
+        values = list(value) if isinstance(key, slice) else [value]
+        assert len(values) == len(names), 'The number of columns does not match'
+        values = [np.asarray(value) for value in values]
+        assert all(value.shape == (self.size,) for value in values), 'The columns do not match the valid rows'
+
+        compact = self.compact()
+        self._lat, self._lon, self._sla = compact._lat, compact._lon, compact._sla
+        self._seconds, self._time_str, self.valid = compact._seconds, compact._time_str, None
+        for name, value in zip(names, values):
+            if name != 'time':
+                setattr(self, '_' + name, value)
+            elif value.dtype.kind in 'iuf':
+                self._seconds, self._time_str = value.astype(float), None
+            else:
+                self._seconds, self._time_str = None, value
+        self._gathered = {}
+
+    def __repr__(self):
+        return f'Extraction({self.size} of {self._lat.size} rows)'
+
+    # ---------------- filters ----------------
+
+    def _new(self, rows=None, valid=None)->'Extraction':
+        # an extraction over the given physical rows of the columns (all rows if None)
+        if rows is None:
+            return Extraction(self._lat, self._lon, self._sla, seconds=self._seconds, time_str=self._time_str,
+                              as_seconds=self.as_seconds, valid=valid)
+
+        time_str = self._time_str
+        if callable(time_str):
+            time_str = None if self._seconds is not None else self._all_time_str()
+        if time_str is not None:
+            time_str = np.asarray(time_str)[rows]
+        seconds = None if self._seconds is None else self._seconds[rows]
+        return Extraction(self._lat[rows], self._lon[rows], self._sla[rows], seconds=seconds,
+                          time_str=time_str, as_seconds=self.as_seconds, valid=valid)
+
+    def _physical(self, rows:np.ndarray)->np.ndarray:
+        # the physical rows of the given valid rows
+        return rows if self.valid is None else np.flatnonzero(self.valid)[rows]
+
+    def take(self, rows)->'Extraction':
+        '''
+        Select rows of the extraction, counted over its valid rows.
+
+        Parameters
+        ----------
+        rows: SLICE, np.ndarray[BOOL] or np.ndarray[INT]
+            A slice (of an extraction without invalid rows) gives views of the columns,
+            a mask gives a new validity mask over the same columns, and indices gather
+            the rows in their order.
+
+        Returns
+        -------
+        extraction: Extraction
+        '''
+        if isinstance(rows, slice) and self.valid is None:
+            return self._new(rows)
+
+        if isinstance(rows, slice):
+            rows = np.arange(self.size)[rows]
+        rows = np.asarray(rows)
+
+        if rows.dtype == bool:
+            assert rows.size == self.size, 'The mask does not match the valid rows'
+            valid = np.zeros(self._lat.size, dtype=bool)
+            valid[self._physical(np.flatnonzero(rows))] = True
+            return self._new(valid=valid)
+
+        return self._new(self._physical(rows.astype(int)))
+
+    def drop(self, indices)->'Extraction':
+        ''' Mark rows (counted over the valid rows) as invalid, without copying the columns. '''
+        keep = np.ones(self.size, dtype=bool)
+        keep[np.asarray(indices, dtype=int)] = False
+        return self.take(keep)
+
+    def compact(self)->'Extraction':
+        ''' Gather the valid rows into new contiguous columns. '''
+        if self.valid is None:
+            return self
+        return self._new(np.flatnonzero(self.valid))
+
+
+def concatenate(extractions:list, as_seconds:bool=False)->Extraction:
+    ''' Function to concatenate the valid rows of extractions into one extraction (the time strings stay lazy). '''
+    if not extractions:
+        return Extraction(np.array([]), np.array([]), np.array([]), seconds=np.array([]), as_seconds=as_seconds)
+
+    return Extraction(np.concatenate([e.lat for e in extractions]), np.concatenate([e.lon for e in extractions]),
+                      np.concatenate([e.sla for e in extractions]), 
+                      seconds=np.concatenate([e.seconds for e in extractions]),
+                      time_str=lambda: np.concatenate([e.time_str for e in extractions]), as_seconds=as_seconds)
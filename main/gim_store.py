@@ -0,0 +1,252 @@
+# The GIM store keeps the TEC maps of many days in one contiguous file on disk
+# (tecmap.<version>.dat), as a float32 cube indexed by (epoch, lat, lon). The epochs
+# are the 15 minute timeslots since 00:00:00 01/01/1985, counted from the first day
+# in the store. A small time index (index.json) records the first day, the days
+# that have been ingested and the cube file holding them. Readers access the cube
+# through np.memmap, so no netCDF file is opened or decoded per lookup, and
+# processes reading the same store share the page cache of the operating system.
+# Days that readers can see are never written in place: such changes go to a new
+# version of the cube, which becomes visible when the index is switched to it.
+
+import os
+import re
+import glob
+import json
+import datetime as dt
+
+import numpy as np
+import netCDF4 as nc
+
+from directory_paths import gim_dir, store_dir
+
+epochs_per_day = 96
+map_shape = (180, 360)
+base_date = dt.date(1985, 1, 1)
+
+# open stores, keyed by directory (with the modification time of their index)
+_stores = {}
+
+def day_number(date:list)->int:
+    ''' Function to get the number of days since 01/01/1985 from a date [DD, MM, YYYY] '''
+    return (dt.date(date[2], date[1], date[0]) - base_date).days
+
+def parse_GIM_fname(file_path:str)->list:
+    '''
+    Function to get the date [DD, MM, YYYY] of a GIM file from its filename,
+    in the form jpldDOY0.YYi.nc (see gim_tools.construct_url).
+    '''
+    fname = os.path.split(file_path)[-1]
+    match = re.match(r'^[a-z]{4}(\d{3})0\.(\d{2})i\.nc$', fname)
+    if match is None:
+        raise ValueError(f'Not a GIM filename: {fname}')
+
+    doy, yy = int(match.group(1)), int(match.group(2))
+    year = 1900 + yy if yy >= 85 else 2000 + yy
+    date = base_date.replace(year=year) + dt.timedelta(days=doy-1)
+    return [date.day, date.month, date.year]
+
+def read_index(store_dir:str=store_dir)->dict:
+    ''' Function to read the time index of a store, None if the store does not exist. '''
+    index_path = os.path.join(store_dir, 'index.json')
+    if not os.path.isfile(index_path):
+        return None
+    with open(index_path, 'r') as f:
+        return json.load(f)
+
+def read_tecmap(file_path:str, n_epochs:int=None)->np.ndarray:
+    '''
+    Function to read the TEC maps of a GIM (netCDF4) file as float32, with NaN
+    where they are masked. Both the store and gim_tools.get_GIM_cube read them so.
+    '''
+    ds = nc.Dataset(file_path)
+    try:
+        tecmap = ds['tecmap'][:n_epochs]
+    finally:
+        ds.close()
+    return np.ma.filled(np.ma.asarray(tecmap, dtype=np.float32), np.nan)
+
+def cube_name(index:dict)->str:
+    ''' Function to get the filename of the cube of a store (stores from before the versions use tecmap.dat). '''
+    return index.get('cube', 'tecmap.dat')
+
+def write_index(index:dict, store_dir:str=store_dir)->None:
+    ''' Function to replace the time index of a store atomically. '''
+    tmp_path = os.path.join(store_dir, 'index.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(store_dir, 'index.json'))
+
+def remove_old_cubes(index:dict, store_dir:str=store_dir)->None:
+    ''' Function to remove the cube files that the index no longer refers to. '''
+    for cube_path in glob.glob(os.path.join(store_dir, 'tecmap*.dat')):
+        if os.path.split(cube_path)[-1] != cube_name(index):
+            try:
+                os.remove(cube_path)
+            except OSError:
+                # still mapped by a reader (Windows), removed by a later build
+                pass
+
+def build_store(file_paths:list, store_dir:str=store_dir)->dict:
+    '''
+    Function to ingest GIM files (jpld*.nc) into the store. Days that are already
+    in the store are overwritten. The cube grows if the files lie outside the range
+    of days in the store; days in between that were never ingested are kept as NaN.
+
+    Parameters
+    ----------
+    file_paths: LIST[STR]
+        Paths of the GIM (netCDF4) files.
+    store_dir: STR
+        Directory of the store. By default, directory_paths.store_dir.
+
+    Returns
+    -------
+    index: DICT
+        The time index of the store, with the first day ('start_day', in days
+        since 01/01/1985), the number of days in the cube ('n_days'), the
+        ingested days ('days'), and the file of the cube ('cube', with its
+        'version').
+
+    Notes
+    -----
+    - Only one process should build the store at a time, readers can keep on
+      reading while it is built.
+    - New days inside or after the range of the cube are written to the current
+      cube (readers do not see them until the index lists them). If the cube must
+      grow at the front, or days that are in the store are overwritten, the cube
+      is copied to a new version instead, and the index is switched to it last.
+    '''
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    os.makedirs(store_dir, exist_ok=True)
+
+    days = {day_number(parse_GIM_fname(file_path)): file_path for file_path in file_paths}
+
+    index = read_index(store_dir)
+    if index is None:
+        index = {'start_day': min(days), 'n_days': 0, 'days': [], 'version': 0}
+
+    start_day = min(index['start_day'], min(days))
+    end_day   = max(index['start_day'] + index['n_days'], max(days) + 1)
+    shape     = ((end_day - start_day) * epochs_per_day, *map_shape)
+    cube_path = os.path.join(store_dir, cube_name(index))
+    version   = index.get('version', 0)
+
+    in_place = (index['n_days'] > 0 and start_day == index['start_day'] and os.path.isfile(cube_path)
+                and not set(days) & set(index['days']))
+    if in_place and end_day > index['start_day'] + index['n_days']:
+        # the cube grows at the back, beyond the part that readers map
+        try:
+            with open(cube_path, 'r+b') as f:
+                f.truncate(int(np.prod(shape)) * 4)
+            cube = np.memmap(cube_path, dtype=np.float32, mode='r+', shape=shape)
+            cube[index['n_days'] * epochs_per_day:] = np.nan
+            cube.flush()
+            del cube
+        except OSError:
+            # the file cannot be resized while it is mapped (Windows)
+            in_place = False
+
+    if not in_place:
+        # write a new version of the cube, with the days of the current one
+        version += 1
+        cube_path = os.path.join(store_dir, f'tecmap.{version}.dat')
+        cube = np.memmap(cube_path, dtype=np.float32, mode='w+', shape=shape)
+        cube[:] = np.nan
+        if index['n_days'] > 0:
+            old = np.memmap(os.path.join(store_dir, cube_name(index)), dtype=np.float32, mode='r',
+                            shape=(index['n_days'] * epochs_per_day, *map_shape))
+            offset = (index['start_day'] - start_day) * epochs_per_day
+            cube[offset:offset+old.shape[0]] = old
+            del old
+        cube.flush()
+        del cube
+
+    cube = np.memmap(cube_path, dtype=np.float32, mode='r+', shape=shape)
+
+    for day, file_path in sorted(days.items()):
+        tecmap = read_tecmap(file_path, epochs_per_day)
+        e0 = (day - start_day) * epochs_per_day
+        cube[e0:e0+tecmap.shape[0]] = tecmap
+        print(f'Ingested {os.path.split(file_path)[-1]} into the GIM store')
+
+    cube.flush()
+    del cube
+
+    # the index is switched last (and atomically), so readers only see complete days
+    index = {'start_day': int(start_day), 'n_days': int(end_day - start_day),
+             'days': sorted(set(index['days']) | set(int(day) for day in days)),
+             'version': version, 'cube': os.path.split(cube_path)[-1]}
+    write_index(index, store_dir)
+    remove_old_cubes(index, store_dir)
+
+    return index
+
+def open_store(store_dir:str=store_dir)->tuple:
+    '''
+    Function to open the store for reading. The store is memory-mapped once per
+    process, and reopened when its index changes.
+
+    Returns
+    -------
+    (cube, index)
+        cube: np.memmap
+            Read-only cube with shape (epochs, 180, 360).
+        index: DICT
+            Time index of the store, see build_store.
+        Both are None if the store does not exist.
+    '''
+    index_path = os.path.join(store_dir, 'index.json')
+    if not os.path.isfile(index_path):
+        return None, None
+
+    mtime = os.stat(index_path).st_mtime_ns
+    if store_dir not in _stores or _stores[store_dir][0] != mtime:
+        while True:
+            index = read_index(store_dir)
+            try:
+                cube = np.memmap(os.path.join(store_dir, cube_name(index)), dtype=np.float32, mode='r',
+                                 shape=(index['n_days'] * epochs_per_day, *map_shape))
+                break
+            except FileNotFoundError:
+                # retry if the index was switched to a new cube (and the old one removed) meanwhile
+                if os.stat(index_path).st_mtime_ns == mtime:
+                    raise
+                mtime = os.stat(index_path).st_mtime_ns
+        index['days'] = set(index['days'])
+        _stores[store_dir] = (mtime, cube, index)
+
+    return _stores[store_dir][1:]
+
+def read_day(date:list, store_dir:str=store_dir)->np.ndarray:
+    '''
+    Function to read the TEC maps of a day from the store, without copying them.
+
+    Parameters
+    ----------
+    date: LIST
+        Date in the form [DD, MM, YYYY]
+    store_dir: STR
+        Directory of the store. By default, directory_paths.store_dir.
+
+    Returns
+    -------
+    cube: np.memmap
+        View with the 96 maps of the day, followed by the map of 00.00 of the
+        next day if that day is in the store too (97 maps). None if the day is
+        not in the store.
+    '''
+    cube, index = open_store(store_dir)
+    day = day_number(date)
+    if cube is None or day not in index['days']:
+        return None
+
+    e0 = (day - index['start_day']) * epochs_per_day
+    n_epochs = epochs_per_day + 1 if day + 1 in index['days'] else epochs_per_day
+    return cube[e0:e0+n_epochs]
+
+
+if __name__ == '__main__':
+    # ingest all cached GIM files into the store
+    index = build_store(sorted(glob.glob(os.path.join(gim_dir, '**', '*.nc'), recursive=True)))
+    print(f"GIM store holds {len(index['days'])} days")
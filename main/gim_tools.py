@@ -1,17 +1,49 @@
 import os
 import re
+import time as tm
+import json
+import hashlib
 import gzip
+import zlib
 import shutil
+import tempfile
+import threading
+import uuid
 import requests
 from typing import List
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap
-import netCDF4 as nc
 
-from directory_paths import project_dir, temp_dir, plot_dir, illegal_char
+from directory_paths import project_dir, temp_dir, gim_dir, plot_dir, illegal_char
 import datetime_tools as dt_extra
+import cache_tools
+import gim_store
+
+# daily GIM cubes (all TEC maps of a day), bounded in memory 
+# (use gim_cache.resize to change the bound)
+gim_cache = cache_tools.LRUCache(max_bytes=1024*2**20)
+
+# base url of the JPL GIM files
+gim_url = r'https://sideshow.jpl.nasa.gov/pub/iono_daily/gim_for_research/'
+
+# pooled http session for the downloads, created on first use
+_session = None
+_session_lock = threading.Lock()
+
+# size bound of the GIM file cache (gim_dir), enforced by evict_GIM_files
+gim_dir_max_bytes = 10*2**30
+
+# GIM file caches that files were downloaded into since they were last trimmed (see get_GIM)
+_grown_dirs = set()
+
+# age (in seconds) after which a lock on a GIM file is considered stale
+stale_lock_age = 600
 
 
 def get_timeslot(time:List):
@@ -61,8 +93,33 @@ def get_time(timeslot:int, rtype='str'):
         else:
             return [hours, minutes, 00]
 
-def construct_url(time_date:str, 
-                  url_base:str=r'https://sideshow.jpl.nasa.gov/pub/iono_daily/gim_for_research/')->str:
+def get_epochs(seconds)->tuple:
+    '''
+    Function to find the GIM epochs bracketing many times at once. Vectorized 
+    counterpart of get_timeslot, for times in seconds since 00:00:00 01/01/1985.
+
+    Parameters
+    ----------
+    seconds: np.ndarray
+        Times in seconds since 00:00:00 01/01/1985.
+
+    Returns
+    -------
+    (days, timeslots, weights)
+        days: np.ndarray
+            Day of the times, in days since 01/01/1985.
+        timeslots: np.ndarray
+            Timeslot of the GIM map before (or at) the times, in the day (0-95).
+        weights: np.ndarray
+            Linear interpolation weight of the GIM map after the times, 0 if the 
+            time matches the timeslot exactly.
+    '''
+    days, seconds_of_day = np.divmod(np.asarray(seconds, dtype=np.float64), 86400)
+    timeslots = np.minimum(seconds_of_day // 900, 95)
+    weights = (seconds_of_day - 900*timeslots) / 900
+    return days.astype(np.int64), timeslots.astype(np.int64), weights
+
+def construct_url(time_date:str, url_base:str=gim_url)->str:
     '''
     Function to build the url to download file. URL is in the form:
     https://sideshow.jpl.nasa.gov/pub/iono_daily/gim_for_research/jpld/YYYY/jpldDOY0.YYi.nc.gz
@@ -97,7 +154,26 @@ def construct_url(time_date:str,
 
     return f'{url_base}/{date[2]}/{fname}'
 
-def download_file(url:str, save_dir:str=temp_dir, unzip:bool=False)->None:
+def get_session(pool_size:int=8, retries:int=5, backoff:float=0.5)->requests.Session:
+    '''
+    Function to get the http session used for the downloads. The session pools its
+    connections (up to pool_size per host), and retries failed requests (connection
+    errors and 429/5xx responses) up to retries times, with exponential backoff. 
+    The session is created on the first call and shared afterwards.
+    '''
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=retries, backoff_factor=backoff, 
+                          status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['GET'])
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+    return _session
+
+def download_file(url:str, save_dir:str=temp_dir, unzip:bool=False, 
+                  session:requests.Session=None, timeout:float=60, chunk_size:int=2**20)->str:
     ''' 
     Function to download a file from a url. Adapted from :
     https://realpython.com/python-download-file-from-url/#saving-downloaded-content-to-a-file
@@ -108,27 +184,228 @@ def download_file(url:str, save_dir:str=temp_dir, unzip:bool=False)->None:
         Specify url in a string
     save_dir : STR
         Specify path for the downloaded file
+    unzip : BOOL
+        Decide if the (.gz) file is decompressed while downloading (by default False)
+    session : requests.Session
+        Session used for the request. By default, the shared session (see get_session).
+    timeout : FLOAT
+        Timeout of the request, in seconds (by default 60)
+    chunk_size : INT
+        Size of the chunks in which the file is streamed, in bytes (by default 1 MiB)
 
     Returns
     -------
-    None
+    file_path: STR
+        Path of the downloaded (and decompressed) file
+
+    Notes
+    -----
+    - The response is streamed, and with unzip it is inflated chunk by chunk straight
+      into the decompressed file, so neither the whole archive is held in memory nor
+      the .gz file is written to disk.
+    - Files are first written to a temporary file in save_dir, which is renamed once 
+      complete, so that a partial download is never mistaken for a complete file.
+    - The size and checksum of the file are recorded next to it (see write_checksum).
+    - The body is stored as it is served, a Content-Encoding is not decoded.
     '''
-   
-    response = requests.get(url)
+    if session is None:
+        session = get_session()
+
+    with session.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
     
-    if "content-disposition" in response.headers:
-        content_disposition = response.headers["content-disposition"]
-        filename = content_disposition.split("filename=")[1]
-    else:
-        filename = url.split("/")[-1]
+        if "content-disposition" in response.headers:
+            content_disposition = response.headers["content-disposition"]
+            filename = content_disposition.split("filename=")[1]
+        else:
+            filename = url.split("/")[-1]
     
-    with open(os.path.join(save_dir, filename), mode="wb") as file:
-        file.write(response.content)
-
+        # 16 + MAX_WBITS: expect a gzip header and trailer
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if unzip else None
+        if unzip:
+            filename = os.path.splitext(filename)[0]
+        file_path = os.path.join(save_dir, filename)
+
+        checksum = hashlib.blake2b()
+        file = tempfile.NamedTemporaryFile(dir=save_dir, suffix='.part', delete=False)
+        try:
+            with file:
+                # the raw body: a server that marks the .gz archive with Content-Encoding
+                # gzip must not have it decoded before it reaches the inflater
+                for chunk in response.raw.stream(chunk_size, decode_content=False):
+                    data = inflater.decompress(chunk) if unzip else chunk
+                    checksum.update(data)
+                    file.write(data)
+                if unzip:
+                    data = inflater.flush()
+                    checksum.update(data)
+                    file.write(data)
+                    if not inflater.eof:
+                        raise EOFError(f'Incomplete gzip stream: {url}')
+            os.replace(file.name, file_path)
+        except BaseException:
+            os.remove(file.name)
+            raise
+
+    write_checksum(file_path, checksum.hexdigest())
 
     if unzip:
-        decompress(os.path.join(save_dir, filename), os.path.join(save_dir, os.path.splitext(filename)[0]))
+        print("Downloaded and decompressed: " + filename)
+    return file_path
         
+def write_checksum(file_path:str, checksum:str)->None:
+    ''' 
+    Function to record the size and (blake2b) checksum of a file in a sidecar file
+    (file_path + '.sum'), used by GIM_file_valid.
+    '''
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(file_path)), 
+                                     suffix='.part', delete=False) as f:
+        json.dump({'size': os.path.getsize(file_path), 'blake2b': checksum}, f)
+    os.replace(f.name, file_path + '.sum')
+
+def GIM_file_valid(file_path:str, verify:bool=False)->bool:
+    '''
+    Function to check if a (cached) file is complete. The size of the file must match
+    the one recorded when it was downloaded, and with verify also its checksum.
+    Files without a record are not valid.
+    '''
+    try:
+        with open(file_path + '.sum', 'r') as f:
+            record = json.load(f)
+        if os.path.getsize(file_path) != record['size']:
+            return False
+    except (OSError, ValueError, KeyError):
+        return False
+
+    if verify:
+        checksum = hashlib.blake2b()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                checksum.update(chunk)
+        return checksum.hexdigest() == record['blake2b']
+    return True
+
+def read_lock(lock_path:str)->tuple:
+    ''' Function to read the token and modification time of a lock, (None, None) if it does not exist. '''
+    try:
+        with open(lock_path, 'r') as f:
+            return f.read(), os.fstat(f.fileno()).st_mtime
+    except OSError:
+        return None, None
+
+def break_stale_lock(lock_path:str)->None:
+    '''
+    Function to remove a lock older than stale_lock_age. Processes breaking locks 
+    take turns (through lock_path + '.break'), and the lock is checked again before
+    it is removed, so a lock that was taken anew meanwhile is left alone.
+    '''
+    break_path = lock_path + '.break'
+    try:
+        fd = os.open(break_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # a breaker holds it for an instant only, unless it crashed
+        try:
+            if tm.time() - os.path.getmtime(break_path) > 10:
+                os.remove(break_path)
+        except OSError:
+            pass
+        return
+    try:
+        os.close(fd)
+        token, mtime = read_lock(lock_path)
+        if token is not None and tm.time() - mtime > stale_lock_age:
+            os.remove(lock_path)
+    finally:
+        os.remove(break_path)
+
+@contextmanager
+def lock_file(file_path:str, timeout:float=stale_lock_age):
+    '''
+    Context manager holding an exclusive lock on file_path (the file file_path + '.lock')
+    between processes. The lock holds a token of its owner, and is touched while it is
+    held, so locks older than stale_lock_age are left behind by a crashed process and 
+    removed (see break_stale_lock). On exit, the lock is only removed if it is still 
+    owned. Raises TimeoutError if the lock is not obtained within timeout seconds.
+    '''
+    lock_path = file_path + '.lock'
+    token = f'{os.getpid()} {uuid.uuid4().hex}'
+    start = tm.monotonic()
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            break_stale_lock(lock_path)
+            if tm.monotonic() - start > timeout:
+                raise TimeoutError(f'Could not lock {file_path}')
+            tm.sleep(0.1)
+    try:
+        os.write(fd, token.encode())
+    finally:
+        os.close(fd)
+
+    def heartbeat():
+        while not stop.wait(stale_lock_age / 4):
+            if read_lock(lock_path)[0] == token:
+                os.utime(lock_path)
+
+    stop = threading.Event()
+    toucher = threading.Thread(target=heartbeat, daemon=True)
+    toucher.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        toucher.join()
+        if read_lock(lock_path)[0] == token:
+            os.remove(lock_path)
+
+def evict_GIM_files(cache_dir:str=gim_dir, max_bytes:int=gim_dir_max_bytes)->int:
+    '''
+    Function to bound the size of the GIM file cache. The least recently used files
+    (by modification time, which fetch_GIM_files updates on every use) are deleted 
+    until the cache holds at most max_bytes. Locked files, and files still open in
+    another process (on Windows), are skipped.
+
+    Parameters
+    ----------
+    cache_dir: STR
+        Directory of the cache. By default, directory_paths.gim_dir.
+    max_bytes: INT
+        Size bound of the cache, in bytes. By default, gim_dir_max_bytes.
+
+    Returns
+    -------
+    n_deleted: INT
+        Number of deleted files
+    '''
+    files = []
+    for root, _, fnames in os.walk(cache_dir):
+        for fname in fnames:
+            if fname.endswith('.nc'):
+                try:
+                    stat = os.stat(os.path.join(root, fname))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, os.path.join(root, fname)))
+
+    total = sum(file[1] for file in files)
+    n_deleted = 0
+    for _, size, file_path in sorted(files):
+        if total <= max_bytes:
+            break
+        if os.path.exists(file_path + '.lock'):
+            continue
+        try:
+            os.remove(file_path)
+        except OSError:
+            continue
+        if os.path.exists(file_path + '.sum'):
+            os.remove(file_path + '.sum')
+        total -= size
+        n_deleted += 1
+    return n_deleted
+
 def decompress(infile:str, outfile:str)->None:
     ''' 
     Function to decompress a .gz file. Copied from:
@@ -145,21 +422,55 @@ def decompress(infile:str, outfile:str)->None:
     -------
     None
     '''
-    with gzip.open(infile, 'rb') as f_in, open(outfile, 'wb') as f_out:
+    out_dir = os.path.dirname(os.path.abspath(outfile))
+    with gzip.open(infile, 'rb') as f_in, tempfile.NamedTemporaryFile(dir=out_dir, suffix='.part', delete=False) as f_out:
         shutil.copyfileobj(f_in, f_out)
-        print("Downloaded and decompressed: " + re.split(r'\\', infile)[-1])
+    os.replace(f_out.name, outfile)
+    print("Downloaded and decompressed: " + re.split(r'\\', infile)[-1])
 
 
-def fetch_GIM_files(times_dates, save_dir:str=temp_dir):
+def cache_path(url:str, cache_dir:str=gim_dir)->str:
     '''
-    Function to fetch the GIM file(s) associated with times_dates.
+    Function to get the path of the (decompressed) file at url in the GIM file cache, 
+    keyed by product and day: cache_dir/PRODUCT/YYYY/PRODUCTDOY0.YYi.nc
+    '''
+    year, fname = url.split('/')[-2:]
+    fname = os.path.splitext(fname)[0]
+    return os.path.join(cache_dir, fname[:4], year, fname)
+
+def fetch_GIM_file(url:str, file_path:str, session:requests.Session=None, verify:bool=False)->str:
+    '''
+    Function to download the file at url into the GIM file cache (at file_path), unless 
+    it is already there. Holds the lock of the file, so that processes sharing the 
+    cache download each file once.
+    '''
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with lock_file(file_path):
+        # another process may have downloaded the file meanwhile
+        if not GIM_file_valid(file_path, verify=verify):
+            download_file(url, save_dir=os.path.dirname(file_path), unzip=True, session=session)
+    return file_path
+
+def fetch_GIM_files(times_dates, save_dir:str=gim_dir, url_base:str=gim_url, workers:int=8, 
+                    verify:bool=False):
+    '''
+    Function to fetch the GIM file(s) associated with times_dates. The files are kept
+    in a persistent cache (save_dir), and only the days that are not in it yet are 
+    downloaded (concurrently, each day once).
 
     Parameters
     ----------
     times_dates: STR or LIST[STR]
         STR must be in the format : 'hh:mm DD/MM/YYYY'
     save_dir: STR
-        Specify path for the downloaded file
+        Directory of the GIM file cache. By default, directory_paths.gim_dir.
+    url_base: STR
+        Base url of the GIM files, by default gim_url (see construct_url)
+    workers: INT
+        Maximum number of concurrent downloads (by default 8)
+    verify: BOOL
+        Decide if the checksums of cached files are verified, instead of only their 
+        size (by default False)
     
     Returns
     -------
@@ -170,20 +481,37 @@ def fetch_GIM_files(times_dates, save_dir:str=temp_dir):
     if isinstance(times_dates, str):
         times_dates = [times_dates]
 
-    fpath_lst = []
-
+    # construct url and filepath of .netCDF4 file, once per day
+    urls = {}
+    fpath_day = {}
     for time_date in times_dates:
-    # construct url and extract filename and filepath of .netCDF4 file
-        url = construct_url(time_date)
-        fname = re.split(r'/', url)[-1]
-        file_path = os.path.join(save_dir, os.path.splitext(fname)[0])
-        fpath_lst.append(file_path)
-
-    # download the file if it does not exist yet
-        if not os.path.isfile(file_path):
-            # print(f"Downloading {fname}...")
-            download_file(url, save_dir=save_dir, unzip=True)
+        day = time_date.split()[-1]
+        if day not in fpath_day:
+            url = construct_url(time_date, url_base=url_base)
+            fpath_day[day] = cache_path(url, save_dir)
+            urls[fpath_day[day]] = url
+
+    fpath_lst = [fpath_day[time_date.split()[-1]] for time_date in times_dates]
+
+    # mark the cached files as recently used, and download the others
+    missing = []
+    for file_path in urls:
+        if GIM_file_valid(file_path, verify=verify):
+            os.utime(file_path)
+        else:
+            missing.append(file_path)
+
+    if missing:
+        session = get_session(pool_size=workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            downloads = [executor.submit(fetch_GIM_file, urls[file_path], file_path, 
+                                         session=session, verify=verify) for file_path in missing]
+            for download in downloads:
+                download.result()
+
+        for file_path in missing:
             assert os.path.isfile(file_path), 'File incorrectly downloaded'
+        _grown_dirs.add(save_dir)
     
     # return string if single date was passed
     if len(fpath_lst) == 1:
@@ -192,7 +520,7 @@ def fetch_GIM_files(times_dates, save_dir:str=temp_dir):
         return fpath_lst
 
 def get_GIM(time_date:str, plot:bool=False, 
-            del_temp:bool=True, save_dir:str=temp_dir)->tuple:
+            del_temp:bool=True, save_dir:str=gim_dir)->tuple:
     '''
     Function to extract the worldwide JPL GIM TEC maps for a given day/time and 
     time resolution. If the exact time is not found, the nearest times 
@@ -205,11 +533,11 @@ def get_GIM(time_date:str, plot:bool=False,
     plot : BOOL
         Decide if the TEC maps will be plotted (by default False)
     del_temp : BOOL
-        Decide if the temp directory will be deleted after execution 
-        (by default True)
+        Decide if the GIM file cache is trimmed to its size bound after execution
+        (see evict_GIM_files, by default True). The cache is only scanned if files 
+        were downloaded into it since it was last trimmed.
     save_dir : STR
-        Specify the save directory of the downloaded and netCDF4 files.
-        By default, a temporary directory.
+        Directory of the GIM file cache. By default, directory_paths.gim_dir.
 
     Returns
     -------
@@ -221,48 +549,9 @@ def get_GIM(time_date:str, plot:bool=False,
             TEC map
     '''
 
-    # jpld map doesn't have the TEC map associated with time 00.00 of the 
-    # next day in the NetCDF file (epoch 97). The following lines of code
-    # address this issue by downloading and storing the map of the next day 
-    
-    # initialise a flag for later use (function return)
-    next_day_map = False
-    time = dt_extra.split_time_date(time_date)[0]
-    date = dt_extra.split_time_date(time_date)[1]
-
-    # the issue only occurs when the time is between 23.45 and 24.00
-    if (time[0]==23 and time[1]>45): 
-        new_date = dt_extra.get_next_day(date)
-        
-        # construct the next time date to fetch the map
-        next_time_date = f'00:00:00 {new_date[0]}/{new_date[1]}/{new_date[2]}'
-
-        # recover the map recursively
-        next_GIM_map, next_time_str = get_GIM(next_time_date, del_temp=False)
-
-        # reset the original time_date 
-        time_date = f'23:45:00 {date[0]}/{date[1]}/{date[2]}'
-        next_day_map = True
-
-    # fetch GIM file
-    file_path = fetch_GIM_files(time_date, save_dir=save_dir)
-
-    # identify nearest timeslots (and associated times)
-    og_time   = dt_extra.split_time_date(time_date)[0]
-    timeslots = get_timeslot(og_time)
-    times_str = get_time(timeslots)
-
-    # open file, read file and close the file
-    try:
-        ds = nc.Dataset(file_path)
-        GIM_maps = ds['tecmap'][timeslots, :].data
-    finally:
-        ds.close()
-
-    if next_day_map:
-        assert isinstance(times_str, str)
-        GIM_maps = np.array([GIM_maps, next_GIM_map])
-        times_str = [times_str, next_time_str]
+    # identify nearest timeslots, and slice the map(s) from the cube of the day
+    time, date = dt_extra.split_time_date(time_date)
+    GIM_maps, times_str = get_GIM_epoch(date, get_timeslot(time), save_dir=save_dir)
 
     # plotting
     if plot:
@@ -271,12 +560,87 @@ def get_GIM(time_date:str, plot:bool=False,
         else:
             plot_TEC(GIM_maps[0], times_str[0])
     
-    # delete temporary directory if desired
-    if del_temp:
-        shutil.rmtree(save_dir)
+    # bound the size of the GIM file cache if desired (and it grew)
+    if del_temp and save_dir in _grown_dirs:
+        _grown_dirs.discard(save_dir)
+        evict_GIM_files(save_dir)
 
     return GIM_maps, times_str
 
+def get_GIM_epoch(date:list, timeslots, save_dir:str=gim_dir)->tuple:
+    '''
+    Function to obtain the TEC map(s) of a day at the given timeslot(s).
+
+    Parameters
+    ----------
+    date: LIST
+        Date in the form [DD, MM, YYYY]
+    timeslots: INT or np.ndarray([INT, INT])
+        Timeslot(s) of the map(s), see get_timeslot.
+    save_dir : STR
+        Directory of the GIM file cache. By default, directory_paths.gim_dir.
+
+    Returns
+    -------
+    (tec_maps, time_str)
+        See get_GIM.
+    '''
+    if not isinstance(timeslots, int):
+        timeslots = np.asarray(timeslots)
+        if timeslots.size == 1:
+            timeslots = int(timeslots.flat[0])
+
+    # jpld files don't have the TEC map associated with time 00.00 of the next day 
+    # (epoch 97), so for times between 23.45 and 24.00 that map (timeslot 96) is 
+    # stitched to the cube
+    cube = get_GIM_cube(list(date), next_day=np.max(timeslots) == 96, save_dir=save_dir)
+    return np.array(cube[timeslots]), get_time(timeslots % 96)
+
+def get_GIM_cube(date:list, next_day:bool=False, save_dir:str=gim_dir)->np.ndarray:
+    '''
+    Function to obtain all TEC maps of a day (the 'tecmap' variable of its GIM file), 
+    as an array with shape (epochs, 180, 360). Days in the GIM store (see gim_store)
+    are read from its memory-mapped cube. Otherwise, the cube is read from the 
+    file once, and served from memory (gim_cache) afterwards.
+
+    Parameters
+    ----------
+    date: LIST
+        Date in the form [DD, MM, YYYY]
+    next_day: BOOL
+        Decide if the map of 00.00 of the next day must be appended to the cube 
+        (by default False). The jpld files do not contain it, so it is then 
+        taken from the cube of the next day.
+    save_dir : STR
+        Directory of the GIM file cache. By default, directory_paths.gim_dir.
+
+    Returns
+    -------
+    cube: NDARRAY
+        Array (float32, NaN where masked) with the TEC maps of the day, as read 
+        from the store or the file. The cube is shared with the cache, so it must 
+        not be modified.
+    '''
+    key = (tuple(date), save_dir)
+    cube = gim_cache.get(key)
+
+    if cube is None:
+        cube = gim_store.read_day(date)
+        if cube is not None and (not next_day or cube.shape[0] > 96):
+            return cube
+
+    if cube is None:
+        file_path = fetch_GIM_files(f'00:00:00 {date[0]}/{date[1]}/{date[2]}', save_dir=save_dir)
+        cube = gim_store.read_tecmap(file_path)
+
+    if next_day and cube.shape[0] == 96:
+        new_date = dt_extra.get_next_day(list(date))
+        next_map = get_GIM_cube(new_date, save_dir=save_dir)[0]
+        cube = np.concatenate((cube, next_map[np.newaxis]))
+
+    gim_cache.put(key, cube)
+    return cube
+
 def no_iplot(func):
     '''Decorator to turn off and on the interactive mode in matplotlib'''
     def wrapper(*args, **kwargs):
@@ -3,6 +3,7 @@ import numpy as np
 import tec_interpolation
 import rads_extraction
 import alert
+from extraction_tools import Extraction
 
 alpha   = 0.9173138576965778
 beta_CS = 0.900
@@ -19,22 +20,24 @@ S3 | 0.903 | 0.938 | 0.877 | 0.926 |
 '''
 
 
-def mic(alpha, beta, f=13.575e9, filepath=None, time=None, lat=None, lon=None, sla_uncorrected=None, **kwargs):
+def mic(alpha, beta, f=13.575e9, filepath=None, time=None, lat=None, lon=None, sla_uncorrected=None, 
+        method='kriging', extraction=None, **kwargs):
     '''docstring TODO'''
     tecu = 1e16
     
     if filepath is not None:
-        time, lat, lon, sla_uncorrected = rads_extraction.extract_rads(filepath, **kwargs) #TODO check filenames
+        extraction = rads_extraction.extract_rads(filepath, **kwargs) #TODO check filenames
         print("shouldn't be here")
-    else:
+    elif extraction is None:
         assert (time is not None and lat is not None and lon is not None and sla_uncorrected is not None), 'Specify the correct data'
+        extraction = Extraction.from_list([time, lat, lon, sla_uncorrected])
     
     alert.print_status('Start Interpolating')
-    tec_GPS, failed_indices = tec_interpolation.mass_interpolate(lon, lat, time, del_temp=False)
+    tec_GPS, failed_indices = tec_interpolation.mass_interpolate(extraction=extraction, method=method, del_temp=False)
     alert.print_status('Finish Interpolating')
 
-    # remove failed entries
-    time, lat, lon, sla_uncorrected = tec_interpolation.delete_failed_indices(failed_indices, time, lat, lon, sla_uncorrected)
+    # remove failed entries (they are masked, the columns are not copied)
+    time, lat, lon, sla_uncorrected = extraction.drop(failed_indices)
        
     if isinstance(alpha, float) or isinstance(alpha, int):
         return time, lat, lon, (40.3/f**2)*alpha*beta*(tec_GPS*tecu) + sla_uncorrected
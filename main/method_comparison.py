@@ -0,0 +1,54 @@
+import os
+import time as tm
+
+import numpy as np
+import pandas as pd
+import datetime as dt
+
+import alert
+import rads_extraction
+import tec_interpolation
+from directory_paths import project_dir, res_dir
+
+# compares the accuracy and speed of the fast interpolation methods against kriging
+methods = ['kriging', 'bilinear', 'bicubic', 'idw']
+files   = ['c2_240122.asc', 'j3_240122.asc', 's3a_240122.asc']
+data_dir = os.path.join(project_dir, 'RADS', '03_22_01_data')
+pass_n = 2
+step   = 10 # use every 10th measurement, kriging is slow
+
+rows = []
+for file in files:
+    alert.print_status(f'Start Extracting {file}')
+    time, lat, lon, sla = rads_extraction.simplify_extraction(
+        rads_extraction.extract_rads(os.path.join(data_dir, file), pass_n=pass_n))
+    time, lat, lon = time[::step], lat[::step], lon[::step]
+    alert.print_status(f'Finish Extracting {file}')
+
+    tec = {}
+    for method in methods:
+        alert.print_status(f'Start Interpolating ({method})')
+        start = tm.perf_counter()
+        tec_results, failed_indices = tec_interpolation.mass_interpolate(lon, lat, time, method=method, del_temp=False)
+        runtime = tm.perf_counter() - start
+
+        # failed points are set to NaN, to keep the points aligned between methods
+        tec[method] = np.full(len(time), np.nan)
+        tec[method][np.setdiff1d(np.arange(len(time)), failed_indices)] = tec_results
+        alert.print_status(f'Finish Interpolating ({method})')
+
+        diff = tec[method] - tec['kriging']
+        rows.append([file, method, len(time), len(failed_indices), runtime, runtime / len(time),
+                     np.nanmean(diff), np.sqrt(np.nanmean(diff**2)), np.nanmax(np.abs(diff))])
+
+# ----------- saving the data ----------------------------
+cols = ['File', 'Method', 'Points', 'Failed', 'Runtime (s)', 'Runtime per point (s)',
+        'Bias vs kriging (TECU)', 'RMS vs kriging (TECU)', 'Max vs kriging (TECU)']
+df_tab = pd.DataFrame(rows, columns=cols)
+print(df_tab.to_string())
+
+datafile = os.path.join(res_dir, f'{dt.datetime.now():%Y-%m-%d %H.%M} - method comparison (pass {pass_n:02}).txt')
+with open(datafile, 'a') as f:
+    df_tab.to_string(buf=f)
+
+alert.print_status('Program Complete')
@@ -8,7 +8,6 @@ import datetime as dt
 
 import alert
 import rads_extraction
-import tec_interpolation
 import integration_tools
 import datetime_tools as dt_extra
 from directory_paths import project_dir, res_dir
@@ -29,16 +28,13 @@ data = rads_extraction.extract_rads_pro(corrected_file=os.path.join(project_dir,
                                         max_lat=55,
                                         pass_n=pass_n)
 
-time, lat, lon, sla_true        = data[0] 
-time, lat, lon, sla_uncorrected = data[1]
-time, lat, lon, sla_RADS_gim    = data[2]
-time, lat, lon, (sla_MIC_gim, sla_unscaled), failed_indices = integration_tools.mic(alpha=(alpha, 1), beta=(beta, 1), time=time, lat=lat, lon=lon, sla_uncorrected=sla_uncorrected)
+time, lat, lon, (sla_MIC_gim, sla_unscaled), failed_indices = integration_tools.mic(alpha=(alpha, 1), beta=(beta, 1), extraction=data[1])
 alert.print_status('Finish Extracting RADS Files')
 
 # remove failed entries in interpolation, to make comparison fair
-time, lat, lon, sla_uncorrected = tec_interpolation.delete_failed_indices(failed_indices, time, lat, lon, sla_uncorrected)
-time, lat, lon, sla_true        = tec_interpolation.delete_failed_indices(failed_indices, time, lat, lon, sla_true       )
-time, lat, lon, sla_RADS_gim    = tec_interpolation.delete_failed_indices(failed_indices, time, lat, lon, sla_RADS_gim   )
+sla_true        = data[0].drop(failed_indices).sla
+sla_uncorrected = data[1].drop(failed_indices).sla
+sla_RADS_gim    = data[2].drop(failed_indices).sla
 
 # post-processing
 alert.print_status('Start Processing')
@@ -0,0 +1,133 @@
+# The pass catalog lists the passes of all RADS files in a directory (see 
+# rads_extraction.pass_table), so that passes can be selected by time, region, 
+# satellite, cycle or pass number without parsing the files. The catalog is 
+# saved in rads_cache_dir, and rebuilding it only rescans the files that changed.
+
+import os
+import glob
+
+import numpy as np
+
+import rads_extraction
+import extraction_tools
+from directory_paths import project_dir, rads_cache_dir
+
+catalog_path = os.path.join(rads_cache_dir, 'catalog.npz')
+
+def find_rads_files(directory:str, recursive:bool=True)->list:
+    ''' Function to list the RADS files (.asc and .nc) in a directory. '''
+    pattern = os.path.join(directory, '**' if recursive else '', '*')
+    return sorted(f for f in glob.glob(pattern, recursive=recursive)
+                  if os.path.splitext(f)[-1].lower() in ('.asc', '.nc'))
+
+def load_catalog(catalog_path:str=catalog_path)->dict:
+    ''' Function to load a saved catalog, None if it does not exist. '''
+    if not os.path.isfile(catalog_path):
+        return None
+    with np.load(catalog_path) as data:
+        return {name: data[name] for name in data.files}
+
+def build_catalog(directory:str=os.path.join(project_dir, 'RADS'), catalog_path:str=catalog_path,
+                  recursive:bool=True)->dict:
+    '''
+    Function to build (or update) the catalog of the passes of the RADS files in 
+    a directory. Files already in the saved catalog, with the same size and 
+    modification time, are not scanned again.
+
+    Parameters
+    ----------
+    directory: STR
+        Directory with the RADS files. By default, the RADS directory of the project.
+    catalog_path: STR
+        File of the catalog (.npz). None to not save the catalog.
+    recursive: BOOL (default: True)
+        Set to False to only scan the files directly in directory.
+
+    Returns
+    -------
+    catalog: DICT
+        'files': NDARRAY[STR]
+            Paths of the files.
+        'sizes', 'mtimes': NDARRAY
+            Size and modification time (ns) of the files when they were scanned.
+        'passes': NDARRAY
+            Pass table of all files (see rads_extraction.pass_dtype), with as well
+            the index of the file of each pass ('file').
+    '''
+    old = load_catalog(catalog_path) if catalog_path is not None else None
+    old_files = {} if old is None else {f: i for i, f in enumerate(old['files'].tolist())}
+
+    files = find_rads_files(directory, recursive=recursive)
+    sizes, mtimes, tables = [], [], []
+    for i, file_path in enumerate(files):
+        stat = os.stat(file_path)
+        j = old_files.get(file_path)
+        if j is not None and old['sizes'][j] == stat.st_size and old['mtimes'][j] == stat.st_mtime_ns:
+            table = drop_file_index(old['passes'][old['passes']['file'] == j])
+        else:
+            table = rads_extraction.pass_table(file_path)
+
+        sizes.append(stat.st_size)
+        mtimes.append(stat.st_mtime_ns)
+        tables.append(with_file_index(table, i))
+
+    passes = np.concatenate(tables) if tables else with_file_index(np.zeros(0, rads_extraction.pass_dtype), 0)
+    catalog = {'files': np.array(files, dtype=str), 'sizes': np.array(sizes, dtype=np.int64), 
+               'mtimes': np.array(mtimes, dtype=np.int64), 'passes': passes}
+
+    if catalog_path is not None:
+        os.makedirs(os.path.dirname(catalog_path), exist_ok=True)
+        tmp_path = catalog_path + '.tmp.npz'
+        np.savez(tmp_path, **catalog)
+        os.replace(tmp_path, catalog_path)
+        print(f"Catalog holds {passes.size} passes of {len(files)} files")
+
+    return catalog
+
+def with_file_index(table:np.ndarray, file_index:int)->np.ndarray:
+    ''' Function to add the index of the file to a pass table. '''
+    dtype = np.dtype(rads_extraction.pass_dtype.descr + [('file', int)])
+    result = np.zeros(table.size, dtype=dtype)
+    for name in rads_extraction.pass_dtype.names:
+        result[name] = table[name]
+    result['file'] = file_index
+    return result
+
+def drop_file_index(passes:np.ndarray)->np.ndarray:
+    ''' Function to drop the file index from catalog passes, giving a pass table. '''
+    table = np.zeros(passes.size, dtype=rads_extraction.pass_dtype)
+    for name in rads_extraction.pass_dtype.names:
+        table[name] = passes[name]
+    return table
+
+def select(catalog:dict, **query)->np.ndarray:
+    '''
+    Function to select the passes of the catalog matching a query (time, bbox, 
+    satellite, cycle, pass_number, see rads_extraction.select_passes).
+    '''
+    return rads_extraction.select_passes(catalog['passes'], **query)
+
+def extract(catalog:dict, max_lat=None, as_seconds:bool=False, where:dict=None, **query)->extraction_tools.Extraction:
+    '''
+    Function to extract the measurements of the passes matching a query, across all
+    files of the catalog. Only the files with matching passes are read, and of those 
+    only the matching passes, through the row and byte offsets of the catalog (see 
+    rads_extraction.read_passes), and the rows matching the row filter where (see 
+    rads_extraction.extract_rads).
+
+    Returns
+    -------
+    extraction: Extraction
+        The measurements as returned by extract_rads, concatenated in the order of 
+        the files.
+    '''
+    selection = select(catalog, **query)
+    if where:
+        selection = rads_extraction.select_passes(selection, **rads_extraction.where_query(where))
+    extractions = [rads_extraction.extract_rads(catalog['files'][i], max_lat=max_lat, as_seconds=as_seconds, 
+                                                where=where, passes=drop_file_index(selection[selection['file'] == i]))
+                   for i in np.unique(selection['file'])]
+    return extraction_tools.concatenate(extractions, as_seconds=as_seconds)
+
+if __name__ == '__main__':
+    catalog = build_catalog()
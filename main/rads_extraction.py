@@ -1,5 +1,12 @@
+import io
 import os
+import re
+import json
+import hashlib
+import tempfile
 import warnings
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 import numpy as np
 import pandas as pd
@@ -8,10 +15,32 @@ import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap
 
 import datetime_tools as dt_extra
+from extraction_tools import Extraction
+from directory_paths import rads_cache_dir
 import alert
 
 warnings.filterwarnings('ignore', category=UserWarning)
 
+# columns of the RADS .asc files (rads2asc -V time,lat,lon,sla)
+asc_columns = ('time', 'lat', 'lon', 'sla')
+
+# header fields of the passes in the RADS .asc files, and their types
+asc_header = {'Cycle': ('cycle', int), 'Pass': ('pass', int), 
+              'Equ_time': ('equ_time', float), 'Equ_lon': ('equ_lon', float)}
+asc_meta_dtype = np.dtype([('cycle', int), ('pass', int), ('equ_time', float), ('equ_lon', float)])
+
+# passes of a RADS file (see pass_table)
+pass_dtype = np.dtype([('satellite', 'U8'), ('cycle', int), ('pass', int), ('pass_n', int),
+                       ('t_start', float), ('t_end', float), ('lat_min', float), ('lat_max', float), 
+                       ('lon_min', float), ('lon_max', float), ('row_start', int), ('row_end', int), 
+                       ('byte_offset', int)])
+
+# time gap (in seconds) splitting the passes of .nc files
+nc_pass_gap = 600
+
+# format of the binary cache of the .asc files (see load_asc), entries of other formats are rebuilt
+asc_cache_format = 2
+
 def convert_longitude_to_0_360(longitude):
     while longitude < -180:
         longitude += 360
@@ -19,6 +48,14 @@ def convert_longitude_to_0_360(longitude):
         longitude += 360
     return longitude
 
+def convert_longitudes_to_0_360(lon_array:np.ndarray)->np.ndarray:
+    ''' Array version of convert_longitude_to_0_360. '''
+    lon_array = np.array(lon_array, dtype=float)
+    while (lon_array < -180).any():
+        lon_array[lon_array < -180] += 360
+    lon_array[lon_array < 0] += 360
+    return lon_array
+
 def find_start_passes(file_path, verbose=False, results=False):
     '''
     This function reads an .asc data file from RADS and determine the starting
@@ -77,6 +114,310 @@ def find_start_passes(file_path, verbose=False, results=False):
     
     return start_pass_lines
 
+def parse_asc_lines(lines:list, file_path)->dict:
+    ''' Function to parse the data lines (bytes) of an .asc file into contiguous columns (see asc_columns). '''
+    if not lines:
+        return {name: np.array([], dtype=float) for name in asc_columns}
+    columns = np.loadtxt(io.BytesIO(b''.join(lines)), dtype=float, ndmin=2)
+    if columns.shape[1] != len(asc_columns):
+        raise ValueError(f'Expected {len(asc_columns)} columns in: {file_path}')
+    return {name: np.ascontiguousarray(columns[:, i]) for i, name in enumerate(asc_columns)}
+
+def read_asc(file_path)->dict:
+    '''
+    This function reads an .asc data file from RADS in a single pass. The data 
+    blocks are split at the headers (lines with '#'), every block being a pass.
+
+    Parameters
+    ----------
+    file_path: STR
+        Filepath in question. Must be .asc file!
+
+    Returns
+    -------
+    rads: DICT
+        'time', 'lat', 'lon', 'sla': NDARRAY
+            Contiguous columns of all passes (see asc_columns).
+        'offsets': NDARRAY[INT]
+            Row offsets of the passes in the columns: pass n (from 1) is in rows
+            offsets[n-1]:offsets[n].
+        'bytes': NDARRAY[INT]
+            Byte offsets of the headers of the passes in the file.
+        'meta': NDARRAY
+            Structured array with the header fields of each pass (cycle, pass, 
+            equ_time, equ_lon, see asc_header). Missing fields are -1 / NaN.
+    '''
+    if os.path.splitext(file_path)[-1].lower() != '.asc':
+        raise TypeError(f'Not a RADS .asc file: {file_path}')
+
+    field = re.compile(rb'#\s*(\w+)\s*=\s*(\S+)')
+    data, offsets, byte_offsets, meta = [], [], [], []
+    n_rows, offset, header_start, header = 0, 0, None, {}
+
+    with open(file_path, 'rb') as f:
+        for line in f:
+            if b'#' in line:
+                # headers directly following each other (passes without data) are merged
+                if header_start is None:
+                    header_start, header = offset, {}
+                match = field.match(line)
+                if match and match.group(1).decode() in asc_header:
+                    name, dtype = asc_header[match.group(1).decode()]
+                    header[name] = dtype(match.group(2))
+            elif line.strip():
+                if header_start is not None or not offsets:
+                    offsets.append(n_rows)
+                    byte_offsets.append(offset if header_start is None else header_start)
+                    meta.append(tuple(header.get(name, -1 if dtype is int else np.nan) 
+                                      for name, dtype in asc_header.values()))
+                    header_start = None
+                data.append(line)
+                n_rows += 1
+            offset += len(line)
+
+    rads = parse_asc_lines(data, file_path)
+    rads['offsets'] = np.array(offsets + [n_rows], dtype=int)
+    rads['bytes'] = np.array(byte_offsets, dtype=int)
+    rads['meta'] = np.array(meta, dtype=asc_meta_dtype)
+    return rads
+
+def asc_cache_entry(file_path)->tuple:
+    ''' Function to get the cache directory (in rads_cache_dir) and the key (path, size, modification time, format) of an .asc file. '''
+    stat = os.stat(file_path)
+    key = {'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 
+           'format': asc_cache_format}
+    entry = os.path.join(rads_cache_dir, os.path.split(file_path)[-1] + '-' + 
+                         hashlib.blake2b(key['path'].encode(), digest_size=8).hexdigest())
+    return entry, key
+
+def read_cached_asc(file_path, mmap:bool=False)->dict:
+    ''' Function to read the cached columns of an .asc file (see load_asc), None if they are not cached or outdated. '''
+    entry, key = asc_cache_entry(file_path)
+    key_path = os.path.join(entry, 'key.json')
+    if not os.path.isfile(key_path):
+        return None
+
+    with open(key_path, 'r') as f:
+        cached_key = json.load(f)
+    if {name: cached_key.get(name) for name in key} != key:
+        return None
+    return {name: np.load(os.path.join(entry, name + '.npy'), mmap_mode='r' if mmap else None) 
+            for name in cached_key['columns']}
+
+def load_asc(file_path, cache:bool=True, mmap:bool=False)->dict:
+    '''
+    This function reads an .asc data file from RADS (see read_asc), through a binary
+    cache. After the first parse, the columns are stored as .npy files in 
+    rads_cache_dir, keyed by the path, size and modification time of the file, 
+    and later loads read them back directly.
+
+    Parameters
+    ----------
+    file_path: STR
+        Filepath in question. Must be .asc file!
+    cache: BOOL (default: True)
+        Set to False to parse the file without using the cache.
+    mmap: BOOL (default: False)
+        Set to True to memory-map the cached columns instead of reading them.
+
+    Returns
+    -------
+    rads: DICT
+        The output of read_asc. The longitudes in [0, 360) and the time strings are
+        not stored, they are only made for the rows that are extracted (see 
+        extract_rads and extraction_tools).
+    '''
+    if cache:
+        rads = read_cached_asc(file_path, mmap=mmap)
+        if rads is not None:
+            return rads
+
+    rads = read_asc(file_path)
+
+    if cache:
+        # the key is removed first and written last, so a partially written entry is never used
+        entry, key = asc_cache_entry(file_path)
+        key_path = os.path.join(entry, 'key.json')
+        os.makedirs(entry, exist_ok=True)
+        if os.path.isfile(key_path):
+            os.remove(key_path)
+        for name, column in rads.items():
+            with tempfile.NamedTemporaryFile(dir=entry, suffix='.part', delete=False) as f:
+                np.save(f, column)
+            os.replace(f.name, os.path.join(entry, name + '.npy'))
+        with tempfile.NamedTemporaryFile('w', dir=entry, suffix='.part', delete=False) as f:
+            json.dump({**key, 'columns': list(rads)}, f)
+        os.replace(f.name, key_path)
+
+    return rads
+
+def pass_table(file_path, cache:bool=True, rads:dict=None)->np.ndarray:
+    '''
+    This function lists the passes of a RADS file, with their time span and 
+    latitude/longitude bounds. The passes of .asc files are the data blocks between
+    the headers (see read_asc); .nc files have no headers, so they are split where 
+    the satellite turns in latitude or where the data has a gap (nc_pass_gap).
+
+    Parameters
+    ----------
+    file_path: STR
+        Filepath in question (.asc or .nc file).
+    cache: BOOL (default: True)
+        Set to False to parse .asc files without the binary cache (see load_asc).
+    rads: DICT (default: None)
+        The columns of the .asc file, if they are already loaded (see load_asc).
+
+    Returns
+    -------
+    passes: NDARRAY
+        Structured array (see pass_dtype) with per pass: the satellite (prefix of 
+        the filename), cycle and pass number (-1 if unknown), ordinal in the file
+        (pass_n, from 1, see extract_rads), time span (seconds since 1985), 
+        latitude/longitude bounds (degrees, longitudes in [-180, 180]), rows in 
+        the file's columns and byte offset of its header (-1 if unknown).
+    '''
+    ext = os.path.splitext(file_path)[-1].lower()
+    if ext == '.asc':
+        if rads is None:
+            rads = load_asc(file_path, cache=cache, mmap=True)
+        time, lat, lon = rads['time'], rads['lat'], rads['lon']
+        starts, byte_offsets = rads['offsets'][:-1], rads['bytes']
+        cycles, passes = rads['meta']['cycle'], rads['meta']['pass']
+
+    elif ext == '.nc':
+        try:
+            ds = nc.Dataset(file_path)
+            time = np.array(ds['time'][:])
+            lat = np.array(ds['lat'][:])
+            lon = np.array(ds['lon'][:])
+        finally:
+            ds.close()
+
+        # a pass starts after a gap, or after the point where the latitude turns
+        # (the direction across a gap is not a turn)
+        gap = np.diff(time) > nc_pass_gap
+        direction = np.where(gap, 0, np.sign(np.diff(lat)))
+        new_pass = np.ones(time.size, dtype=bool)
+        new_pass[1:] = gap
+        new_pass[2:] |= direction[1:] * direction[:-1] < 0
+        starts = np.flatnonzero(new_pass)
+        byte_offsets = cycles = passes = np.full(starts.size, -1)
+
+    else:
+        raise TypeError(f'Unaccepted filetype for: {file_path}')
+
+    table = np.zeros(starts.size, dtype=pass_dtype)
+    if starts.size == 0:
+        return table
+
+    ends = np.append(starts[1:], time.size)
+    table['satellite'] = os.path.split(file_path)[-1].split('_')[0]
+    table['cycle'], table['pass'] = cycles, passes
+    table['pass_n'] = np.arange(1, starts.size + 1)
+    table['t_start'], table['t_end'] = np.minimum.reduceat(time, starts), np.maximum.reduceat(time, starts)
+    table['lat_min'], table['lat_max'] = np.minimum.reduceat(lat, starts), np.maximum.reduceat(lat, starts)
+    table['lon_min'], table['lon_max'] = np.minimum.reduceat(lon, starts), np.maximum.reduceat(lon, starts)
+    table['row_start'], table['row_end'] = starts, ends
+    table['byte_offset'] = byte_offsets
+    return table
+
+def to_seconds(time)->float:
+    ''' Function to get seconds since 1985 from a number, or a string 'hh:mm:ss DD/MM/YYYY'. '''
+    if isinstance(time, str):
+        return dt_extra.get_sec_since_1985(dt_extra.get_datetime_obj(time))
+    return float(time)
+
+def select_passes(passes:np.ndarray, time=None, bbox=None, satellite=None, 
+                  cycle=None, pass_number=None)->np.ndarray:
+    '''
+    This function selects the passes of a pass table (see pass_table) matching a query. 
+    Criteria that are None are not applied.
+
+    Parameters
+    ----------
+    passes: NDARRAY
+        Pass table, see pass_table (or rads_catalog.build_catalog).
+    time: TUPLE (default: None)
+        Time window (start, end), in seconds since 1985 or as 'hh:mm:ss DD/MM/YYYY'.
+        Passes overlapping the window are selected.
+    bbox: TUPLE (default: None)
+        Bounding box (lon_min, lat_min, lon_max, lat_max), in degrees with longitudes
+        in [-180, 180]. Passes whose bounds overlap the box are selected.
+    satellite: STR or LIST[STR] (default: None)
+        Satellite(s), as the prefix of the filenames (e.g. 'j3').
+    cycle: INT or LIST[INT] (default: None)
+        Cycle number(s).
+    pass_number: INT or LIST[INT] (default: None)
+        Pass number(s) (in the cycle, not the ordinal in the file).
+
+    Returns
+    -------
+    selection: NDARRAY
+        The rows of passes matching the query.
+    '''
+    mask = np.ones(passes.size, dtype=bool)
+    if time is not None:
+        mask &= (passes['t_end'] >= to_seconds(time[0])) & (passes['t_start'] <= to_seconds(time[1]))
+    if bbox is not None:
+        mask &= ((passes['lon_max'] >= bbox[0]) & (passes['lat_max'] >= bbox[1]) & 
+                 (passes['lon_min'] <= bbox[2]) & (passes['lat_min'] <= bbox[3]))
+    if satellite is not None:
+        mask &= np.isin(passes['satellite'], np.atleast_1d(satellite))
+    if cycle is not None:
+        mask &= np.isin(passes['cycle'], np.atleast_1d(cycle))
+    if pass_number is not None:
+        mask &= np.isin(passes['pass'], np.atleast_1d(pass_number))
+    return passes[mask]
+
+def points_in_polygon(lon_array:np.ndarray, lat_array:np.ndarray, polygon)->np.ndarray:
+    ''' Function to get a mask of the points inside a polygon [(lon, lat), ...] (even-odd rule, longitudes in [-180, 180]). '''
+    vertices = np.asarray(polygon, dtype=float)
+    inside = np.zeros(np.shape(lon_array), dtype=bool)
+    for (x0, y0), (x1, y1) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        crosses = (y0 > lat_array) != (y1 > lat_array)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = x0 + (lat_array - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (lon_array < x)
+    return inside
+
+def where_query(where:dict)->dict:
+    '''
+    Function to get the pass query (time and bbox, see select_passes) of a row filter
+    (see extract_rads): the passes outside it cannot hold rows matching the filter.
+    '''
+    query, bbox = {}, [-180, -90, 180, 90]
+    if where.get('time') is not None:
+        query['time'] = where['time']
+    if where.get('max_lat') is not None:
+        bbox = [bbox[0], max(bbox[1], -where['max_lat']), bbox[2], min(bbox[3], where['max_lat'])]
+    boxes = [where.get('bbox')]
+    if where.get('polygon') is not None:
+        vertices = np.asarray(where['polygon'], dtype=float)
+        boxes.append([*vertices.min(axis=0), *vertices.max(axis=0)])
+    for box in boxes:
+        if box is not None:
+            bbox = [max(bbox[0], box[0]), max(bbox[1], box[1]), min(bbox[2], box[2]), min(bbox[3], box[3])]
+    if bbox != [-180, -90, 180, 90]:
+        query['bbox'] = tuple(bbox)
+    return query
+
+def row_mask(secs_array:np.ndarray, lat_array:np.ndarray, lon_array:np.ndarray, where:dict)->np.ndarray:
+    '''
+    Function to get the mask of the rows matching a row filter (see extract_rads), from
+    their times (seconds since 1985), latitudes and longitudes (in [-180, 180]).
+    '''
+    mask = np.ones(np.shape(secs_array), dtype=bool)
+    if where.get('time') is not None:
+        mask &= (secs_array >= to_seconds(where['time'][0])) & (secs_array <= to_seconds(where['time'][1]))
+    if where.get('max_lat') is not None:
+        mask &= np.abs(lat_array) <= where['max_lat']
+    if where.get('bbox') is not None:
+        lon_min, lat_min, lon_max, lat_max = where['bbox']
+        mask &= (lon_array >= lon_min) & (lon_array <= lon_max) & (lat_array >= lat_min) & (lat_array <= lat_max)
+    if where.get('polygon') is not None:
+        mask[mask] = points_in_polygon(lon_array[mask], lat_array[mask], where['polygon'])
+    return mask
+
 def set_color(secs, cmap='Spectral'):
     cmap = plt.get_cmap(cmap)
     time_date = dt_extra.get_time_date(secs)
@@ -89,113 +430,474 @@ def set_color(secs, cmap='Spectral'):
 
     return cmap((secs-s0)/(sf-s0))
 
-def extract_rads(file_path, pass_n=None, start_pass_lines=None, max_lat=None, 
-                 plot=False, earth=Basemap(), recursive=False):
+def plot_pass(earth, secs_array, lat_array, lon_array):
+    ''' Function to plot the measurements of a pass on a map, coloured by the time of the day. '''
+    color = set_color(np.average(secs_array))
+
+    earth.scatter(lon_array, lat_array, s=20, c=color, marker='X', 
+                linewidths=0.01, label=f'avg. {dt_extra.get_time_date(np.average(secs_array))}', zorder=1)
+    ax = plt.gca()
+    ax.legend(bbox_to_anchor=(1.06, 0.99), loc='upper left')
+
+def read_asc_passes(file_path, byte_offsets)->dict:
+    '''
+    This function parses only some passes of an .asc file, seeking to the byte offsets 
+    of their headers (see read_asc and pass_table) instead of parsing the whole file.
+    Returns the columns of the passes, as read_asc.
+    '''
+    lines = []
+    with open(file_path, 'rb') as f:
+        for offset in byte_offsets:
+            f.seek(offset)
+            in_data = False
+            for line in f:
+                if b'#' in line:
+                    # the header of the next pass
+                    if in_data:
+                        break
+                elif line.strip():
+                    in_data = True
+                    lines.append(line)
+    return parse_asc_lines(lines, file_path)
 
-    if os.path.splitext(file_path)[-1].lower() == '.nc':
+def read_nc_rows(variable, rows:np.ndarray, max_gap:int=4096)->np.ndarray:
+    '''
+    Function to read the given (increasing) rows of a netCDF variable, with one hyperslab
+    per run of rows that are less than max_gap rows apart.
+    '''
+    if rows.size == 0:
+        return np.array([], dtype=float)
+    runs = np.split(rows, np.flatnonzero(np.diff(rows) > max_gap) + 1)
+    return np.concatenate([np.array(variable[run[0]:run[-1]+1])[run - run[0]] for run in runs])
+
+def pass_rows(passes:np.ndarray)->np.ndarray:
+    ''' Function to get the rows of the passes of a pass table (see pass_table), in its order. '''
+    return np.concatenate([np.arange(row_start, row_end, dtype=int) for row_start, row_end 
+                           in zip(passes['row_start'], passes['row_end'])] + [np.array([], dtype=int)])
+
+def read_nc_where(ds, rows:np.ndarray, where:dict=None)->tuple:
+    '''
+    This function reads the rows of a .nc file (see read_nc_rows) matching a row filter
+    (see extract_rads), in stages: the latitudes are only read for the rows in its time
+    span, the longitudes for the rows in its latitude bounds, and the sea level anomaly
+    for the rows matching it.
+
+    Returns
+    -------
+    (secs_array, lat_array, lon_array, sla_array)
+        The columns of the matching rows.
+    '''
+    where = where or {}
+    time = read_nc_rows(ds['time'], rows)
+    if where.get('time') is not None:
+        keep = (time >= to_seconds(where['time'][0])) & (time <= to_seconds(where['time'][1]))
+        rows, time = rows[keep], time[keep]
+
+    lat = read_nc_rows(ds['lat'], rows)
+    lat_min, lat_max = where_query(where).get('bbox', (None, -90, None, 90))[1::2]
+    if lat_min > -90 or lat_max < 90:
+        keep = (lat >= lat_min) & (lat <= lat_max)
+        rows, time, lat = rows[keep], time[keep], lat[keep]
+
+    lon = read_nc_rows(ds['lon'], rows)
+    keep = row_mask(time, lat, lon, where)
+    rows = rows[keep]
+    return time[keep], lat[keep], lon[keep], read_nc_rows(ds['sla'], rows)
+
+def read_passes(file_path, passes:np.ndarray, where:dict=None, cache:bool=True, mmap:bool=False, 
+                rads:dict=None)->tuple:
+    '''
+    This function reads the measurements of some passes of a RADS file, given by their
+    rows and byte offsets in a pass table (see pass_table, or rads_catalog). Loaded or 
+    cached .asc files are sliced (see load_asc), other .asc files are only parsed from 
+    the headers of the passes (see read_asc_passes, the cache is not built), and .nc
+    files are read in hyperslabs over the rows of the passes (see read_nc_where). The 
+    row filter where (see extract_rads) is applied on the time, latitude and longitude
+    before the sea level anomaly is gathered (or read).
+
+    Parameters
+    ----------
+    rads: DICT (default: None)
+        The columns of the .asc file, if they are already loaded (see load_asc).
+
+    Returns
+    -------
+    (secs_array, lat_array, lon_array, sla_array)
+        The columns of the rows, in the order of the passes.
+    '''
+    ext = os.path.splitext(file_path)[-1].lower()
+    rows = pass_rows(passes)
+
+    if ext == '.asc':
+        if rads is None and cache:
+            rads = read_cached_asc(file_path, mmap=mmap)
+        if rads is None and (passes['byte_offset'] >= 0).all():
+            rads, rows = read_asc_passes(file_path, passes['byte_offset']), np.arange(rows.size)
+        elif rads is None:
+            rads = load_asc(file_path, cache=cache, mmap=mmap)
+
+    elif ext == '.nc':
+        ds = nc.Dataset(file_path)
         try:
-            ds = nc.Dataset(file_path)
-            secs_array = np.array(ds['time'][:])
-            lat_array = np.array(ds['lat'][:])
-            lon_array = np.array(ds['lon'][:])
-            sla_array = np.array(ds['sla'][:])
+            return read_nc_where(ds, rows, where)
+        finally:
+            ds.close()
+
+    else:
+        raise TypeError(f'Unaccepted filetype for: {file_path}')
+
+    # the row filter only reads the time, latitude and longitude of the rows
+    if where:
+        rows = rows[row_mask(rads['time'][rows], rads['lat'][rows], rads['lon'][rows], where)]
+    return tuple(np.asarray(rads[name][rows]) for name in asc_columns)
+
+def extract_rads(file_path, pass_n=None, max_lat=None, 
+                 plot=False, earth=Basemap(), recursive=False, as_seconds=False, cache=True, mmap=False,
+                 query:dict=None, where:dict=None, passes:np.ndarray=None):
+    '''
+    This function extracts the measurements of a RADS file (.asc or .nc).
+
+    Parameters
+    ----------
+    file_path: STR
+        Filepath in question.
+    pass_n: INT or LIST[INT] (default: None)
+        Passes to extract (ordinal in the file, from 1, see pass_table). All if None.
+    max_lat: FLOAT (default: None)
+        Maximum absolute latitude of the measurements (same as where['max_lat']).
+    as_seconds: BOOL (default: False)
+        Unpack the times as seconds since 1985 instead of time strings.
+    cache, mmap: BOOL
+        Use the binary cache of .asc files, memory-mapped (see load_asc).
+    query: DICT (default: None)
+        Pass query (time, bbox, satellite, cycle, pass_number, see select_passes).
+    where: DICT (default: None)
+        Row filter, with any of:
+        'time': (start, end), in seconds since 1985 or as 'hh:mm:ss DD/MM/YYYY';
+        'max_lat': maximum absolute latitude; 'bbox': (lon_min, lat_min, lon_max, lat_max);
+        'polygon': [(lon, lat), ...]. Longitudes are in [-180, 180]. The filter is pushed
+        down: passes of cached .asc files outside it are skipped (see where_query), and
+        the other columns are only gathered (or read, for .nc files) for the rows that
+        match it on their time, latitude and longitude.
+    passes: NDARRAY (default: None)
+        Pass table of the file (see pass_table), e.g. the passes of the file selected
+        in a catalog (see rads_catalog.extract). Only these passes are read, through 
+        their rows and byte offsets (see read_passes), and the pass table of the file 
+        is not rebuilt for the query.
+
+    Returns
+    -------
+    extraction: Extraction
+        The measurements, with longitudes in [0, 360) (see extraction_tools). It is 
+        empty if no passes are selected.
+    '''
+    ext = os.path.splitext(file_path)[-1].lower()
+    where = dict(where or {})
+    if max_lat is not None:
+        where['max_lat'] = max_lat if where.get('max_lat') is None else min(max_lat, where['max_lat'])
+
+    # select the passes matching the query (see select_passes) and, for .asc files or 
+    # given passes, the passes that can hold rows matching the row filter. An .asc file 
+    # is only parsed (or loaded from the cache) once, for its pass table and its rows
+    rads = None
+    if ext == '.asc' and passes is None and (query is not None or where):
+        rads = load_asc(file_path, cache=cache, mmap=mmap)
+    selection = passes
+    if query is not None:
+        selection = select_passes(pass_table(file_path, cache=cache, rads=rads) if selection is None else selection, 
+                                  **query)
+    if where and (selection is not None or rads is not None):
+        selection = select_passes(pass_table(file_path, rads=rads) if selection is None else selection, 
+                                  **where_query(where))
+
+    if selection is not None:
+        if pass_n is not None:
+            selection = selection[np.isin(selection['pass_n'], np.atleast_1d(pass_n))]
+        secs_array, lat_array, lon_array, sla_array = read_passes(file_path, selection, where=where, 
+                                                                  cache=cache, mmap=mmap, rads=rads)
+        pass_n = selection['pass_n'].tolist()
+        if plot:
+            for n in range(selection.size):
+                rows = (secs_array >= selection['t_start'][n]) & (secs_array <= selection['t_end'][n])
+                plot_pass(earth, secs_array[rows], lat_array[rows], lon_array[rows])
+
+    elif ext == '.nc':
+        ds = nc.Dataset(file_path)
+        try:
+            if not where:
+                secs_array, lat_array, lon_array, sla_array = (np.array(ds[name][:]) for name in asc_columns)
+            else:
+                rows = np.arange(ds['time'].shape[0])
+                secs_array, lat_array, lon_array, sla_array = read_nc_where(ds, rows, where)
         finally:
             ds.close()
 
         pass_n = 0
-    elif os.path.splitext(file_path)[-1].lower() == '.asc':
-        if start_pass_lines is None:
-            start_pass_lines = find_start_passes(file_path, verbose=False)
+    elif ext == '.asc':
+        # the file is parsed once (or loaded from the cache, see load_asc), the passes 
+        # are sliced with its offset table
+        rads = load_asc(file_path, cache=cache, mmap=mmap)
+        offsets = rads['offsets']
 
         if pass_n is None: # extract all passes
-            skiprows = 0
-            max_rows = None
-            data = extract_rads(file_path, np.arange(1, len(start_pass_lines)+1, 1), 
-                                start_pass_lines, plot=plot, earth=earth, recursive=True)
-
-            secs_array = data[0]
-            lat_array  = data[1]
-            lon_array  = data[2]
-            sla_array  = data[3]
+            passes = np.arange(1, offsets.size)
                
         elif isinstance(pass_n, (list, np.ndarray)): # extract multiple passes
             assert len(set(pass_n)) == len(pass_n), 'There are repeated pass numbers!'
-
-            secs_array = np.array([])
-            lat_array  = np.array([])
-            lon_array  = np.array([])
-            sla_array  = np.array([])
-
-            for i, n in enumerate(pass_n):
-                data_i = extract_rads(file_path, int(n), start_pass_lines, plot=plot, 
-                                      earth=earth, recursive=True)
-
-                secs_array = np.append(secs_array, data_i[0])
-                lat_array  = np.append(lat_array , data_i[1])
-                lon_array  = np.append(lon_array , data_i[2])
-                sla_array  = np.append(sla_array , data_i[3])
+            passes = np.asarray(pass_n, dtype=int)
             
         else: # extract only one pass
-            assert pass_n <= len(start_pass_lines), 'There are not that many passes in this file!'
+            assert pass_n <= offsets.size - 1, 'There are not that many passes in this file!'
             assert pass_n >= 1
+            passes = np.array([pass_n])
 
-            if pass_n == len(start_pass_lines):
-                skiprows = start_pass_lines[pass_n-1]
-                max_rows  = None
-            else:
-                skiprows = start_pass_lines[pass_n-1]
-                max_rows = start_pass_lines[pass_n] - start_pass_lines[pass_n-1]
+        if len(passes) == 1:
+            rows = slice(offsets[passes[0]-1], offsets[passes[0]])
+        else:
+            rows = np.concatenate([np.arange(offsets[n-1], offsets[n]) for n in passes] + [np.array([], dtype=int)])
 
-            data = np.loadtxt(file_path, skiprows=skiprows, max_rows=max_rows)
+        secs_array = rads['time'][rows]
+        lat_array  = rads['lat'][rows]
+        lon_array  = rads['lon'][rows]
+        sla_array  = rads['sla'][rows]
 
-            secs_array = data[:, 0]
-            lat_array  = data[:, 1]
-            lon_array  = data[:, 2]
-            sla_array  = data[:, 3]
+        # Plot the passes if needed
+        if plot and not isinstance(pass_n, int):
+            for n in passes:
+                plot_pass(earth, rads['time'][offsets[n-1]:offsets[n]], 
+                          rads['lat'][offsets[n-1]:offsets[n]], rads['lon'][offsets[n-1]:offsets[n]])
                
     else:
         raise TypeError(f'Unaccepted filetype for: {file_path}')
-    
-
-    # Apply latitude filter if provided
-    if max_lat is not None:
-        indices = abs(lat_array) <= max_lat
-        secs_array = secs_array[indices]
-        lat_array  = lat_array[indices]
-        lon_array  = lon_array[indices]
-        sla_array  = sla_array[indices]
 
     # Plot the pass if needed
     if plot and isinstance(pass_n, int):
-        color = set_color(np.average(secs_array))
-
-        earth.scatter(lon_array, lat_array, s=20, c=color, marker='X', 
-                    linewidths=0.01, label=f'avg. {dt_extra.get_time_date(np.average(secs_array))}', zorder=1)
-        ax = plt.gca()
-        ax.legend(bbox_to_anchor=(1.06, 0.99), loc='upper left')
+        plot_pass(earth, secs_array, lat_array, lon_array)
     
     if not recursive:
-        time_list = [dt_extra.get_time_date(t) for t in secs_array]
-        lon_array = np.array([convert_longitude_to_0_360(lon) for lon in lon_array])
-        
-        return [time_list, lat_array, lon_array, sla_array]
+        # the times are unpacked as seconds since 1985 if as_seconds (see 
+        # tec_interpolation.mass_interpolate), the time strings are only made (for the
+        # extracted rows) when read
+        return Extraction(np.array(lat_array), convert_longitudes_to_0_360(lon_array), np.array(sla_array), 
+                          seconds=np.array(secs_array), as_seconds=as_seconds)
 
     else:
         return [secs_array, lat_array, lon_array, sla_array]
 
+def asc_blocks(file_path, block_size:int, cache:bool=True):
+    '''
+    Generator of the rows of an .asc file in blocks of at most block_size rows, with
+    the rows of each block where a pass starts (see read_asc). Cached files are read
+    from the memory-mapped cache (see load_asc), other files are parsed as they are read.
+    '''
+    rads = read_cached_asc(file_path, mmap=True) if cache else None
+    if rads is not None:
+        offsets = rads['offsets'][:-1]
+        for start in range(0, rads['offsets'][-1], block_size):
+            stop = min(start + block_size, rads['offsets'][-1])
+            block = {name: np.array(rads[name][start:stop]) for name in asc_columns}
+            yield block, offsets[(offsets >= start) & (offsets < stop)] - start
+        return
+
+    lines, starts, header, first = [], [], False, True
+    with open(file_path, 'rb') as f:
+        for line in f:
+            if b'#' in line:
+                header = True
+            elif line.strip():
+                if header or first:
+                    starts.append(len(lines))
+                    header, first = False, False
+                lines.append(line)
+                if len(lines) == block_size:
+                    yield parse_asc_lines(lines, file_path), np.array(starts, dtype=int)
+                    lines, starts = [], []
+    if lines:
+        yield parse_asc_lines(lines, file_path), np.array(starts, dtype=int)
+
+def nc_blocks(file_path, block_size:int):
+    '''
+    Generator of the rows of a .nc file in blocks of at most block_size rows, read as
+    hyperslabs, with the rows of each block where a pass starts (see pass_table).
+    '''
+    try:
+        ds = nc.Dataset(file_path)
+        n_rows = ds['time'].shape[0]
+        prev_time, prev_lat = np.array([]), np.array([])
+
+        for start in range(0, n_rows, block_size):
+            stop = min(start + block_size, n_rows)
+            block = {name: np.array(ds[name][start:stop]) for name in asc_columns}
+
+            # the passes are split as in pass_table, over the last two rows of the
+            # previous block and this block
+            time = np.concatenate([prev_time, block['time']])
+            lat  = np.concatenate([prev_lat, block['lat']])
+            gap = np.diff(time) > nc_pass_gap
+            direction = np.where(gap, 0, np.sign(np.diff(lat)))
+            new_pass = np.ones(time.size, dtype=bool)
+            new_pass[1:] = gap
+            new_pass[2:] |= direction[1:] * direction[:-1] < 0
+
+            yield block, np.flatnonzero(new_pass[prev_time.size:])
+            prev_time, prev_lat = time[-2:], lat[-2:]
+    finally:
+        ds.close()
+
+def iter_rads(file_path, chunk_size:int=None, max_lat=None, as_seconds:bool=False, cache:bool=True, 
+              block_size:int=2**16, where:dict=None):
+    '''
+    This generator reads a RADS file in chunks, per pass or per chunk_size rows, so 
+    that large files can be processed at constant memory. .nc files are read in 
+    hyperslabs, .asc files from the memory-mapped cache or line by line (see asc_blocks).
+
+    Parameters
+    ----------
+    file_path: STR
+        Filepath in question (.asc or .nc file).
+    chunk_size: INT (default: None)
+        Number of rows per chunk (the last chunk can be smaller). If None, every chunk
+        is a pass (see pass_table).
+    max_lat: FLOAT (default: None)
+        Maximum absolute latitude of the measurements; other rows are masked.
+    as_seconds: BOOL (default: False)
+        Unpack the times as seconds since 1985 (see extract_rads).
+    cache: BOOL (default: True)
+        Set to False to read .asc files without the binary cache (see load_asc).
+    block_size: INT (default: 2**16)
+        Number of rows read from the file at once.
+    where: DICT (default: None)
+        Row filter (see extract_rads); other rows are masked.
+
+    Yields
+    ------
+    extraction: Extraction
+        The measurements of the chunk, as extract_rads returns them.
+    '''
+    ext = os.path.splitext(file_path)[-1].lower()
+    if ext == '.asc':
+        blocks = asc_blocks(file_path, block_size, cache=cache)
+    elif ext == '.nc':
+        blocks = nc_blocks(file_path, block_size)
+    else:
+        raise TypeError(f'Unaccepted filetype for: {file_path}')
+
+    where = dict(where or {})
+    if max_lat is not None:
+        where['max_lat'] = max_lat if where.get('max_lat') is None else min(max_lat, where['max_lat'])
+
+    def chunk(parts):
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        extraction = Extraction(columns['lat'], convert_longitudes_to_0_360(columns['lon']), columns['sla'], 
+                                seconds=columns['time'], as_seconds=as_seconds)
+        if where:
+            extraction = extraction.take(row_mask(columns['time'], columns['lat'], columns['lon'], where))
+        return extraction
+
+    # rows of the current chunk, as parts of blocks
+    parts, n_rows = [], 0
+    for block, starts in blocks:
+        size = block['time'].size
+        if chunk_size is None:
+            cuts = starts
+        else:
+            cuts = np.arange(chunk_size - n_rows, size, chunk_size) if n_rows < chunk_size else np.arange(0, size, chunk_size)
+
+        start = 0
+        for cut in [*cuts.tolist(), size]:
+            if cut > start:
+                parts.append({name: column[start:cut] for name, column in block.items()})
+                n_rows += cut - start
+                start = cut
+            if cut < size and n_rows > 0:
+                yield chunk(parts)
+                parts, n_rows = [], 0
+
+    if n_rows > 0:
+        yield chunk(parts)
+
+def select_rows(extraction:list, rows)->list:
+    '''
+    Function to gather the rows of an extraction ([time, lat, lon, sla]), given as a
+    boolean mask or an array of indices. Time lists stay lists. An Extraction only 
+    gets a new validity mask for a boolean mask (see Extraction.take).
+    '''
+    if isinstance(extraction, Extraction):
+        return extraction.take(rows)
+
+    rows = np.asarray(rows)
+    if rows.dtype == bool:
+        rows = np.flatnonzero(rows)
+
+    time = extraction[0]
+    if isinstance(time, list):
+        time = [time[i] for i in rows.tolist()]
+    else:
+        time = np.asarray(time)[rows]
+    return [time, *(np.asarray(column)[rows] for column in extraction[1:])]
+
+def first_occurrences(seconds:np.ndarray)->np.ndarray:
+    ''' Function to get a mask of the first occurrence of every time (the rows kept when removing repeated entries). '''
+    mask = np.zeros(seconds.size, dtype=bool)
+    mask[np.unique(seconds, return_index=True)[1]] = True
+    return mask
+
+def in_sorted(seconds:np.ndarray, sorted_seconds:np.ndarray)->np.ndarray:
+    ''' Function to get a mask of the times that are in an array of sorted times, by binary search. '''
+    if sorted_seconds.size == 0:
+        return np.zeros(seconds.size, dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_seconds, seconds), sorted_seconds.size - 1)
+    return sorted_seconds[positions] == seconds
+
 def del_indices(extractions:list, indices): #works for 1 or more extraction(s) and 1 or more indices
     results = []
     for extraction in extractions:
-        for index in sorted(indices, reverse=True):
-            del extraction[0][index]
-            extraction[1] = np.delete(extraction[1], index, axis=0)
-            extraction[2] = np.delete(extraction[2], index, axis=0)
-            extraction[3] = np.delete(extraction[3], index, axis=0)
-        results.append(extraction)
+        if isinstance(extraction, Extraction):
+            results.append(extraction.drop(indices))
+            continue
+        mask = np.ones(len(extraction[0]), dtype=bool)
+        mask[np.asarray(indices, dtype=int)] = False
+        results.append(select_rows(extraction, mask))
     return results
 
+def align_extractions(*extractions, simplify:bool=True)->list:
+    '''
+    This function aligns extractions of the same measurements (e.g. corrected, 
+    uncorrected and GIM corrected files) on their times (in seconds since 1985, see
+    Extraction.seconds): only the times present in all extractions are kept, in the 
+    order of the first extraction.
+
+    Parameters
+    ----------
+    *extractions: LIST
+        Extractions [time, lat, lon, sla], see extract_rads.
+    simplify: BOOL (default: True)
+        Remove the repeated entries of every extraction first (see simplify_extraction).
+    
+    Returns
+    -------
+    extractions: LIST
+        The aligned extractions, with the same times in every extraction.
+    '''
+    keys  = [Extraction.from_list(extraction).seconds for extraction in extractions]
+    masks = [first_occurrences(key) if simplify else np.ones(key.size, dtype=bool) for key in keys]
+
+    # the sorted times present in all extractions
+    common = np.unique(keys[0][masks[0]])
+    for key, mask in zip(keys[1:], masks[1:]):
+        common = np.intersect1d(common, key[mask])
+
+    # rows of the first extraction, the others are sorted and matched to its times
+    rows = [np.flatnonzero(masks[0] & in_sorted(keys[0], common))]
+    for key, mask in zip(keys[1:], masks[1:]):
+        candidates = np.flatnonzero(mask & in_sorted(key, common))
+        candidates = candidates[np.argsort(key[candidates], kind='stable')]
+        rows.append(candidates[np.searchsorted(key[candidates], keys[0][rows[0]])])
+
+    return [select_rows(extraction, row) for extraction, row in zip(extractions, rows)]
+
 def check_extractions(extraction1, extraction2):
-    if extraction1[0] != extraction2[0]:
+    if not np.array_equal(Extraction.from_list(extraction1).seconds, Extraction.from_list(extraction2).seconds):
         print("Error: Time lists do not match")
         exit()
 
@@ -211,86 +913,140 @@ def check_extractions(extraction1, extraction2):
 
 def match_extractions(corrected_extraction, uncorrected_extraction, gim_extraction = None): #match extraction2 to extraction1
     # extraction consists of [0] time_list, [1] lat_array, [2] lon_array, [3] sla_array    
-    indices_to_delete = []
-
-    # Iterate through time stamps in uncorrected_extraction
-    indices_to_delete = []
-    for i, time in enumerate(uncorrected_extraction[0]):
-        # If the time stamp doesn't exist in corrected_extraction, mark it for deletion
-        if time not in corrected_extraction[0]:
-            indices_to_delete.append(i)
+
+    # keep the time stamps in uncorrected_extraction that exist in corrected_extraction
+    mask = in_sorted(Extraction.from_list(uncorrected_extraction).seconds, 
+                     np.unique(Extraction.from_list(corrected_extraction).seconds))
     
     # Delete the corresponding data from datafile2 arrays
     if gim_extraction is None:
-        uncorrected_extraction = del_indices([uncorrected_extraction], indices_to_delete)[0]
+        uncorrected_extraction = select_rows(uncorrected_extraction, mask)
         return uncorrected_extraction
     else:
-        gim_extraction = del_indices([gim_extraction], indices_to_delete)[0]
-        uncorrected_extraction = del_indices([uncorrected_extraction], indices_to_delete)[0]
+        gim_extraction = select_rows(gim_extraction, mask)
+        uncorrected_extraction = select_rows(uncorrected_extraction, mask)
         return uncorrected_extraction, gim_extraction
   
 def simplify_extraction(extraction): # deletes all double entries in the extraction
-    indices_to_delete = []
+    mask = first_occurrences(Extraction.from_list(extraction).seconds)
+    extraction = select_rows(extraction, mask)
 
-    for i, time in enumerate(extraction[0]):
-        if time in extraction[0][:i]:
-            indices_to_delete.append(i)            
-    extraction = del_indices([extraction], indices_to_delete)[0]
+    print(f'Number of repeated entries: {mask.size - np.count_nonzero(mask)}')
+    return extraction
+
+def sample_extractions(extractions:list, max_size:int=None)->list:
+    ''' Function to randomly keep max_size rows of aligned extractions (the same rows in every extraction). '''
+    if max_size is not None and len(extractions[0][0]) > max_size:
+        indices = np.random.choice(len(extractions[0][0]), len(extractions[0][0])-max_size, replace=False)
+        extractions = del_indices(extractions, indices)
+    return extractions
+
+def file_role(file_path)->tuple:
+    '''
+    Function to get the group and the role of a RADS file from its filename: files of
+    the same group hold the same measurements, with the ionospheric correction 
+    ('corrected'), without it ('uncorrected', *_noiono or *_no_iono) or with the GIM 
+    correction ('gim', *_gim). E.g. s3a_240122_gim.asc -> ('s3a_240122', 'gim').
+    '''
+    parts = os.path.splitext(os.path.split(file_path)[-1])[0].replace('no_iono', 'noiono').split('_')
+    roles = {'noiono': 'uncorrected', 'gim': 'gim'}
+    role = next((roles[part] for part in parts if part in roles), 'corrected')
+    return '_'.join(part for part in parts if part not in roles), role
 
-    print(f'Number of repeated entries: {len(indices_to_delete)}')
+def extract_file(file_path, **kwargs):
+    ''' Function to extract a RADS file (see extract_rads) in a worker of extract_rads_files. '''
+    alert.print_status(f'Start extraction of {os.path.split(file_path)[-1]}')
+    extraction = extract_rads(file_path, **kwargs)
+    alert.print_status(f'Finish extraction of {os.path.split(file_path)[-1]}')
     return extraction
 
+def extract_rads_files(file_paths:list, workers:int=8, processes:bool=False, **kwargs)->dict:
+    '''
+    This function extracts RADS files concurrently, on a thread pool (or a process 
+    pool). Every distinct file is extracted once.
+
+    Parameters
+    ----------
+    file_paths: LIST[STR]
+        Paths of the RADS files (.asc or .nc).
+    workers: INT (default: 8)
+        Number of threads (or processes).
+    processes: BOOL (default: False)
+        Extract the files in worker processes. Parsing .asc files that are not in
+        the cache yet (see load_asc) holds the GIL, so only processes parse them in
+        parallel; cached and .nc files are read as fast in threads.
+    **kwargs
+        Arguments of extract_rads (pass_n, max_lat, as_seconds, query, ...).
+
+    Returns
+    -------
+    extractions: DICT
+        The extraction (see extract_rads) of every file, by file path.
+    '''
+    file_paths = list(dict.fromkeys(file_paths))
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+
+    with executor(max_workers=max(1, min(workers, len(file_paths)))) as pool:
+        return dict(zip(file_paths, pool.map(partial(extract_file, **kwargs), file_paths)))
+
+def extract_rads_batch(file_paths:list, max_lat=None, max_size=None, pass_n=None, as_seconds=False, 
+                       workers:int=8, processes:bool=False)->dict:
+    '''
+    This function extracts a set of RADS files concurrently (see extract_rads_files), 
+    e.g. the files of all satellites for a date, and aligns the files of every group 
+    (see file_role and align_extractions).
+
+    Parameters
+    ----------
+    file_paths: LIST[STR]
+        Paths of the RADS files.
+    max_lat: FLOAT (default: None)
+        Maximum absolute latitude of the measurements.
+    max_size: INT (default: None)
+        Maximum number of measurements per group, randomly selected.
+    pass_n: INT or LIST[INT] (default: None)
+        Passes to extract (see extract_rads).
+    as_seconds: BOOL (default: False)
+        Return the times as seconds since 1985 (see extract_rads).
+    workers: INT (default: 8)
+        Number of threads (or processes).
+    processes: BOOL (default: False)
+        Extract the files in worker processes (see extract_rads_files).
+
+    Returns
+    -------
+    groups: DICT
+        Per group (e.g. 's3a_240122'), a tuple with the aligned extractions of its 
+        files, in the order corrected, uncorrected, gim (roles without file are left out).
+    '''
+    extractions = extract_rads_files(file_paths, workers=workers, processes=processes, pass_n=pass_n, 
+                                     max_lat=max_lat, as_seconds=as_seconds)
+
+    groups = {}
+    for file_path in extractions:
+        group, role = file_role(file_path)
+        assert role not in groups.setdefault(group, {}), f'Two {role} files for {group}'
+        groups[group][role] = file_path
+
+    aligned = {}
+    for group, files in groups.items():
+        roles = [role for role in ('corrected', 'uncorrected', 'gim') if role in files]
+        aligned[group] = tuple(sample_extractions(align_extractions(*(extractions[files[role]] for role in roles)), max_size))
+        print(f'Number of aligned entries ({group}): {len(aligned[group][0][0])}')
+    return aligned
+
 def extract_rads_pro(corrected_file, uncorrected_file, gimfile=None, max_lat=None, max_size=None, pass_n=None):
-   
-    if gimfile is None:
-        alert.print_status(f'Start extraction of corrected file: {os.path.split(corrected_file)[-1]}')
-        corrected_extraction = simplify_extraction(extract_rads(corrected_file, pass_n=pass_n, max_lat=max_lat))
-        alert.print_status(f'Finish extraction of corrected file: {os.path.split(corrected_file)[-1]}')
-
-        alert.print_status(f'Start extraction of uncorrected file: {os.path.split(uncorrected_file)[-1]}')
-        uncorrected_extraction = match_extractions(corrected_extraction, simplify_extraction(extract_rads(uncorrected_file, pass_n=pass_n, max_lat=max_lat)))
-        alert.print_status(f'Finish extraction of uncorrected file: {os.path.split(uncorrected_file)[-1]}')
-
-        check_extractions(corrected_extraction, uncorrected_extraction)
-
-   # Randomly select points if max_size is provided
-        if max_size is not None:
-            if len(corrected_extraction[0]) > max_size:     
-                indices = np.random.choice(len(corrected_extraction[0]), len(corrected_extraction[0])-max_size, replace=False)
-                extractions = del_indices([corrected_extraction, uncorrected_extraction], indices)
-                corrected_extraction = extractions[0]
-                uncorrected_extraction = extractions[1]
-        check_extractions(corrected_extraction, uncorrected_extraction)       
-        return corrected_extraction, uncorrected_extraction
-    
-    else:
-        alert.print_status(f'Start extraction of corrected file: {os.path.split(corrected_file)[-1]}')
-        corrected_extraction = simplify_extraction(extract_rads(corrected_file, pass_n=pass_n, max_lat=max_lat))
-        alert.print_status(f'Finish extraction of corrected file: {os.path.split(corrected_file)[-1]}')
-
-        alert.print_status(f'Start extraction of uncorrected file: {os.path.split(uncorrected_file)[-1]}')
-        uncorrected_extraction, gim_extraction = match_extractions(corrected_extraction, simplify_extraction(extract_rads(uncorrected_file, pass_n=pass_n, max_lat=max_lat)), simplify_extraction(extract_rads(gimfile, pass_n=pass_n, max_lat=max_lat)))
-        alert.print_status(f'Finish extraction of uncorrected file: {os.path.split(uncorrected_file)[-1]}')
-
-        alert.print_status(f'Start extraction of gim_corrected file: {os.path.split(gimfile)[-1]}')
-        gim_extraction = match_extractions(corrected_extraction, simplify_extraction(extract_rads(gimfile, pass_n=pass_n, max_lat=max_lat)))
-        alert.print_status(f'Finish extraction of gim_corrected file: {os.path.split(gimfile)[-1]}')
-
-        check_extractions(corrected_extraction, uncorrected_extraction)
-        check_extractions(corrected_extraction, gim_extraction)
-        check_extractions(uncorrected_extraction, gim_extraction)
-
-   # Randomly select points if max_size is provided
-        if max_size is not None:
-            if len(corrected_extraction[0]) > max_size:     
-                indices = np.random.choice(len(corrected_extraction[0]), len(corrected_extraction[0])-max_size, replace=False)
-                extractions = del_indices([corrected_extraction, uncorrected_extraction, gim_extraction], indices)
-                corrected_extraction = extractions[0]
-                uncorrected_extraction = extractions[1]
-                gim_extraction = extractions[2]
-                check_extractions(corrected_extraction, uncorrected_extraction)
-                check_extractions(corrected_extraction, gim_extraction)
-                check_extractions(uncorrected_extraction, gim_extraction)
-        
-        return corrected_extraction, uncorrected_extraction, gim_extraction
+    files = [corrected_file, uncorrected_file] if gimfile is None else [corrected_file, uncorrected_file, gimfile]
+
+    # the files are extracted concurrently (once each), then aligned on their times
+    extractions = extract_rads_files(files, pass_n=pass_n, max_lat=max_lat)
+    extractions = align_extractions(*(extractions[file] for file in files))
+    print(f'Number of aligned entries: {len(extractions[0][0])}')
+
+    # Randomly select points if max_size is provided
+    extractions = sample_extractions(extractions, max_size)
+
+    for extraction in extractions[1:]:
+        check_extractions(extractions[0], extraction)
 
+    return tuple(extractions)
@@ -1,24 +1,54 @@
 import os
 import re
-import shutil
+import hashlib
+import asyncio
 import datetime as dt
 import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap
 import netCDF4 as nc
 from pykrige.ok import OrdinaryKriging
+from pykrige.core import great_circle_distance
+from scipy.spatial import cKDTree
+from scipy.linalg import lu_factor, lu_solve
+from scipy.ndimage import map_coordinates
 
 import gim_tools
-from directory_paths import temp_dir
+import cache_tools
 import datetime_tools as dt_extra
 
+# spatial indices of the latitude/longitude grids, built once per grid
+_grid_indices = {}
+
+# fitted variogram parameters, keyed by GIM map, latitude band and interpolation parameters
+variogram_cache = cache_tools.LRUCache(max_entries=4096)
+
+# LU factorizations of kriging matrices, keyed by neighbourhood geometry and variogram 
+# (bounded in memory, use factorization_cache.resize to change the bound)
+factorization_cache = cache_tools.LRUCache(max_bytes=256*2**20)
+
+# GIM maps shared by the parent process, in the worker processes of mass_interpolate
+_shared_maps = None
+
+# data type of the shared GIM maps, the type of the maps of the GIM store and files
+shared_dtype = np.float32
+
+# start method of the worker processes: they are started while the GIM maps are loaded
+# in threads, and a process forked from a threaded parent may inherit a held lock. The
+# workers import the __main__ module of the caller (see mass_interpolate)
+mp_context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() 
+                                         else 'spawn')
+
 def tec(gim_matrix, x:int, y:int)->float:
-    ''' Function to calculate Total Electron Content (TEC) given longitude (x) and latitude (y). '''
-    x = x % 360
-    if x == 360: x = 0
-    return gim_matrix[y, x]
+    ''' 
+    Function to calculate Total Electron Content (TEC) given longitude (x) and latitude (y). 
+    x and y can be arrays of indices, the values are then gathered in one lookup.
+    '''
+    return gim_matrix[y, np.mod(x, 360)]
 
 
 def index_to_geo(x: np.ndarray, y: np.ndarray) -> tuple:
@@ -53,25 +83,19 @@ def index_to_geo(x: np.ndarray, y: np.ndarray) -> tuple:
         - If y is in the range [0, 180], it's converted to latitude by subtracting from 89.5 and negating.
         - Any other value of y is considered out of range, and an error is printed.
     '''
-    lon = np.array([])
-    lat = np.array([])
-    
-    for xi in x:
-        if xi >= -180 and xi <= 179.5:
-            lon = np.append(lon, xi + 180.5)
-        elif xi > 179.5 and xi <= 539:
-            lon = np.append(lon, xi - 179.5)
-        else:
-            print("Error: x (", xi, ") out of range")
-            return
-        
-    for yi in y:
-        if yi >= 0 and yi <= 180:
-            lat = np.append(lat, -yi + 89.5)
-        else:
-            print("Error: y (", yi, ") out of range")
-            return
-    
+    x, y = np.asarray(x), np.asarray(y)
+
+    out_of_range = np.flatnonzero(~((x >= -180) & (x <= 539)))
+    if out_of_range.size > 0:
+        print("Error: x (", x[out_of_range[0]], ") out of range")
+        return
+    out_of_range = np.flatnonzero(~((y >= 0) & (y <= 180)))
+    if out_of_range.size > 0:
+        print("Error: y (", y[out_of_range[0]], ") out of range")
+        return
+
+    lon = np.where(x <= 179.5, x + 180.5, x - 179.5).astype(float)
+    lat = (-y + 89.5).astype(float)
     return lon, lat
 
 
@@ -100,8 +124,49 @@ def geo_to_cartesian_vec(lat, lon, rad=False):
         lon = np.deg2rad(lon)
     return np.cos(lat)*np.cos(lon), np.cos(lat)*np.sin(lon), np.sin(lat)
 
+def map_key(gim_matrix:np.ndarray)->str:
+    ''' Function to obtain a key identifying the content of a (GIM) map, used for caching. '''
+    return hashlib.blake2b(np.ascontiguousarray(gim_matrix).tobytes(), digest_size=16).hexdigest()
+
+def get_grid_index(lat_array:np.ndarray, lon_array:np.ndarray)->tuple:
+    '''
+    Function to obtain the spatial index of a latitude/longitude grid. The index is
+    a KD-tree over the cartesian unit vectors of every grid cell, so that radius 
+    queries only visit the cells around the query point and wrap correctly across
+    the dateline and the poles. The index is built the first time a grid is 
+    requested and reused afterwards.
+
+    Parameters
+    ----------
+    lat_array: np.ndarray
+        Numpy array (1D) of existing latitude coordinates.
+    lon_array: np.ndarray
+        Numpy array (1D) of existing longitude coordinates.
+
+    Returns
+    -------
+    (tree, u, lat, lon)
+        tree: scipy.spatial.cKDTree
+            KD-tree over the unit vectors of the grid cells.
+        u: np.ndarray
+            Unit vectors of the grid cells, with shape (N, 3).
+        lat, lon: np.ndarray
+            Latitude and longitude of the grid cells (1D), flattened in the 
+            same (row-major) order as u.
+    '''
+    key = (lat_array.tobytes(), lon_array.tobytes())
+
+    if key not in _grid_indices:
+        lon, lat = np.meshgrid(lon_array, lat_array)
+        lat, lon = lat.ravel(), lon.ravel()
+        u = np.column_stack(geo_to_cartesian_vec(lat, lon))
+        _grid_indices[key] = (cKDTree(u), u, lat, lon)
+
+    return _grid_indices[key]
+
 def get_coord_around_pt(c_lat:float, c_lon:float,
-                        R_tspot:float, max_size=300, lat_array:np.ndarray = np.arange(-89.5, 89.5+1, 1), lon_array:np.ndarray = np.arange(-179.5, 179.5+1, 1),  R_earth:float=6378, plot:bool=False, ax=None):
+                        R_tspot:float, max_size=300, lat_array:np.ndarray = np.arange(-89.5, 89.5+1, 1), lon_array:np.ndarray = np.arange(-179.5, 179.5+1, 1),  R_earth:float=6378, plot:bool=False, ax=None, 
+                        selection:str='random'):
     '''
     Function that, for a given array of existing latitude and longitude coordinates, 
     determines the subset of coordinates that are within a particular ditance from 
@@ -120,6 +185,8 @@ def get_coord_around_pt(c_lat:float, c_lon:float,
     R_tspot: float
         Largest acceptable distance from centre point, in Km. Translates to radius 
         of target spot.
+    max_size: int (300 by default)
+        Maximum number of coordinates returned.
     R_earth: float (assumed 6378 Km)
         Radius of the Earth, assumed constant.
     plot: bool (False by default)
@@ -127,32 +194,57 @@ def get_coord_around_pt(c_lat:float, c_lon:float,
     ax: matplotlib axes object (None by default)
         Pass the axes on which to plot the target spot. Only useful if
         bool is set to True. If not provided, a new axes is generated.
+    selection: str ('random' by default)
+        How the coordinates are chosen if the target spot holds more than 
+        max_size of them:
+        - 'random': a random subset of max_size coordinates is kept.
+        - 'nearest': the max_size coordinates nearest to the centre are kept, 
+          ordered from near to far. The result is deterministic.
     
     Returns
     -------
     tlat, tlon : np.ndarray
         Existing latitude and longitude coordinates that are within R_tspot 
         distance from the centre coordinate. Both are one-dimensional arrarys.    
+    
+    Notes
+    -----
+    - The grid cells are looked up in the spatial index of the grid (see 
+      get_grid_index), which is only built once per grid.
     '''
     gamma = R_tspot / R_earth # characteristic angle of cone, in radians
 
-    lon, lat = np.meshgrid(lon_array, lat_array)
+    tree, u, lat, lon = get_grid_index(lat_array, lon_array)
 
+    # the chord between two unit vectors separated by gamma is 2*sin(gamma/2)
+    chord = 2*np.sin(min(gamma, np.pi)/2) * (1 + 1e-9)
     c_vec = np.array(geo_to_cartesian_vec(c_lat, c_lon))
-    u = np.array(geo_to_cartesian_vec(lat, lon))
-    u = np.rollaxis(u, 0, 3)
 
-    angles = np.arccos(np.inner(u, c_vec))
-    condition = angles < gamma
+    if selection == 'random':
+        candidates = np.sort(np.array(tree.query_ball_point(c_vec, chord), dtype=int))
+
+        angles = np.arccos(u[candidates] @ c_vec)
+        condition = candidates[angles < gamma]
+
+        #remove elements if array is too big
+        if condition.size > max_size:
+            keep = np.sort(np.random.choice(condition.size, max_size, replace=False))
+            condition = condition[keep]
+
+    elif selection == 'nearest':
+        # missing neighbours are flagged with an infinite distance
+        dist, candidates = tree.query(c_vec, k=max_size, distance_upper_bound=chord)
+        candidates = np.atleast_1d(candidates)[np.isfinite(np.atleast_1d(dist))]
+
+        angles = np.arccos(u[candidates] @ c_vec)
+        condition = candidates[angles < gamma]
+
+    else:
+        raise ValueError(f'Unknown selection mode: {selection}')
+
     tlat = lat[condition]
     tlon = lon[condition]
- 
-    #remove elements if array is too big
-    if tlon.size > max_size:
-        remove_indeces = sorted(np.random.choice(len(tlon), tlon.size-max_size, replace=False), reverse=True)
-        for i in remove_indeces:
-            tlon = np.delete(tlon, i)
-            tlat = np.delete(tlat, i)
+
     #print(tlon.size)
     if plot:
         if ax is None:
@@ -175,7 +267,8 @@ def get_coord_around_pt(c_lat:float, c_lon:float,
 
 
 def tec_kriging(gim_matrix, lon: float, lat: float, nlags: int = 75, radius: int = 500, max_points: int = 300,
-                 image: bool = False, plot_variogram: bool = False) -> float:
+                 selection: str = 'random', variogram_band: float = None, engine: str = 'pykrige', 
+                 image: bool = False, plot_variogram: bool = False, gim_key=None) -> float:
     ''' 
     Function to perform kriging interpolation of Total Electron Content (TEC) data.
     
@@ -193,10 +286,27 @@ def tec_kriging(gim_matrix, lon: float, lat: float, nlags: int = 75, radius: int
         Radius of the interpolation window in kilometers. Default is 500.
     max_points : int, optional
         Maximum number of surrounding points to be used for interpolation. Default is 300.
+    selection : str, optional
+        Selection of the surrounding points if there are more than max_points of them,
+        either 'random' or 'nearest' (see get_coord_around_pt). Default is 'random'.
+    variogram_band : float, optional
+        If given, the variogram is only fitted once per GIM map and latitude band of 
+        this width (in degrees), and reused from variogram_cache for all other points 
+        in that band. A width of 180 fits one variogram per map. Default is None, 
+        which fits the variogram at every point.
+    engine : str, optional
+        Engine solving the kriging system, either 'pykrige' or 'native'. The native engine
+        reuses the LU factorization of the kriging matrix from factorization_cache for 
+        neighbourhoods with the same geometry (see factorized_kriging). Default is 'pykrige'.
+        The cache only hits with selection='nearest': random neighbourhoods (almost) 
+        never repeat, so with selection='random' every point is factorized anew.
     image : bool, optional
         If True, displays an image of the interpolated TEC values. Default is False.
     plot_variogram : bool, optional
         If True, plots the variogram. Default is False.
+    gim_key : tuple, optional
+        Key of gim_matrix in variogram_cache, the (date, timeslot) of the map. Default is
+        None, in which case the content of gim_matrix is hashed (see map_key).
     
     Returns
     -------
@@ -208,18 +318,19 @@ def tec_kriging(gim_matrix, lon: float, lat: float, nlags: int = 75, radius: int
     - Uses Ordinary Kriging interpolation technique to estimate TEC values.
     - The interpolation window is centered at the specified longitude and latitude coordinates.
     - If `image` is True, it displays the interpolated TEC values as an image plot.
-    - If `plot_variogram` is True, it plots the variogram.
+    - If `plot_variogram` is True, it plots the variogram. Both `image` and `plot_variogram`
+      are only available with the pykrige engine.
+    - Cached variograms are keyed by gim_key (or the content of gim_matrix), the latitude 
+      band and the interpolation parameters; the least recently used ones are evicted first.
     '''
  
     
-    lat_if_array, lon_if_array = get_coord_around_pt(lat, lon, R_tspot=radius, max_size=max_points)
+    lat_if_array, lon_if_array = get_coord_around_pt(lat, lon, R_tspot=radius, max_size=max_points, 
+                                                     selection=selection)
     
     x_array = (179.5+lon_if_array).astype(int)
     y_array = abs(lat_if_array - 89.5).astype(int)
-    z_array = np.array([])
-
-    for i in range(len(x_array)):         
-            z_array = np.append(z_array, tec(gim_matrix, x_array[i], y_array[i]))
+    z_array = np.array(tec(gim_matrix, x_array, y_array), dtype=float)
     
     lon_array, lat_array = index_to_geo(x_array, y_array)
 
@@ -228,18 +339,40 @@ def tec_kriging(gim_matrix, lon: float, lat: float, nlags: int = 75, radius: int
         print("lon_dims: ", lon_array.size, "lat_dims: ", lat_array.size, "z_array: ", z_array.size)
         return
 
+    variogram_parameters = None
+    if variogram_band is not None:
+        key = variogram_key(map_key(gim_matrix) if gim_key is None else gim_key, lat, variogram_band, 
+                            nlags, radius, max_points, selection)
+        variogram_parameters = variogram_cache.get(key)
+
+    if engine == 'native' and variogram_parameters is not None:
+        return np.array([factorized_kriging(lon_array, lat_array, z_array, lon, lat, 
+                                            variogram_parameters, (y_array, x_array))])
+
+    if variogram_parameters is not None:
+        # pykrige reads a list as [sill, range, nugget], so pass the partial sill by name
+        variogram_parameters = dict(zip(['psill', 'range', 'nugget'], variogram_parameters))
+
     OK = OrdinaryKriging(
         lon_array,
         lat_array,
         z_array,
 
         variogram_model="exponential",
+        variogram_parameters=variogram_parameters,
         verbose=False,
         enable_plotting=plot_variogram,
         nlags=nlags,
         coordinates_type="geographic",
     )
 
+    if variogram_band is not None and variogram_parameters is None:
+        variogram_cache.put(key, list(OK.variogram_model_parameters))
+
+    if engine == 'native':
+        return np.array([factorized_kriging(lon_array, lat_array, z_array, lon, lat, 
+                                            OK.variogram_model_parameters, (y_array, x_array))])
+
     if image:
         z_results, ss_results = OK.execute("grid", lon_array + 0.5, lat_array + 0.5)
         plt.imshow(z_results, extent=[min(lon_array), max(lon_array), min(lat_array), max(lat_array)], origin="upper")
@@ -247,14 +380,640 @@ def tec_kriging(gim_matrix, lon: float, lat: float, nlags: int = 75, radius: int
         plt.show()
         print(z_results)
     
-    z1, ss1 = OK.execute("points", [lat], [lon])
+    z1, ss1 = OK.execute("points", [lon], [lat])
     return z1
 
+def variogram_key(gim_key:str, lat:float, variogram_band:float, nlags:int, radius:int, 
+                  max_points:int, selection:str)->tuple:
+    ''' 
+    Function to build the key of a fitted variogram in variogram_cache. gim_key identifies
+    the map: its (date, timeslot), or its content (see map_key) if those are unknown.
+    '''
+    return (gim_key, int((lat + 90) // variogram_band), nlags, radius, max_points, selection)
+
+def exponential_variogram(variogram_parameters, d:np.ndarray)->np.ndarray:
+    ''' Exponential variogram model (as in pykrige), with parameters [psill, range, nugget]. '''
+    psill, range_, nugget = variogram_parameters
+    return psill * (1.0 - np.exp(-d / (range_ / 3.0))) + nugget
+
+def kriging_matrix(cell_lon:np.ndarray, cell_lat:np.ndarray, variogram_parameters)->np.ndarray:
+    '''
+    Function to assemble the ordinary kriging matrix (as pykrige's OrdinaryKriging) 
+    of one or more neighbourhoods.
+
+    Parameters
+    ----------
+    cell_lon, cell_lat: np.ndarray
+        Coordinates of the neighbourhood(s), with shape (..., n).
+    variogram_parameters: array_like
+        Parameters [psill, range, nugget] of the exponential variogram, with shape (..., 3).
+
+    Returns
+    -------
+    a: np.ndarray
+        Kriging matrix, with shape (..., n+1, n+1).
+    '''
+    n = cell_lon.shape[-1]
+    params = np.moveaxis(np.asarray(variogram_parameters, dtype=float), -1, 0)[..., None, None]
+
+    d = great_circle_distance(cell_lon[..., :, None], cell_lat[..., :, None], 
+                              cell_lon[..., None, :], cell_lat[..., None, :])
+    a = np.zeros(cell_lon.shape[:-1] + (n+1, n+1))
+    a[..., :n, :n] = -exponential_variogram(params, d)
+    a[..., np.arange(n), np.arange(n)] = 0.0
+    a[..., n, :] = 1.0
+    a[..., :, n] = 1.0
+    a[..., n, n] = 0.0
+    return a
+
+def kriging_vector(cell_lon:np.ndarray, cell_lat:np.ndarray, lon, lat, variogram_parameters)->np.ndarray:
+    '''
+    Function to assemble the right-hand side of the ordinary kriging system(s) 
+    (as pykrige's OrdinaryKriging) for the target point(s) lon, lat.
+
+    Parameters
+    ----------
+    cell_lon, cell_lat: np.ndarray
+        Coordinates of the neighbourhood(s), with shape (..., n).
+    lon, lat: float or np.ndarray
+        Coordinates of the target point(s), with shape (...).
+    variogram_parameters: array_like
+        Parameters [psill, range, nugget] of the exponential variogram, with shape (..., 3).
+
+    Returns
+    -------
+    b: np.ndarray
+        Right-hand side, with shape (..., n+1).
+    '''
+    n = cell_lon.shape[-1]
+    params = np.moveaxis(np.asarray(variogram_parameters, dtype=float), -1, 0)[..., None]
+
+    bd = great_circle_distance(cell_lon, cell_lat, np.asarray(lon)[..., None], np.asarray(lat)[..., None])
+    b = np.ones(cell_lon.shape[:-1] + (n+1,))
+    b[..., :n] = -exponential_variogram(params, bd)
+    b[..., :n][bd <= 1.0e-10] = 0.0
+    return b
+
+def factorized_kriging(cell_lon:np.ndarray, cell_lat:np.ndarray, cell_tec:np.ndarray, lon:float, 
+                       lat:float, variogram_parameters, cell_index:tuple)->float:
+    '''
+    Function to solve the ordinary kriging system of one target point, reusing the LU 
+    factorization of the kriging matrix from factorization_cache. 
+    
+    On the regular GIM grid, the kriging matrix only depends on the rows of the 
+    neighbourhood cells, their columns relative to each other (a longitude shift does
+    not change any distance) and the variogram. Points along the same latitude row with
+    the same neighbourhood pattern therefore share the factorization, and only need a 
+    back-substitution with their own right-hand side. Only deterministic neighbourhoods
+    (selection='nearest', see get_coord_around_pt) repeat; random subsets of the cells
+    almost never do, so with selection='random' the cache (almost) never hits.
+
+    Parameters
+    ----------
+    cell_lon, cell_lat: np.ndarray
+        Coordinates of the neighbourhood cells.
+    cell_tec: np.ndarray
+        TEC of the neighbourhood cells.
+    lon, lat: float
+        Coordinates of the target point.
+    variogram_parameters: array_like
+        Parameters [psill, range, nugget] of the exponential variogram.
+    cell_index: tuple (np.ndarray, np.ndarray)
+        Row (y) and column (x) indices of the neighbourhood cells in the GIM map.
+
+    Returns
+    -------
+    z: float
+        Interpolated TEC value at the target point.
+    '''
+    if cell_tec.size == 0:
+        raise ValueError('There are no GIM cells within the target spot')
+
+    n = cell_tec.size
+    params = tuple(float(p) for p in variogram_parameters)
+
+    # order the cells by row and by column relative to the column of the target point
+    y = np.asarray(cell_index[0], dtype=int)
+    x = (np.asarray(cell_index[1], dtype=int) - int(np.floor(lon + 180)) + 180) % 360 - 180
+    order = np.lexsort((x, y))
+    cell_lon, cell_lat, cell_tec = cell_lon[order], cell_lat[order], cell_tec[order]
+    key = (y[order].tobytes(), x[order].tobytes(), params)
+
+    lu = factorization_cache.get(key)
+    if lu is None:
+        lu = lu_factor(kriging_matrix(cell_lon, cell_lat, params))
+        factorization_cache.put(key, lu)
+
+    x = lu_solve(lu, kriging_vector(cell_lon, cell_lat, lon, lat, params))
+    return np.sum(x[:n] * cell_tec)
+
+def get_neighbourhoods(lon:np.ndarray, lat:np.ndarray, radius:int=500, max_points:int=300, 
+                       R_earth:float=6378)->tuple:
+    '''
+    Function to find, for many target points at once, the GIM grid cells nearest 
+    to each point (as get_coord_around_pt with selection='nearest').
+
+    Parameters
+    ----------
+    lon: np.ndarray
+        Longitude of the target points.
+    lat: np.ndarray
+        Latitude of the target points.
+    radius: int, optional
+        Radius of the target spot in kilometers. Default is 500.
+    max_points: int, optional
+        Maximum number of grid cells per target point. Default is 300.
+    R_earth: float, optional
+        Radius of the Earth, in kilometers. Default is 6378.
+
+    Returns
+    -------
+    (cells, mask)
+        cells: np.ndarray
+            Flat (row-major) indices of the nearest grid cells, with shape 
+            (N, max_points), ordered from near to far.
+        mask: np.ndarray
+            Boolean array (N, max_points), True where the cell lies within radius.
+    '''
+    gamma = radius / R_earth
+    tree, u, _, _ = get_grid_index(np.arange(-89.5, 89.5+1, 1), np.arange(-179.5, 179.5+1, 1))
+
+    chord = 2*np.sin(min(gamma, np.pi)/2) * (1 + 1e-9)
+    c_vec = np.column_stack(geo_to_cartesian_vec(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)))
+
+    # invalid points (e.g. NaN coordinates) get no neighbours
+    valid = np.all(np.isfinite(c_vec), axis=1)
+    c_vec[~valid] = 0
+
+    dist, cells = tree.query(c_vec, k=max_points, distance_upper_bound=chord)
+    dist, cells = dist.reshape(len(c_vec), -1), cells.reshape(len(c_vec), -1)
+
+    # missing neighbours are flagged with an infinite distance (and an index out of range)
+    mask = np.isfinite(dist) & valid[:, None]
+    cells[~mask] = 0
+    mask &= np.arccos(np.einsum('ijk,ik->ij', u[cells], c_vec)) < gamma
+
+    return cells, mask
+
+def get_cell_values(gim_matrix, cells:np.ndarray)->tuple:
+    '''
+    Function to obtain the coordinates and TEC of GIM grid cells, given their flat
+    (row-major) indices in the grid of get_grid_index. The coordinates follow the 
+    same convention as tec_kriging and index_to_geo.
+
+    Returns
+    -------
+    (cell_lon, cell_lat, cell_tec): tuple of np.ndarray, with the shape of cells
+    '''
+    rows, cols = np.divmod(cells, 360)
+    cell_lat = rows - 89.5
+    cell_lon = np.where(cols <= 179, cols + 180.5, cols - 179.5)
+    cell_tec = np.asarray(gim_matrix)[179 - rows, cols]
+    return cell_lon, cell_lat, cell_tec
+
+def batch_kriging(gim_matrix, lon:np.ndarray, lat:np.ndarray, variogram_parameters=None, nlags:int=75, 
+                  radius:int=500, max_points:int=300, variogram_band:float=10, 
+                  batch_size:int=256, gim_key=None)->np.ndarray:
+    '''
+    Function to perform ordinary kriging of TEC at many points at once. It is a native 
+    (numpy) alternative to calling tec_kriging for every point: the neighbourhood of every
+    point is made of its nearest grid cells (selection='nearest'), and the kriging systems
+    of all points are stacked and solved with a single batched np.linalg.solve.
+
+    Parameters
+    ----------
+    gim_matrix : numpy.ndarray
+        Matrix containing the TEC data.
+    lon : numpy.ndarray
+        Longitude of the target points.
+    lat : numpy.ndarray
+        Latitude of the target points.
+    variogram_parameters : list, optional
+        Parameters [psill, range, nugget] of the exponential variogram, used for all points.
+        Default is None, in which case the variogram is fitted (by pykrige) once per 
+        latitude band, and shared with tec_kriging through variogram_cache.
+    nlags : int, optional
+        Number of lags to be used in the variogram fit. Default is 75.
+    radius : int, optional
+        Radius of the interpolation window in kilometers. Default is 500.
+    max_points : int, optional
+        Maximum number of surrounding points to be used for interpolation. Default is 300.
+    variogram_band : float, optional
+        Width (in degrees) of the latitude bands sharing a fitted variogram. Default is 10.
+    batch_size : int, optional
+        Maximum number of kriging systems solved at once, to bound the memory used.
+        Default is 256.
+    gim_key : tuple, optional
+        Key of gim_matrix in variogram_cache (see tec_kriging). Default is None.
+
+    Returns
+    -------
+    z : numpy.ndarray
+        Interpolated TEC values at the target points.
+
+    Notes
+    -----
+    - Given the same variogram, the results equal those of tec_kriging with 
+      selection='nearest' (up to round-off).
+    - Points with an equal number of neighbours are solved together, which is 
+      the case for most of the points as the number of neighbours is fixed.
+    '''
+    lon = np.atleast_1d(np.asarray(lon, dtype=float))
+    lat = np.atleast_1d(np.asarray(lat, dtype=float))
+
+    cells, mask = get_neighbourhoods(lon, lat, radius=radius, max_points=max_points)
+    cell_lon, cell_lat, cell_tec = get_cell_values(gim_matrix, cells)
+
+    # variogram parameters of every point
+    if variogram_parameters is not None:
+        params = np.tile(np.asarray(variogram_parameters, dtype=float), (lon.size, 1))
+    else:
+        params = np.full((lon.size, 3), np.nan)
+        gim_key = map_key(gim_matrix) if gim_key is None else gim_key
+        for i in np.flatnonzero(mask.any(axis=1)):
+            key = variogram_key(gim_key, lat[i], variogram_band, nlags, radius, max_points, 'nearest')
+            params_i = variogram_cache.get(key)
+            if params_i is None:
+                OK = OrdinaryKriging(cell_lon[i][mask[i]], cell_lat[i][mask[i]], cell_tec[i][mask[i]],
+                                     variogram_model="exponential", verbose=False, enable_plotting=False,
+                                     nlags=nlags, coordinates_type="geographic")
+                params_i = list(OK.variogram_model_parameters)
+                variogram_cache.put(key, params_i)
+            params[i] = params_i
+
+    z = np.full(lon.size, np.nan)
+    sizes = mask.sum(axis=1)
+
+    for n in np.unique(sizes):
+        if n == 0:
+            continue
+        
+        group = np.flatnonzero(sizes == n)
+        for start in range(0, group.size, batch_size):
+            idx = group[start:start+batch_size]
+
+            # neighbours of each point, as (G, n) arrays
+            m = mask[idx]
+            g_lon = cell_lon[idx][m].reshape(-1, n)
+            g_lat = cell_lat[idx][m].reshape(-1, n)
+            g_tec = cell_tec[idx][m].reshape(-1, n)
+
+            a = kriging_matrix(g_lon, g_lat, params[idx])
+            b = kriging_vector(g_lon, g_lat, lon[idx], lat[idx], params[idx])
+
+            x = np.linalg.solve(a, b[:, :, None])
+            z[idx] = np.sum(x[:, :n, 0] * g_tec, axis=1)
+
+    return z
+
 
 
+def grid_interpolation(gim_matrix, lon:np.ndarray, lat:np.ndarray, method:str='bilinear',
+                       radius:int=500, max_points:int=300, power:float=2)->np.ndarray:
+    '''
+    Function to interpolate TEC from a GIM map at many points at once, with a fast 
+    (non-kriging) method. All points are evaluated in a single array operation.
+
+    Parameters
+    ----------
+    gim_matrix : numpy.ndarray
+        Matrix containing the TEC data.
+    lon : numpy.ndarray
+        Longitude of the target points.
+    lat : numpy.ndarray
+        Latitude of the target points.
+    method : str, optional
+        Interpolation method. Default is 'bilinear'.
+        - 'bilinear': bilinear interpolation between the 4 surrounding cells.
+        - 'bicubic': cubic spline interpolation (scipy.ndimage.map_coordinates).
+        - 'idw': inverse distance weighting of the cells within radius.
+    radius : int, optional
+        Radius of the interpolation window in kilometers (only 'idw'). Default is 500.
+    max_points : int, optional
+        Maximum number of surrounding points (only 'idw'). Default is 300.
+    power : float, optional
+        Power of the inverse distance weights (only 'idw'). Default is 2.
+
+    Returns
+    -------
+    z : numpy.ndarray
+        Interpolated TEC values at the target points.
+
+    Notes
+    -----
+    - The map wraps around in longitude; beyond the outermost rows (|lat| > 89.5) 
+      the values of those rows are used.
+    - With 'idw', points without cells within radius are returned as NaN.
+    - Points with NaN coordinates are returned as NaN.
+    '''
+    gim_matrix = np.asarray(gim_matrix, dtype=float)
+    lon = np.atleast_1d(np.asarray(lon, dtype=float))
+    lat = np.atleast_1d(np.asarray(lat, dtype=float))
+
+    # fractional indices of the points in the map (see tec_kriging), NaN points are
+    # evaluated at the first cell and masked afterwards
+    valid = np.isfinite(lon) & np.isfinite(lat)
+    fx = np.where(valid, (lon + 179.5) % 360, 0)
+    fy = np.where(valid, np.clip(89.5 - lat, 0, 179), 0)
+
+    if method == 'bilinear':
+        x0 = np.floor(fx).astype(int)
+        y0 = np.minimum(np.floor(fy).astype(int), 178)
+        tx, ty = fx - x0, fy - y0
+        x1 = (x0 + 1) % 360
+
+        z = ((1-ty) * ((1-tx)*gim_matrix[y0, x0]   + tx*gim_matrix[y0, x1]) + 
+                ty  * ((1-tx)*gim_matrix[y0+1, x0] + tx*gim_matrix[y0+1, x1]))
+
+    elif method == 'bicubic':
+        # pad the map in longitude, so that the spline wraps around the dateline
+        pad = 8
+        padded = np.pad(gim_matrix, ((0, 0), (pad, pad)), mode='wrap')
+        z = map_coordinates(padded, [fy, fx + pad], order=3, mode='nearest')
+
+    elif method == 'idw':
+        cells, mask = get_neighbourhoods(lon, lat, radius=radius, max_points=max_points)
+        cell_lon, cell_lat, cell_tec = get_cell_values(gim_matrix, cells)
+
+        d = great_circle_distance(cell_lon, cell_lat, lon[:, None], lat[:, None])
+        w = np.where(mask, 1 / np.maximum(d, 1e-10)**power, 0)
+        w_sum = np.sum(w, axis=1)
+        z = np.divide(np.sum(w * cell_tec, axis=1), w_sum, out=np.full(lon.size, np.nan), where=w_sum > 0)
+
+    else:
+        raise ValueError(f'Unknown interpolation method: {method}')
+
+    return np.where(valid, z, np.nan)
+
+def spatial_interpolation(gim_matrix, lon:float, lat:float, method:str='kriging', nlags:int=75, 
+                          radius:int=500, max_points:int=300, selection:str='random', 
+                          variogram_band:float=None, engine:str='pykrige', gim_key=None)->float:
+    ''' Function to interpolate TEC at one point of a GIM map, with kriging (tec_kriging) or a fast method (grid_interpolation). '''
+    if method == 'kriging':
+        return tec_kriging(gim_matrix, lon, lat, nlags=nlags, radius=radius, max_points=max_points,
+                           selection=selection, variogram_band=variogram_band, engine=engine, gim_key=gim_key)
+    else:
+        return grid_interpolation(gim_matrix, lon, lat, method=method, radius=radius, max_points=max_points)[0]
+
+def relative_time(sat_date:str, gim_time:str)->float:
+    ''' Function to get the time (in minutes) of the satellite's measurement after the time of a GIM map. '''
+    sat_time = dt_extra.split_time_date(sat_date)[0]
+    gim_time = [int(i) for i in re.split(r'[:.,]', gim_time)]
+    return sat_time[0]*60 + sat_time[1] + sat_time[2]/60 - gim_time[0]*60 - gim_time[1] - gim_time[2]/60
+
+def epoch_keys(sat_date:str)->list:
+    ''' Function to get the (date, timeslot) keys of the GIM map(s) of a satellite date (see get_GIM). '''
+    time, date = dt_extra.split_time_date(sat_date)
+    return [(tuple(date), timeslot) for timeslot in np.atleast_1d(gim_tools.get_timeslot(time)).tolist()]
+
+def is_numeric_time(sat_date_list)->bool:
+    ''' Function to check if the satellite times are numeric (seconds since 1985) rather than strings. '''
+    return isinstance(sat_date_list, np.ndarray) and np.issubdtype(sat_date_list.dtype, np.number)
+
+def group_by_epoch(sat_date_list)->dict:
+    '''
+    Function to group satellite measurements by the GIM maps they are interpolated 
+    from, i.e. by their day and (bracketing) GIM timeslot(s).
+
+    Parameters
+    ----------
+    sat_date_list: list or np.ndarray
+        List of dates for the satellite measurements, as 'hh:mm:ss DD/MM/YYYY', or 
+        array of times in seconds since 00:00:00 01/01/1985.
+
+    Returns
+    -------
+    groups: dict
+        Maps (date, timeslots) to the array of indices (in input order) of the 
+        measurements in that group.
+    '''
+    if is_numeric_time(sat_date_list):
+        # one key per day, timeslot and exact/bracketed time, grouped with a stable sort
+        days, timeslots, weights = gim_tools.get_epochs(sat_date_list)
+        codes = (days * 96 + timeslots) * 2 + (weights > 0)
+        codes, inverse = np.unique(codes, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        splits = np.cumsum(np.bincount(inverse, minlength=codes.size))[:-1]
+
+        dates = zip(*(component.tolist() for component in dt_extra.get_dates(codes // 192 * 86400)))
+        groups = {}
+        for code, date, indices in zip(codes.tolist(), dates, np.split(order, splits)):
+            timeslot, bracket = code // 2 % 96, code % 2
+            groups[(date, (timeslot, timeslot + 1) if bracket else (timeslot,))] = indices
+        return groups
+
+    groups = {}
+    for i, sat_date in enumerate(sat_date_list):
+        time, date = dt_extra.split_time_date(sat_date)
+        key = (tuple(date), tuple(np.atleast_1d(gim_tools.get_timeslot(time)).tolist()))
+        groups.setdefault(key, []).append(i)
+
+    return {key: np.array(indices) for key, indices in groups.items()}
+
+def epoch_interpolation(lon:np.ndarray, lat:np.ndarray, sat_dates:list, method:str='kriging', 
+                        nlags:int=75, radius:int=500, max_points:int=300, selection:str='random', 
+                        variogram_band:float=None, engine:str='pykrige', del_temp:bool=False,
+                        gim_maps:np.ndarray=None, times_str=None, weights:np.ndarray=None, 
+                        gim_keys:list=None)->tuple:
+    '''
+    Function to interpolate TEC in space and time for many measurements that share
+    the same GIM maps (see group_by_epoch). The maps are only loaded once for all 
+    measurements.
+
+    Parameters
+    ----------
+    lon: np.ndarray
+        The satellite's longitudes.
+    lat: np.ndarray
+        The satellite's latitudes.
+    sat_dates: list
+        The dates of the satellite's measurements. Only used to load the maps and to 
+        weigh them in time, so it may be None if gim_maps and weights are given.
+    method: str, optional
+        Spatial interpolation method: 'kriging', or one of the fast methods of 
+        grid_interpolation, which evaluate every map in a single array operation. 
+        Default is 'kriging'.
+    nlags, radius, max_points, selection, variogram_band: optional
+        Kriging parameters, see tec_kriging.
+    engine: str, optional
+        Kriging engine: 'pykrige' or 'native' (see tec_kriging) krige every measurement 
+        on its own, 'batch' krigs all measurements of a map at once (see batch_kriging). 
+        The batch engine fits the variogram once per map if variogram_band is None.
+        Default is 'pykrige'.
+        The default engine keeps the model of tec_kriging, a variogram fitted to the 
+        neighbourhood of every measurement. A single OrdinaryKriging per map, fitted to 
+        all neighbourhoods of the group and executed with execute('points', lon, lat), 
+        would be a different model: it changes the estimates, and a failing fit would 
+        fail the whole group instead of single measurements. Use variogram_band to fit
+        once per map and latitude band, or engine='batch' to also solve at once.
+    del_temp: bool, optional
+        If True, trims the GIM file cache to its size bound after use. Default is False.
+    gim_maps, times_str: optional
+        The GIM map(s) and their time(s), as returned by gim_tools.get_GIM. By default
+        they are obtained with gim_tools.get_GIM.
+    weights: np.ndarray, optional
+        Time interpolation weights of the second map (see gim_tools.get_epochs). By 
+        default they are computed from sat_dates and times_str.
+    gim_keys: list, optional
+        The (date, timeslot) of every map, keying the cached variograms (see tec_kriging).
+        By default they are obtained from sat_dates if the maps are loaded here.
+
+    Returns
+    -------
+    (tec, failed)
+        tec: np.ndarray
+            The estimated TEC at the measurements (NaN where it failed).
+        failed: np.ndarray
+            Boolean array, True for the measurements where kriging raised a ValueError
+            (a NaN estimate alone does not count as failed).
+    '''
+    t = 15
+    if gim_maps is None:
+        gim_maps, times_str = gim_tools.get_GIM(sat_dates[0], del_temp=del_temp)
+        gim_keys = epoch_keys(sat_dates[0])
+
+    if gim_maps.ndim == 3 and weights is not None:
+        sat_rel_time = t * weights
+    elif gim_maps.ndim == 3:
+        sat_rel_time = np.array([relative_time(sat_date, times_str[0]) for sat_date in sat_dates])
+    elif gim_maps.ndim == 2:
+        gim_maps, sat_rel_time = gim_maps[None, :, :], np.zeros(len(lon))
+    else:
+        raise ValueError("GIM dimension not recognized")
+
+    tec = np.full((len(gim_maps), len(lon)), np.nan)
+    failed = np.zeros(len(lon), dtype=bool)
+
+    for j, gim_map in enumerate(gim_maps):
+        gim_key = None if gim_keys is None else gim_keys[j]
+        if method != 'kriging':
+            tec[j] = grid_interpolation(gim_map, lon, lat, method=method, radius=radius, max_points=max_points)
+
+        elif engine == 'batch':
+            tec[j] = batch_kriging(gim_map, lon, lat, nlags=nlags, radius=radius, max_points=max_points,
+                                   variogram_band=180 if variogram_band is None else variogram_band, 
+                                   gim_key=gim_key)
+
+        else:
+            for i in np.flatnonzero(~failed):
+                try:
+                    # pykrige returns a masked value, filled with NaN if it is masked
+                    tec[j, i] = float(np.ma.filled(tec_kriging(gim_map, lon[i], lat[i], nlags=nlags, radius=radius, 
+                                                               max_points=max_points, selection=selection, 
+                                                               variogram_band=variogram_band, engine=engine,
+                                                               gim_key=gim_key)[0], np.nan))
+                except ValueError:
+                    failed[i] = True
+
+    tec = tec[0] + (tec[-1] - tec[0]) * sat_rel_time / t
+    return tec, failed
+
+def share_GIM_maps(keys, load:bool=True)->tuple:
+    '''
+    Function to publish the GIM maps of epoch groups (see group_by_epoch) in shared 
+    memory, so that worker processes can read them without copying. Every map is 
+    stored once, also if several groups use it.
+
+    Parameters
+    ----------
+    keys: iterable
+        The (date, timeslots) keys of the epoch groups.
+    load: bool, optional
+        If True, the maps are loaded (see load_GIM_maps). Otherwise the shared 
+        memory is only allocated, so that the caller can load the maps of some
+        groups and start on them before the others are loaded. Default is True.
+
+    Returns
+    -------
+    (shm, shape, dtype, rows)
+        shm: multiprocessing.shared_memory.SharedMemory
+            Shared memory block with the maps. The caller must close and unlink it.
+        shape, dtype:
+            Shape (maps, 180, 360) and data type (shared_dtype) of the array of maps in shm.
+        rows: dict
+            Maps each key to the row(s) of its map(s) in the array.
+    '''
+    index, rows = {}, {}
+    for date, timeslots in keys:
+        for timeslot in timeslots:
+            index.setdefault((date, timeslot), len(index))
+        rows[(date, timeslots)] = [index[(date, timeslot)] for timeslot in timeslots]
+
+    # a block of size 0 cannot be created, also without any maps
+    shape = (len(index), 180, 360)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * shared_dtype().itemsize))
+    if load:
+        load_GIM_maps(shm, shape, rows, rows.keys())
+
+    return shm, shape, shared_dtype, rows
+
+def load_GIM_maps(shm, shape:tuple, rows:dict, keys, workers:int=4)->None:
+    '''
+    Function to load the GIM maps of the epoch groups with the given keys into the 
+    shared memory of share_GIM_maps. The days are loaded by a pool of threads, as
+    loading is mostly waiting for downloads and disk reads.
+    '''
+    maps = np.ndarray(shape, dtype=shared_dtype, buffer=shm.buf)
+    days = {}
+    for key in keys:
+        days.setdefault(key[0], []).append(key)
+
+    def load(day_keys):
+        for date, timeslots in day_keys:
+            cube = gim_tools.get_GIM_cube(list(date), next_day=max(timeslots) == 96)
+            maps[rows[(date, timeslots)]] = cube[list(timeslots)]
+
+    with ThreadPoolExecutor(max_workers=workers) as loader:
+        # iterating the results raises the errors of the loads
+        for _ in loader.map(load, days.values()):
+            pass
+
+def attach_GIM_maps(name:str, shape:tuple, dtype)->None:
+    ''' 
+    Function to attach a worker process to the GIM maps shared by share_GIM_maps. A 
+    worker stays attached to one block at a time, the previous block is detached.
+    '''
+    global _shared_maps
+    if _shared_maps is not None:
+        if _shared_maps[0].name == name:
+            return
+        shm, _shared_maps = _shared_maps[0], None
+        shm.close()
+    shm = shared_memory.SharedMemory(name=name)
+    _shared_maps = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+def release_GIM_maps(shm)->None:
+    ''' Function to remove the GIM maps shared by share_GIM_maps, once all workers are done with them. '''
+    shm.close()
+    shm.unlink()
+
+def shared_epoch_interpolation(shared:tuple, rows:list, key:tuple, lon:np.ndarray, lat:np.ndarray, 
+                               sat_dates:list, weights:np.ndarray=None, **kwargs)->tuple:
+    '''
+    Function to run epoch_interpolation in a worker process, on the GIM maps at rows 
+    of the shared maps (shared is the (name, shape, dtype) of the block, see 
+    attach_GIM_maps). All measurements fail if the interpolation raises a ValueError. 
+    key is the (date, timeslots) of the epoch group.
+    '''
+    attach_GIM_maps(*shared)
+    date, timeslots = key
+    maps = _shared_maps[1]
+    if len(rows) == 1:
+        gim_maps, times_str = maps[rows[0]], gim_tools.get_time(timeslots[0] % 96)
+    else:
+        gim_maps, times_str = maps[rows], gim_tools.get_time(np.array(timeslots) % 96)
+
+    try:
+        return epoch_interpolation(lon, lat, sat_dates, gim_maps=gim_maps, times_str=times_str, 
+                                   weights=weights, gim_keys=[(date, timeslot) for timeslot in timeslots], 
+                                   **kwargs)
+    except ValueError:
+        return np.full(len(lon), np.nan), np.ones(len(lon), dtype=bool)
 
 def time_interpolation(lon:float, lat:float, sat_date:str, nlags:int=75, 
-                       radius:int=500, max_points:int=300, del_temp=False)->float:
+                       radius:int=500, max_points:int=300, selection:str='random', 
+                       variogram_band:float=None, method:str='kriging', engine:str='pykrige', 
+                       del_temp=False)->float:
     '''
     Function to linearly interpolate between two TEC maps,
     before and after the satellite's time, in order to estimate
@@ -274,9 +1033,18 @@ def time_interpolation(lon:float, lat:float, sat_date:str, nlags:int=75,
         Radius of the interpolation window in kilometers. Default is 500.
     max_points: int, optional
         Maximum number of surrounding points to be used for interpolation. Default is 300.
-
+    selection: str, optional
+        Selection of the surrounding points, either 'random' or 'nearest'. Default is 'random'.
+    variogram_band: float, optional
+        Width (in degrees) of the latitude bands sharing a cached variogram per GIM map.
+        Default is None (fit the variogram at every point).
+    method: str, optional
+        Spatial interpolation method: 'kriging', or one of the fast methods of 
+        grid_interpolation ('bilinear', 'bicubic' or 'idw'). Default is 'kriging'.
+    engine: str, optional
+        Kriging engine, either 'pykrige' or 'native' (see tec_kriging). Default is 'pykrige'.
     del_temp: bool, optional
-        If True, deletes temporary files after use. Default is False.
+        If True, trims the GIM file cache to its size bound after use. Default is False.
 
     Returns
     -------
@@ -286,23 +1054,26 @@ def time_interpolation(lon:float, lat:float, sat_date:str, nlags:int=75,
     '''
     t = 15
     getGIM = gim_tools.get_GIM(sat_date, del_temp=del_temp)
+    gim_keys = epoch_keys(sat_date)
 
     if getGIM[0].ndim == 3:
         gim1, gim2 = getGIM[0]
 
-        sat_time = dt_extra.split_time_date(sat_date)[0]
-        gim1_time = [int(i) for i in re.split(r'[:.,]', getGIM[1][0])]
-        gim2_time = [int(i) for i in re.split(r'[:.,]', getGIM[1][1])]
+        sat_rel_time = relative_time(sat_date, getGIM[1][0])
 
-        sat_rel_time = sat_time[0]*60 + sat_time[1] + sat_time[2]/60 - gim1_time[0]*60 - gim1_time[1] - gim1_time[2]/60
-
-        tec1 = tec_kriging(gim1, lon, lat, nlags = nlags, radius = radius, max_points = max_points)
-        tec2 = tec_kriging(gim2, lon, lat, nlags = nlags, radius = radius, max_points = max_points)
+        tec1 = spatial_interpolation(gim1, lon, lat, method = method, nlags = nlags, radius = radius, 
+                                     max_points = max_points, selection = selection, variogram_band = variogram_band,
+                                     engine = engine, gim_key = gim_keys[0])
+        tec2 = spatial_interpolation(gim2, lon, lat, method = method, nlags = nlags, radius = radius, 
+                                     max_points = max_points, selection = selection, variogram_band = variogram_band,
+                                     engine = engine, gim_key = gim_keys[1])
         tec = tec1 + (tec2 - tec1) * sat_rel_time / t
 
     elif getGIM[0].ndim == 2:
         gim1 = getGIM[0]
-        tec = tec_kriging(gim1, lon, lat, nlags = nlags, radius = radius, max_points = max_points)
+        tec = spatial_interpolation(gim1, lon, lat, method = method, nlags = nlags, radius = radius, 
+                                    max_points = max_points, selection = selection, variogram_band = variogram_band,
+                                    engine = engine, gim_key = gim_keys[0])
 
     else:
         print("Error: GIM dimension not recognized")
@@ -310,8 +1081,179 @@ def time_interpolation(lon:float, lat:float, sat_date:str, nlags:int=75,
 
     return tec
 
-def mass_interpolate(lon_list, lat_list, sat_date_list, nlags:int=75, 
-                     radius:int=500, max_points:int=300, del_temp:bool=True):
+def epoch_dates(sat_date_list, indices:np.ndarray, weights:np.ndarray=None)->tuple:
+    ''' 
+    Function to select the dates and time interpolation weights of the points of an 
+    epoch group. The dates are None for numeric times (the weights are used instead).
+    '''
+    if weights is None:
+        return [sat_date_list[i] for i in indices], None
+    return None, weights[indices]
+
+def serial_epochs(groups:dict, lon_array:np.ndarray, lat_array:np.ndarray, sat_date_list, 
+                  weights:np.ndarray=None, **kwargs):
+    '''
+    Generator interpolating the epoch groups (see group_by_epoch) one after the other. 
+    Yields (indices, tec, failed) per group; all points of a group fail if the 
+    interpolation raises a ValueError. For numeric times, weights are the time 
+    interpolation weights of all points (see gim_tools.get_epochs).
+    '''
+    for (date, timeslots), indices in groups.items():
+        sat_dates, epoch_weights = epoch_dates(sat_date_list, indices, weights)
+        try:
+            gim_maps, times_str = gim_tools.get_GIM_epoch(date, np.array(timeslots))
+            tec, failed = epoch_interpolation(lon_array[indices], lat_array[indices], sat_dates, 
+                                              gim_maps=gim_maps, times_str=times_str, weights=epoch_weights, 
+                                              gim_keys=[(date, timeslot) for timeslot in timeslots], **kwargs)
+        except ValueError:
+            tec, failed = np.full(indices.size, np.nan), np.ones(indices.size, dtype=bool)
+        yield indices, tec, failed
+
+def submit_epochs(executor, shared:tuple, groups:dict, lon_array:np.ndarray, lat_array:np.ndarray, 
+                  sat_date_list, weights:np.ndarray=None, **kwargs)->dict:
+    '''
+    Function to submit epoch groups (see group_by_epoch) to a pool of worker processes,
+    on their GIM maps in shared memory (shared is the result of share_GIM_maps). 
+    Returns the futures of the groups, mapped to their indices.
+    '''
+    shm, shape, dtype, rows = shared
+    return {executor.submit(shared_epoch_interpolation, (shm.name, shape, dtype), rows[key], key, 
+                            lon_array[indices], lat_array[indices], 
+                            *epoch_dates(sat_date_list, indices, weights), **kwargs): indices
+            for key, indices in groups.items()}
+
+def parallel_epochs(groups:dict, lon_array:np.ndarray, lat_array:np.ndarray, sat_date_list, 
+                    workers:int, weights:np.ndarray=None, **kwargs):
+    '''
+    Generator interpolating the epoch groups (see group_by_epoch) in a pool of worker
+    processes. The GIM maps are published once in shared memory (see share_GIM_maps),
+    day by day, and the workers start on a day while the other ones are loaded.
+    Yields (indices, tec, failed) per group, in order of completion.
+    '''
+    shm, shape, dtype, rows = shared = share_GIM_maps(groups.keys(), load=False)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+            # the days are loaded concurrently, and their groups submitted as soon as 
+            # their maps are in
+            futures = {}
+            with ThreadPoolExecutor(max_workers=4) as loader:
+                loads = {loader.submit(load_GIM_maps, shm, shape, rows, day_groups.keys(), workers=1): day_groups
+                         for day_groups in group_by_day(groups).values()}
+                for load in as_completed(loads):
+                    try:
+                        load.result()
+                    except ValueError:
+                        # all points of a day fail if its maps cannot be loaded (as in serial_epochs)
+                        for indices in loads[load].values():
+                            yield indices, np.full(indices.size, np.nan), np.ones(indices.size, dtype=bool)
+                        continue
+                    futures.update(submit_epochs(executor, shared, loads[load], lon_array, lat_array, 
+                                                 sat_date_list, weights, **kwargs))
+            for future in as_completed(futures):
+                yield (futures[future], *future.result())
+    finally:
+        release_GIM_maps(shm)
+
+def group_by_day(groups:dict)->dict:
+    ''' Function to group the epoch groups (see group_by_epoch) by day, in chronological order. '''
+    days = {}
+    for key in sorted(groups, key=lambda key: key[0][::-1]):
+        days.setdefault(key[0], {})[key] = groups[key]
+    return days
+
+async def pipeline_epochs(groups:dict, lon_array:np.ndarray, lat_array:np.ndarray, sat_date_list, 
+                          collect, prefetch:int=1, workers:int=1, **kwargs)->None:
+    '''
+    Coroutine interpolating the epoch groups (see group_by_epoch) day by day, while the
+    GIM maps of the next day(s) are downloaded and decoded. The two stages run in their
+    own thread, connected by a queue. A day takes one of prefetch slots before it is 
+    loaded, and frees it when its interpolation starts, so that acquisition never runs 
+    more than prefetch days ahead of the interpolation.
+
+    Parameters
+    ----------
+    groups: dict
+        The epoch groups, see group_by_epoch.
+    lon_array, lat_array, sat_date_list:
+        The coordinates and dates of all points.
+    collect: callable
+        Called with (indices, tec, failed) for every interpolated group.
+    prefetch: int, optional
+        Maximum number of days loaded ahead of the interpolation. Default is 1.
+    workers: int, optional
+        Number of worker processes interpolating the days. With more than one worker,
+        one pool is used for all days, and the maps of each day are shared with it 
+        (see share_GIM_maps) by the acquisition stage. Default is 1.
+    **kwargs:
+        Interpolation parameters, see epoch_interpolation.
+    '''
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    # a slot per day that is loaded (or being loaded) before its interpolation started
+    slots = asyncio.Semaphore(prefetch)
+    # one pool of worker processes for all days
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) if workers > 1 else None
+
+    def load_day(day_groups):
+        # the maps of the day, shared with the worker processes, or decoded into gim_tools.gim_cache
+        try:
+            if pool is not None:
+                return share_GIM_maps(day_groups.keys())
+            gim_tools.get_GIM_cube(list(next(iter(day_groups))[0]), 
+                                   next_day=any(max(key[1]) == 96 for key in day_groups))
+        except ValueError:
+            # the points of the day fail in serial_epochs
+            pass
+        return None
+
+    def interpolate_day(day_groups, shared):
+        if shared is None:
+            for result in serial_epochs(day_groups, lon_array, lat_array, sat_date_list, **kwargs):
+                collect(*result)
+            return
+
+        try:
+            futures = submit_epochs(pool, shared, day_groups, lon_array, lat_array, sat_date_list, **kwargs)
+            for future in as_completed(futures):
+                collect(futures[future], *future.result())
+        finally:
+            release_GIM_maps(shared[0])
+
+    async def acquire(executor):
+        for day_groups in group_by_day(groups).values():
+            await slots.acquire()
+            await queue.put((day_groups, await loop.run_in_executor(executor, load_day, day_groups)))
+        await queue.put(None)
+
+    async def interpolate(executor):
+        while (day := await queue.get()) is not None:
+            slots.release()
+            await loop.run_in_executor(executor, interpolate_day, *day)
+
+    try:
+        with ThreadPoolExecutor(max_workers=1) as io_executor, ThreadPoolExecutor(max_workers=1) as cpu_executor:
+            await asyncio.gather(acquire(io_executor), interpolate(cpu_executor))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def run_pipeline(coroutine)->None:
+    ''' 
+    Function to run a coroutine to completion, also when called from a running event
+    loop (e.g. in a notebook), in which case it runs in its own thread.
+    '''
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+def mass_interpolate(lon_list=None, lat_list=None, sat_date_list=None, nlags:int=75, 
+                     radius:int=500, max_points:int=300, selection:str='random', 
+                     variogram_band:float=None, method:str='kriging', engine:str='pykrige', 
+                     del_temp:bool=True, workers:int=1, prefetch:int=0, extraction=None):
     '''
     Perform mass interpolation of Total Electron Content (TEC) data for multiple points.
 
@@ -321,16 +1263,51 @@ def mass_interpolate(lon_list, lat_list, sat_date_list, nlags:int=75,
         List of longitude coordinates for the points.
     lat_list: list
         List of latitude coordinates for the points.
-    sat_date_list: list
-        List of dates for the satellite measurements corresponding to each point.
+    sat_date_list: list or np.ndarray
+        List of dates for the satellite measurements corresponding to each point, as
+        'hh:mm:ss DD/MM/YYYY', or array of times in seconds since 00:00:00 01/01/1985 
+        (see rads_extraction.extract_rads). Numeric times are bracketed by the GIM 
+        epochs and weighted in one vectorized step (see gim_tools.get_epochs).
     nlags: int, optional
         Number of lags to be used in the variogram model. Default is 75.
     radius: int, optional
         Radius of the interpolation window in kilometers. Default is 500.
     max_points: int, optional
         Maximum number of surrounding points to be used for interpolation. Default is 300.
+    selection: str, optional
+        Selection of the surrounding points, either 'random' or 'nearest'. Default is 'random'.
+    variogram_band: float, optional
+        Width (in degrees) of the latitude bands sharing a cached variogram per GIM map.
+        Default is None (fit the variogram at every point).
+    method: str, optional
+        Spatial interpolation method: 'kriging', or one of the fast methods of 
+        grid_interpolation ('bilinear', 'bicubic' or 'idw'). The fast methods evaluate 
+        all points sharing the same GIM maps at once. Default is 'kriging'.
+    engine: str, optional
+        Kriging engine: 'pykrige', 'native' or 'batch' (see epoch_interpolation). 
+        Default is 'pykrige'. Use the native engine with selection='nearest', its 
+        factorization cache (almost) never hits with random neighbourhoods.
     del_temp: bool, optional
-        If True, deletes temporary files after use. Default is True.
+        If True, trims the GIM file cache to its size bound after use (see 
+        gim_tools.evict_GIM_files). Default is True.
+    workers: int, optional
+        Number of worker processes. With more than one worker, the epoch groups are 
+        interpolated in a process pool, reading the GIM maps from shared memory 
+        (see share_GIM_maps). Default is 1 (no pool).
+        The workers are started with forkserver or spawn (see mp_context), so they
+        import the __main__ module of the caller: a script calling mass_interpolate 
+        with more than one worker must do so under `if __name__ == '__main__':`, else
+        the script runs again in every worker and the pool breaks (BrokenProcessPool).
+        Starting the pool takes seconds, it only pays off on several cores and with
+        kriging of many points.
+    prefetch: int, optional
+        Number of days whose GIM maps are downloaded and decoded ahead of the 
+        interpolation, in an asyncio pipeline (see pipeline_epochs). With workers, the
+        same __main__ guard is needed. Default is 0: all GIM files are fetched before 
+        the interpolation starts, and the groups are interpolated one by one.
+    extraction: extraction_tools.Extraction, optional
+        Points to interpolate, instead of lon_list, lat_list and sat_date_list. Its 
+        times are used in the form it unpacks them (see Extraction.time).
 
     Returns
     -------
@@ -339,28 +1316,56 @@ def mass_interpolate(lon_list, lat_list, sat_date_list, nlags:int=75,
     failed_indices: list
         List of indices corresponding to points where interpolation failed.
     '''
-    
-    print("Checking availability of source GIMs...")
-    gim_tools.fetch_GIM_files(sat_date_list)
-    print("All neccessary source GIMs availible for interpolation!")
+    if extraction is not None:
+        lon_list, lat_list, sat_date_list = extraction.lon, extraction.lat, extraction.time
+    assert lon_list is not None and lat_list is not None and sat_date_list is not None, 'Specify the points to interpolate'
+
+    # the points sharing the same GIM maps are interpolated together, the results are
+    # scattered back to the input order
+    groups = group_by_epoch(sat_date_list)
+    weights = gim_tools.get_epochs(sat_date_list)[2] if is_numeric_time(sat_date_list) else None
+    kwargs = dict(method=method, nlags=nlags, radius=radius, max_points=max_points, 
+                  selection=selection, variogram_band=variogram_band, engine=engine, weights=weights)
+
+    if prefetch == 0:
+        print("Checking availability of source GIMs...")
+        days = dict.fromkeys(date for date, _ in groups)
+        gim_tools.fetch_GIM_files([f'00:00:00 {d}/{m}/{y}' for d, m, y in days])
+        print("All neccessary source GIMs availible for interpolation!")
     print("Staring mass interpolation...")
     starts = dt.datetime.now()
-    tec_results = np.array([])
-    failed_indices = []
     size = len(lon_list)
     digits = len(str(size))
-    for i in range(size):
-        try:
-            tec_results = np.append(tec_results, time_interpolation(lon_list[i], lat_list[i], sat_date_list[i], 
-                                                                    nlags=nlags, radius=radius, max_points=max_points))
-            print(f"Progress: {i+1:>0{digits}} / {size}")
-        except ValueError:
+    lon_array, lat_array = np.asarray(lon_list, dtype=float), np.asarray(lat_list, dtype=float)
+    tec_results = np.full(size, np.nan)
+    failed = np.zeros(size, dtype=bool)
+    done = 0
+
+    def collect(indices, tec, failed_epoch):
+        nonlocal done
+        tec_results[indices], failed[indices] = tec, failed_epoch
+
+        for i in indices[failed[indices]]:
             print(f"Error: interpolation failed for point: {i}")
-            failed_indices.append(i)
-        
+        done += indices.size
+        print(f"Progress: {done:>0{digits}} / {size}")
+
+    if prefetch > 0:
+        run_pipeline(pipeline_epochs(groups, lon_array, lat_array, sat_date_list, collect, 
+                                     prefetch=prefetch, workers=workers, **kwargs))
+    elif workers > 1:
+        for result in parallel_epochs(groups, lon_array, lat_array, sat_date_list, workers, **kwargs):
+            collect(*result)
+    else:
+        for result in serial_epochs(groups, lon_array, lat_array, sat_date_list, **kwargs):
+            collect(*result)
+
+    failed_indices = np.flatnonzero(failed).tolist()
+    tec_results = tec_results[~failed]
+
     if del_temp:
-        shutil.rmtree(temp_dir)
-        print("Gim files deleted")
+        n_deleted = gim_tools.evict_GIM_files()
+        print(f"{n_deleted} Gim files evicted from cache")
         
     ends = dt.datetime.now()
     print("Interpolated: ", len(tec_results) ,"TEC points in Series Runtime: ", ends - starts ," s")
@@ -369,15 +1374,30 @@ def mass_interpolate(lon_list, lat_list, sat_date_list, nlags:int=75,
 
 def delete_failed_indices(failed_indices, time_list, lat_array, lon_array, sla_array):
     '''
-    TODO: add docstring (copied straight from full_integration.py)
+    Function to delete the points for which the interpolation failed (see mass_interpolate)
+    from the satellite data, in one gather.
+
+    Parameters
+    ----------
+    failed_indices: LIST[INT]
+        Indices of the failed points.
+    time_list: LIST or np.ndarray
+        Times of the points (time strings or seconds since 1985).
+    lat_array, lon_array, sla_array: np.ndarray
+        Latitude, longitude and sea level anomaly of the points.
+
+    Returns
+    -------
+    time_list, lat_array, lon_array, sla_array
+        The data without the failed points. A time list stays a list.
     '''
-    failed_indices.reverse()
-    for index in failed_indices:
-        del time_list[index]
-        lat_array = np.delete(lat_array, index, axis=0)
-        lon_array = np.delete(lon_array, index, axis=0)
-        sla_array = np.delete(sla_array, index, axis=0)
-    return time_list, lat_array, lon_array, sla_array
+    keep = np.ones(len(time_list), dtype=bool)
+    keep[np.asarray(failed_indices, dtype=int)] = False
+    if isinstance(time_list, list):
+        time_list = [time for time, k in zip(time_list, keep) if k]
+    else:
+        time_list = np.asarray(time_list)[keep]
+    return time_list, np.asarray(lat_array)[keep], np.asarray(lon_array)[keep], np.asarray(sla_array)[keep]
 
 if __name__ == '__main__':
 
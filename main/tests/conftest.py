@@ -0,0 +1,27 @@
+import os
+import sys
+
+# the modules of the project are imported by name from main/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+import tec_interpolation
+
+
+@pytest.fixture
+def smooth_map()->np.ndarray:
+    ''' A smooth GIM map, varying with latitude and longitude. '''
+    lat, lon = np.meshgrid(np.arange(-89.5, 90), np.arange(-179.5, 180), indexing='ij')
+    return 20 + 10 * np.cos(np.deg2rad(lat)) + 5 * np.sin(np.deg2rad(3 * lon))
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    ''' Every test starts and ends with empty variogram and factorization caches. '''
+    tec_interpolation.variogram_cache.clear()
+    tec_interpolation.factorization_cache.clear()
+    yield
+    tec_interpolation.variogram_cache.clear()
+    tec_interpolation.factorization_cache.clear()
@@ -0,0 +1,41 @@
+# Small RADS files (.asc and .nc) with known passes, for the tests
+import os
+
+import numpy as np
+import netCDF4 as nc
+
+
+def make_passes(n_passes:int=3, n_rows:int=20, t0:float=1.2e9)->list:
+    ''' Passes going up and down in latitude, 10 s between rows and 20 minutes between passes. '''
+    passes = []
+    for n in range(n_passes):
+        lat = np.linspace(-60, 60, n_rows) * (1 if n % 2 == 0 else -1)
+        time = t0 + n * 3000 + 10 * np.arange(n_rows)
+        lon = np.linspace(-170, 170, n_rows) + 5 * n
+        sla = 0.01 * np.arange(n_rows) + n
+        passes.append(np.column_stack([time, lat, lon, sla]))
+    return passes
+
+
+def write_asc(file_path, passes:list, cycle:int=178)->str:
+    ''' Function to write passes (arrays with rows time, lat, lon, sla) as a RADS .asc file. '''
+    with open(file_path, 'w') as f:
+        for n, rows in enumerate(passes):
+            f.write('# RADS_ASC\n# Satellite = TEST\n')
+            f.write(f'# Cycle     = {cycle}\n# Pass      = {n + 1:04}\n')
+            f.write(f'# Equ_time  = {rows[len(rows) // 2, 0]:.6f} (date)\n# Equ_lon   = {rows[len(rows) // 2, 2]:.6f}\n')
+            f.write('# Col  1    = time [seconds since 1985-01-01 00:00:00 UTC]\n')
+            for row in rows:
+                f.write(f'{row[0]:.6f} {row[1]:10.6f} {row[2]:11.6f} {row[3]:8.4f}\n')
+    return str(file_path)
+
+
+def write_nc(file_path, passes:list)->str:
+    ''' Function to write passes as a RADS .nc file (one row dimension, no pass headers). '''
+    rows = np.concatenate(passes)
+    ds = nc.Dataset(file_path, 'w')
+    ds.createDimension('time', len(rows))
+    for i, name in enumerate(('time', 'lat', 'lon', 'sla')):
+        ds.createVariable(name, 'f8', ('time',))[:] = rows[:, i]
+    ds.close()
+    return str(file_path)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+import datetime_tools as dt_extra
+
+
+seconds = np.array([0.0, 86399.4, 86399.6, 7.5e8 + 0.25, 1.2e9, 946684800.0])
+
+
+def test_time_dates_match_the_scalar_version():
+    assert dt_extra.get_time_dates(seconds) == [dt_extra.get_time_date(s) for s in seconds.tolist()]
+
+
+def test_dates_match_the_scalar_version():
+    day, month, year = dt_extra.get_dates(seconds)
+    for s, date in zip(seconds.tolist(), zip(day.tolist(), month.tolist(), year.tolist())):
+        assert dt_extra.get_time_date(s).split()[1] == '{:02}/{:02}/{}'.format(*date)
+
+
+@pytest.mark.parametrize('function', [dt_extra.get_datetime64, dt_extra.get_time_dates, dt_extra.get_dates])
+@pytest.mark.parametrize('bad', [np.nan, np.inf])
+def test_times_without_a_date_are_rejected(function, bad):
+    with pytest.raises(ValueError):
+        function(np.array([0.0, bad]))
+
+
+def test_nan_times_are_rejected_as_by_the_scalar_version():
+    with pytest.raises(ValueError):
+        dt_extra.get_time_date(np.nan)
+    with pytest.raises(ValueError):
+        dt_extra.get_time_dates([np.nan])
+
+
+def test_leap_years_do_not_change_other_years():
+    # the days of February of a leap year used to be written into the shared month table
+    assert dt_extra.get_day_num([1, 3, 2023]) == 60
+    assert dt_extra.get_day_num([1, 3, 2024]) == 61
+    assert dt_extra.inv_day_number(60, 2024) == [29, 2, 2024]
+    assert dt_extra.get_day_num([1, 3, 2023]) == 60
+    assert dt_extra.inv_day_number(60, 2023) == [1, 3, 2023]
+    assert dt_extra.get_next_day([28, 2, 2023]) == [1, 3, 2023]
+    assert dt_extra.months[1] == 28
@@ -0,0 +1,99 @@
+import gzip
+import os
+import threading
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+
+import gim_tools
+
+
+class Handler(SimpleHTTPRequestHandler):
+    ''' Serves the files of a directory, marking .gz files with Content-Encoding gzip if their name says so. '''
+    def end_headers(self):
+        if 'encoded' in self.path:
+            self.send_header('Content-Encoding', 'gzip')
+        super().end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    served = tmp_path / 'served'
+    served.mkdir()
+    httpd = HTTPServer(('127.0.0.1', 0), partial(Handler, directory=str(served)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield served, f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def save_dir(tmp_path):
+    save_dir = tmp_path / 'saved'
+    save_dir.mkdir()
+    return str(save_dir)
+
+
+content = bytes(range(256)) * 4096
+
+
+@pytest.mark.parametrize('fname', ['file.nc.gz', 'encoded.nc.gz'])
+def test_gz_files_are_inflated_while_downloading(server, save_dir, fname):
+    served, url = server
+    (served / fname).write_bytes(gzip.compress(content))
+
+    file_path = gim_tools.download_file(f'{url}/{fname}', save_dir=save_dir, unzip=True, chunk_size=1000)
+
+    assert os.path.split(file_path)[-1] == fname[:-3]
+    assert open(file_path, 'rb').read() == content
+    assert gim_tools.GIM_file_valid(file_path, verify=True)
+
+
+def test_files_are_stored_as_served(server, save_dir):
+    served, url = server
+    (served / 'encoded.nc.gz').write_bytes(gzip.compress(content))
+
+    file_path = gim_tools.download_file(f'{url}/encoded.nc.gz', save_dir=save_dir)
+
+    assert open(file_path, 'rb').read() == gzip.compress(content)
+
+
+def test_truncated_gz_files_leave_nothing_behind(server, save_dir):
+    served, url = server
+    (served / 'file.nc.gz').write_bytes(gzip.compress(content)[:-100])
+
+    with pytest.raises(EOFError):
+        gim_tools.download_file(f'{url}/file.nc.gz', save_dir=save_dir, unzip=True)
+    assert os.listdir(save_dir) == []
+
+
+def test_archives_are_inflated_chunk_by_chunk_without_writing_them(server, save_dir, monkeypatch):
+    served, url = server
+    content = os.urandom(300000)
+    archive = gzip.compress(content)
+    (served / 'file.nc.gz').write_bytes(archive)
+
+    chunks = []
+    decompressobj = gim_tools.zlib.decompressobj
+
+    class Inflater:
+        def __init__(self, *args, **kwargs):
+            self.inflater = decompressobj(*args, **kwargs)
+        def decompress(self, chunk):
+            chunks.append(len(chunk))
+            # nothing but the temporary file is written while inflating
+            assert all(name.endswith('.part') for name in os.listdir(save_dir))
+            return self.inflater.decompress(chunk)
+        def __getattr__(self, name):
+            return getattr(self.inflater, name)
+    monkeypatch.setattr(gim_tools.zlib, 'decompressobj', Inflater)
+
+    file_path = gim_tools.download_file(f'{url}/file.nc.gz', save_dir=save_dir, unzip=True, chunk_size=4096)
+    assert open(file_path, 'rb').read() == content
+    assert max(chunks) <= 4096 and sum(chunks) == len(archive) and len(chunks) > 1
+    assert not any(name.endswith('.gz') for name in os.listdir(save_dir))
@@ -0,0 +1,136 @@
+import time as tm
+
+import numpy as np
+import pytest
+
+import gim_tools
+import tec_interpolation
+
+
+def fake_cube(date, next_day=False, save_dir=None):
+    ''' A cube of date whose maps equal day + timeslot / 100. '''
+    cube = np.broadcast_to((date[0] + np.arange(96) / 100).astype(np.float32)[:, None, None], (96, 180, 360))
+    if next_day:
+        cube = np.concatenate((cube, fake_cube([date[0] + 1, *date[1:]])[:1]))
+    return cube
+
+
+@pytest.fixture
+def cubes(monkeypatch):
+    monkeypatch.setattr(gim_tools, 'get_GIM_cube', fake_cube)
+
+
+def test_no_maps_are_shared_without_groups():
+    shm, shape, dtype, rows = tec_interpolation.share_GIM_maps({}.keys())
+    try:
+        assert shape == (0, 180, 360) and rows == {}
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_shared_maps_are_float32_and_stored_once(cubes):
+    keys = [((1, 2, 2010), (40,)), ((1, 2, 2010), (40, 41)), ((1, 2, 2010), (95, 96))]
+    shm, shape, dtype, rows = tec_interpolation.share_GIM_maps(keys)
+    try:
+        maps = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        assert dtype == np.float32 and shape[0] == 4
+        assert rows[keys[1]] == [rows[keys[0]][0], rows[keys[1]][1]]
+        assert maps[rows[keys[2]], 0, 0].tolist() == pytest.approx([1.95, 2.0])
+        del maps
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_parallel_epochs_match_serial_epochs(cubes):
+    times = np.array(['10:00:00 01/02/2010', '10:07:30 01/02/2010', '23:50:00 02/02/2010', '10:07:30 01/02/2010'])
+    lon, lat = np.array([10.2, -50.3, 100.1, 3.3]), np.array([5.5, -20.7, 60.2, 0.1])
+    groups = tec_interpolation.group_by_epoch(times)
+
+    def run(epochs):
+        tec = np.full(times.size, np.nan)
+        for indices, tec_group, failed in epochs:
+            tec[indices] = tec_group
+        return tec
+
+    serial = run(tec_interpolation.serial_epochs(groups, lon, lat, times, method='bilinear'))
+    parallel = run(tec_interpolation.parallel_epochs(groups, lon, lat, times, workers=1, method='bilinear'))
+    assert np.allclose(serial, parallel)
+    assert serial[0] == pytest.approx(1.40)
+
+
+def test_the_pipeline_loads_at_most_prefetch_days_ahead(monkeypatch):
+    events = []
+
+    def load(date, next_day=False, save_dir=None):
+        events.append('load')
+        return fake_cube(date, next_day)
+
+    def interpolate(day_groups, lon_array, lat_array, sat_date_list, **kwargs):
+        tm.sleep(0.05)
+        for indices in day_groups.values():
+            yield indices, np.zeros(indices.size), np.zeros(indices.size, dtype=bool)
+        events.append('done')
+
+    monkeypatch.setattr(gim_tools, 'get_GIM_cube', load)
+    monkeypatch.setattr(tec_interpolation, 'serial_epochs', interpolate)
+    times = np.array([f'10:00:00 0{day}/02/2010' for day in range(1, 6)])
+    groups = tec_interpolation.group_by_epoch(times)
+
+    collected = []
+    tec_interpolation.run_pipeline(tec_interpolation.pipeline_epochs(groups, np.zeros(5), np.zeros(5), times, 
+                                                                     lambda *result: collected.append(result), prefetch=1))
+
+    assert len(collected) == 5
+    # besides the day being interpolated, at most one day is loaded ahead
+    for n in range(len(events)):
+        assert events[:n+1].count('load') - events[:n+1].count('done') <= 2
+
+
+def test_the_pipeline_uses_one_pool_for_all_days(cubes, monkeypatch):
+    pools = []
+
+    class Pool(tec_interpolation.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+    monkeypatch.setattr(tec_interpolation, 'ProcessPoolExecutor', Pool)
+
+    times = np.array(['10:00:00 01/02/2010', '10:07:30 02/02/2010', '23:50:00 03/02/2010'])
+    lon, lat = np.array([10.2, -50.3, 100.1]), np.array([5.5, -20.7, 60.2])
+    groups = tec_interpolation.group_by_epoch(times)
+
+    tec = np.full(times.size, np.nan)
+    def collect(indices, tec_group, failed):
+        tec[indices] = tec_group
+    tec_interpolation.run_pipeline(tec_interpolation.pipeline_epochs(groups, lon, lat, times, collect, 
+                                                                     workers=2, method='bilinear'))
+
+    assert len(pools) == 1
+    assert tec.tolist() == pytest.approx([1.40, 2.405, 3.9667], abs=1e-3)
+
+
+def test_mass_interpolate_with_workers_matches_serial(cubes, monkeypatch):
+    monkeypatch.setattr(gim_tools, 'fetch_GIM_files', lambda *args, **kwargs: None)
+    times = np.array(['10:00:00 01/02/2010', '10:07:30 01/02/2010', '23:50:00 02/02/2010', '10:07:30 01/02/2010'])
+    lon, lat = np.array([10.2, -50.3, 100.1, 3.3]), np.array([5.5, -20.7, 60.2, 0.1])
+
+    serial = tec_interpolation.mass_interpolate(lon, lat, times, method='bilinear', del_temp=False)
+    parallel = tec_interpolation.mass_interpolate(lon, lat, times, method='bilinear', del_temp=False, workers=2)
+    assert np.allclose(serial[0], parallel[0]) and serial[1] == parallel[1] == []
+    assert serial[0][0] == pytest.approx(1.40)
+
+
+def test_the_pipeline_is_opt_in(cubes, monkeypatch):
+    monkeypatch.setattr(gim_tools, 'fetch_GIM_files', lambda *args, **kwargs: None)
+    times = np.array(['10:00:00 01/02/2010', '23:50:00 02/02/2010'])
+    lon, lat = np.array([10.2, 100.1]), np.array([5.5, 60.2])
+    pipelined = tec_interpolation.mass_interpolate(lon, lat, times, method='bilinear', del_temp=False, prefetch=1)
+
+    def no_pipeline(coroutine):
+        coroutine.close()
+        raise AssertionError('The pipeline is used without prefetch')
+    monkeypatch.setattr(tec_interpolation, 'run_pipeline', no_pipeline)
+    serial = tec_interpolation.mass_interpolate(lon, lat, times, method='bilinear', del_temp=False)
+    assert np.allclose(serial[0], pipelined[0])
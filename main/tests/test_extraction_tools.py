@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import datetime_tools as dt_extra
+from extraction_tools import Extraction, concatenate
+from tec_interpolation import delete_failed_indices
+
+
+def make_extraction(n:int=5, as_seconds:bool=False)->Extraction:
+    seconds = 1.2e9 + 10 * np.arange(n)
+    return Extraction(np.linspace(-10, 10, n), np.linspace(0, 40, n), np.arange(n, dtype=float), 
+                      seconds=seconds, as_seconds=as_seconds)
+
+
+def test_time_strings_are_lazy_and_match_the_seconds():
+    extraction = make_extraction()
+    assert extraction._time_str is None
+    assert extraction.time.tolist() == dt_extra.get_time_dates(extraction.seconds)
+
+
+@pytest.mark.parametrize('as_seconds', [False, True])
+def test_times_are_read_only_views_of_the_column(as_seconds):
+    extraction = make_extraction(as_seconds=as_seconds)
+    time = extraction.time
+    with pytest.raises(ValueError):
+        time[0] = time[1]
+    # reading the times does not copy the column
+    assert np.shares_memory(extraction.time, extraction[0]) and np.shares_memory(time, extraction.time)
+    assert extraction.time[0] == (1.2e9 if as_seconds else dt_extra.get_time_date(1.2e9))
+
+    # the failed points are deleted from a copy of the times
+    time, lat, lon, sla = delete_failed_indices([1, 3], *extraction)
+    assert len(time) == 3 and len(extraction.time) == 5
+
+
+def test_filters_share_the_columns_and_keep_the_rows():
+    extraction = make_extraction()
+    dropped = extraction.drop([0, 2])
+    assert dropped.size == 3 and dropped.sla.tolist() == [1, 3, 4]
+    assert dropped.take(np.array([2, 0])).sla.tolist() == [4, 1]
+    assert dropped.compact().valid is None and dropped.compact().sla.tolist() == [1, 3, 4]
+    assert extraction.size == 5
+
+
+def test_item_assignment_replaces_a_column():
+    extraction = make_extraction()
+    dropped = extraction.drop([0])
+
+    dropped[3] = np.zeros(4)
+    dropped[1:3] = [np.ones(4), 2 * np.ones(4)]
+    assert dropped.sla.tolist() == [0] * 4 and dropped.lat.tolist() == [1] * 4 and dropped.lon.tolist() == [2] * 4
+    # the extraction sharing the columns is not changed
+    assert extraction.sla.tolist() == [0, 1, 2, 3, 4] and extraction.lat[0] == -10
+
+    dropped[0] = extraction.seconds[1:] + 1
+    assert dropped.seconds.tolist() == (extraction.seconds[1:] + 1).tolist()
+    assert dropped.time.tolist() == dt_extra.get_time_dates(extraction.seconds[1:] + 1)
+
+    with pytest.raises(AssertionError):
+        dropped[2] = np.zeros(5)
+
+
+def test_item_assignment_of_time_strings():
+    extraction = make_extraction(n=2)
+    extraction[0] = ['00:00:00 01/01/1985', '00:00:10 01/01/1985']
+    assert extraction.seconds.tolist() == [0, 10]
+
+
+def test_concatenate():
+    first, second = make_extraction(n=3), make_extraction(n=2).drop([0])
+    extraction = concatenate([first, second], as_seconds=True)
+    assert extraction.sla.tolist() == [0, 1, 2, 1]
+    assert concatenate([]).size == 0
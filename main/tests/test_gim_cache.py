@@ -0,0 +1,106 @@
+import os
+import threading
+import time as tm
+
+import numpy as np
+import pytest
+
+import cache_tools
+import gim_tools
+
+
+def test_locks_hold_a_token_and_are_removed_by_their_owner(tmp_path):
+    file_path = str(tmp_path / 'file.nc')
+    with gim_tools.lock_file(file_path):
+        token, _ = gim_tools.read_lock(file_path + '.lock')
+        assert token.split()[0] == str(os.getpid())
+    assert not os.path.exists(file_path + '.lock')
+
+
+def test_locks_taken_over_are_not_removed(tmp_path):
+    file_path = str(tmp_path / 'file.nc')
+    with gim_tools.lock_file(file_path):
+        with open(file_path + '.lock', 'w') as f:
+            f.write('another owner')
+    assert gim_tools.read_lock(file_path + '.lock')[0] == 'another owner'
+
+
+def test_held_locks_are_touched_and_never_stale(tmp_path, monkeypatch):
+    monkeypatch.setattr(gim_tools, 'stale_lock_age', 0.4)
+    file_path = str(tmp_path / 'file.nc')
+    order = []
+
+    def second():
+        with gim_tools.lock_file(file_path, timeout=5):
+            order.append('second')
+
+    with gim_tools.lock_file(file_path):
+        thread = threading.Thread(target=second)
+        thread.start()
+        tm.sleep(1.2)
+        order.append('first')
+    thread.join()
+
+    assert order == ['first', 'second']
+
+
+def test_stale_locks_are_broken(tmp_path, monkeypatch):
+    monkeypatch.setattr(gim_tools, 'stale_lock_age', 0.2)
+    file_path = str(tmp_path / 'file.nc')
+    with open(file_path + '.lock', 'w') as f:
+        f.write('crashed owner')
+    tm.sleep(0.3)
+
+    with gim_tools.lock_file(file_path, timeout=2):
+        assert gim_tools.read_lock(file_path + '.lock')[0] != 'crashed owner'
+
+
+def test_the_cache_is_only_scanned_after_downloads(tmp_path, monkeypatch):
+    scans = []
+    monkeypatch.setattr(gim_tools, 'evict_GIM_files', lambda save_dir: scans.append(save_dir))
+    monkeypatch.setattr(gim_tools, 'get_GIM_epoch', lambda date, timeslots, save_dir: (np.zeros((180, 360)), '10:00:00'))
+    save_dir = str(tmp_path)
+
+    gim_tools.get_GIM('10:00:00 01/02/2010', save_dir=save_dir)
+    gim_tools._grown_dirs.add(save_dir)
+    gim_tools.get_GIM('10:00:00 01/02/2010', save_dir=save_dir)
+    gim_tools.get_GIM('10:00:00 01/02/2010', save_dir=save_dir)
+
+    assert scans == [save_dir]
+
+
+@pytest.fixture
+def gim_files(monkeypatch):
+    ''' Days served from "files" whose maps equal day + epoch / 100, counting the reads. '''
+    reads = []
+    monkeypatch.setattr(gim_tools, 'gim_cache', cache_tools.LRUCache(max_bytes=2 * 96*180*360*4))
+    monkeypatch.setattr(gim_tools.gim_store, 'read_day', lambda date: None)
+    monkeypatch.setattr(gim_tools, 'fetch_GIM_files', lambda time_date, save_dir=None: time_date)
+
+    def read_tecmap(time_date):
+        reads.append(time_date)
+        day = int(time_date.split()[1].split('/')[0])
+        return np.broadcast_to((day + np.arange(96) / 100).astype(np.float32)[:, None, None], (96, 180, 360))
+    monkeypatch.setattr(gim_tools.gim_store, 'read_tecmap', read_tecmap)
+    return reads
+
+
+def test_daily_cubes_are_read_once_and_served_from_memory(gim_files):
+    maps, times = gim_tools.get_GIM('10:00:00 01/02/2010', del_temp=False)
+    assert maps[0, 0] == pytest.approx(1.40) and times == '10:00:00'
+    maps, times = gim_tools.get_GIM('10:07:30 01/02/2010', del_temp=False)
+    assert maps[:, 0, 0].tolist() == pytest.approx([1.40, 1.41]) and list(times) == ['10:00:00', '10:15:00']
+    assert gim_files == ['00:00:00 1/2/2010']
+
+
+def test_the_map_of_midnight_is_taken_from_the_next_day(gim_files):
+    maps, times = gim_tools.get_GIM('23:50:00 01/02/2010', del_temp=False)
+    assert maps[:, 0, 0].tolist() == pytest.approx([1.95, 2.0])
+    assert gim_files == ['00:00:00 1/2/2010', '00:00:00 2/2/2010']
+
+
+def test_the_least_recently_used_cubes_are_evicted(gim_files):
+    for day in (1, 2, 1, 3, 1, 2):
+        gim_tools.get_GIM(f'10:00:00 0{day}/02/2010', del_temp=False)
+    # the cache holds two cubes: day 2 was evicted by day 3, day 3 by day 2
+    assert [int(time_date.split()[1].split('/')[0]) for time_date in gim_files] == [1, 2, 3, 2]
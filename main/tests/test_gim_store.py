@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import netCDF4 as nc
+import pytest
+
+import datetime_tools as dt_extra
+import gim_store
+import gim_tools
+
+
+def make_GIM_file(directory, date, value):
+    ''' A jpld file of date whose maps equal value + timeslot, with one masked cell. '''
+    file_path = os.path.join(directory, f'jpld{dt_extra.get_day_num(date):>03}0.{str(date[2])[-2:]}i.nc')
+    ds = nc.Dataset(file_path, 'w')
+    ds.createDimension('time', 96)
+    ds.createDimension('lat', 180)
+    ds.createDimension('lon', 360)
+    tecmap = ds.createVariable('tecmap', 'f8', ('time', 'lat', 'lon'), fill_value=-1.0)
+    data = np.ma.masked_array(np.broadcast_to(value + np.arange(96.0)[:, None, None], (96, 180, 360)).copy())
+    data[:, 0, 0] = np.ma.masked
+    tecmap[:] = data
+    ds.close()
+    return file_path
+
+
+@pytest.fixture
+def store(tmp_path):
+    store_dir = str(tmp_path / 'store')
+    yield store_dir
+    gim_store._stores.pop(store_dir, None)
+
+
+def test_days_are_read_as_float32_with_nan(tmp_path, store):
+    gim_store.build_store([make_GIM_file(tmp_path, [1, 2, 2010], 10)], store)
+    cube = gim_store.read_day([1, 2, 2010], store)
+
+    assert cube.dtype == np.float32 and cube.shape == (96, 180, 360)
+    assert np.isnan(cube[:, 0, 0]).all()
+    assert cube[5, 1, 1] == 15
+    assert gim_store.read_day([2, 2, 2010], store) is None
+
+
+def test_new_days_at_the_back_are_written_in_place(tmp_path, store):
+    index = gim_store.build_store([make_GIM_file(tmp_path, [1, 2, 2010], 10)], store)
+    grown = gim_store.build_store([make_GIM_file(tmp_path, [3, 2, 2010], 30)], store)
+
+    assert grown['cube'] == index['cube'] and grown['n_days'] == 3
+    assert gim_store.read_day([3, 2, 2010], store)[0, 1, 1] == 30
+    assert gim_store.read_day([2, 2, 2010], store) is None
+
+
+@pytest.mark.parametrize('date', [[1, 2, 2010], [30, 1, 2010]], ids=['overwrite', 'front'])
+def test_visible_days_are_never_written_in_place(tmp_path, store, date):
+    index = gim_store.build_store([make_GIM_file(tmp_path, [1, 2, 2010], 10)], store)
+    before = gim_store.read_day([1, 2, 2010], store)
+
+    other = tmp_path / 'other'
+    other.mkdir()
+    new_index = gim_store.build_store([make_GIM_file(other, date, 50)], store)
+
+    # the view opened before the build still shows the old data
+    assert new_index['cube'] != index['cube']
+    assert before[0, 1, 1] == 10
+    assert not os.path.exists(os.path.join(store, index['cube']))
+    assert gim_store.read_day(date, store)[0, 1, 1] == 50
+
+
+def test_store_and_file_give_the_same_cube(tmp_path, store, monkeypatch):
+    file_path = make_GIM_file(tmp_path, [1, 2, 2010], 10)
+    gim_store.build_store([file_path], store)
+    from_store = gim_store.read_day([1, 2, 2010], store)
+
+    monkeypatch.setattr(gim_store, 'read_day', lambda date: None)
+    monkeypatch.setattr(gim_tools, 'fetch_GIM_files', lambda *args, **kwargs: file_path)
+    gim_tools.gim_cache.clear()
+    from_file = gim_tools.get_GIM_cube([1, 2, 2010], save_dir=str(tmp_path))
+    gim_tools.gim_cache.clear()
+
+    assert from_file.dtype == from_store.dtype
+    assert np.array_equal(from_file, from_store, equal_nan=True)
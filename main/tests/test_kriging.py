@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import benchmark_interpolation
+import tec_interpolation
+
+
+@pytest.mark.parametrize('engine', ['pykrige', 'native'])
+def test_batch_kriging_matches_tec_kriging(engine, smooth_map):
+    gim = smooth_map
+    lon, lat = np.array([20.3, -120.7, 75.1]), np.array([10.2, -40.6, 62.9])
+    params = [30.0, 1500.0, 0.1]
+    for i in range(lon.size):
+        key = tec_interpolation.variogram_key('map', lat[i], 180, 75, 800, 40, 'nearest')
+        tec_interpolation.variogram_cache.put(key, params)
+
+    z_batch = tec_interpolation.batch_kriging(gim, lon, lat, variogram_parameters=params, radius=800, max_points=40)
+    z_point = [tec_interpolation.tec_kriging(gim, lon[i], lat[i], radius=800, max_points=40, selection='nearest',
+                                             variogram_band=180, engine=engine, gim_key='map')[0]
+               for i in range(lon.size)]
+
+    assert np.allclose(z_batch, z_point, rtol=0, atol=1e-8)
+
+
+def test_tec_kriging_evaluates_at_lon_lat():
+    # a map varying with longitude only, so a swapped (lat, lon) target is far off
+    gim = np.tile(np.arange(-179.5, 180), (180, 1)) + 200
+    z = tec_interpolation.tec_kriging(gim, 40.5, -10.5, radius=600, max_points=40, selection='nearest')[0]
+    assert z == pytest.approx(240, abs=1)
+
+
+def test_epoch_interpolation_only_fails_on_errors(monkeypatch):
+    def kriging(gim_matrix, lon, lat, **kwargs):
+        if lon == 0:
+            raise ValueError('no neighbours')
+        if lon == 1:
+            return np.ma.masked_array([0.0], mask=[True])
+        return np.ma.masked_array([lon], mask=[False])
+    monkeypatch.setattr(tec_interpolation, 'tec_kriging', kriging)
+
+    gim_maps = np.zeros((180, 360))
+    tec, failed = tec_interpolation.epoch_interpolation(np.array([0.0, 1.0, 2.0]), np.zeros(3), ['10:00:00 01/02/2010'] * 3,
+                                                        gim_maps=gim_maps, times_str='10:00:00')
+
+    assert failed.tolist() == [True, False, False]
+    assert np.isnan(tec[:2]).all() and tec[2] == 2.0
+
+
+@pytest.mark.parametrize('method', ['bilinear', 'bicubic', 'idw'])
+def test_nan_coordinates_are_masked(method, smooth_map):
+    gim = smooth_map
+    lon, lat = np.array([20.3, np.nan, 75.1, 10.0]), np.array([10.2, 5.0, np.nan, -30.4])
+    z = tec_interpolation.grid_interpolation(gim, lon, lat, method=method)
+    valid = tec_interpolation.grid_interpolation(gim, lon[[0, 3]], lat[[0, 3]], method=method)
+
+    assert np.isnan(z[1:3]).all()
+    assert np.allclose(z[[0, 3]], valid)
+
+    # the other points of the epoch group are interpolated
+    tec, failed = tec_interpolation.epoch_interpolation(lon, lat, ['10:00:00 01/02/2010'] * 4, method=method,
+                                                        gim_maps=gim, times_str='10:00:00')
+    assert not failed.any() and np.allclose(tec[[0, 3]], valid) and np.isnan(tec[1:3]).all()
+
+
+@pytest.mark.parametrize('engine', ['pykrige', 'native', 'batch'])
+def test_kriging_at_a_grid_node_returns_its_value(engine):
+    # an asymmetric map: swapping longitude and latitude, or flipping an axis, gives another value
+    gim = np.random.default_rng(1).uniform(0, 100, (180, 360))
+    lon, lat = 40.5, -10.5
+    node = gim[int(89.5 - lat), int(179.5 + lon)]
+    assert node != gim[int(89.5 - lon), int(179.5 + lat)] and node != gim[int(89.5 + lat), int(179.5 + lon)]
+
+    params = [30.0, 1500.0, 0.1]
+    if engine == 'batch':
+        z = tec_interpolation.batch_kriging(gim, np.array([lon]), np.array([lat]), variogram_parameters=params, 
+                                            radius=600, max_points=40)[0]
+    else:
+        key = tec_interpolation.variogram_key('map', lat, 180, 75, 600, 40, 'nearest')
+        tec_interpolation.variogram_cache.put(key, params)
+        z = tec_interpolation.tec_kriging(gim, lon, lat, radius=600, max_points=40, selection='nearest', 
+                                          variogram_band=180, engine=engine, gim_key='map')[0]
+    assert z == pytest.approx(node, abs=1e-6)
+
+
+def test_gathers_match_the_append_loops():
+    # the append loops are the ones the gathers replaced (see benchmark_interpolation)
+    rng = np.random.default_rng(1)
+    gim = rng.uniform(0, 100, (180, 360))
+    lon = np.concatenate([rng.uniform(-180, 180, 500), [-180, -179.5, -0.5, 0, 179.4, 179.9]])
+    lat = np.concatenate([rng.uniform(-90, 90, 500), [-90, -89.6, 0, 0.4, 89.4, 89.9]])
+    x, y = (179.5 + lon).astype(int), abs(lat - 89.5).astype(int)
+
+    z = tec_interpolation.tec(gim, x, y)
+    assert np.array_equal(z, benchmark_interpolation.append_tec(gim, x, y))
+    lon_geo, lat_geo = tec_interpolation.index_to_geo(x, y)
+    lon_append, lat_append = benchmark_interpolation.append_index_to_geo(x, y)
+    assert np.array_equal(lon_geo, lon_append) and np.array_equal(lat_geo, lat_append)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+import tec_interpolation
+
+
+def test_positional_arguments_keep_their_meaning():
+    lat_array = np.arange(-89.5, 89.5+1, 1)
+    lon_array = np.arange(-179.5, 179.5+1, 1)
+    by_position = tec_interpolation.get_coord_around_pt(10, 20, 500, 50, lat_array, lon_array)
+    by_name = tec_interpolation.get_coord_around_pt(10, 20, 500, max_size=50, lat_array=lat_array, lon_array=lon_array)
+    assert by_position[0].size == by_name[0].size == 50
+
+
+def test_nearest_selection_is_deterministic_and_ordered():
+    lat1, lon1 = tec_interpolation.get_coord_around_pt(10, 20, 800, 30, selection='nearest')
+    lat2, lon2 = tec_interpolation.get_coord_around_pt(10, 20, 800, 30, selection='nearest')
+    assert np.array_equal(lat1, lat2) and np.array_equal(lon1, lon2)
+
+    distance = np.hypot(lat1 - 10, (lon1 - 20) * np.cos(np.deg2rad(10)))
+    assert distance[0] <= distance[-1]
+
+
+def brute_force_neighbourhood(c_lat, c_lon, R_tspot, R_earth=6378):
+    ''' The scan of all grid cells of the baseline get_coord_around_pt (without thinning). '''
+    lon, lat = np.meshgrid(np.arange(-179.5, 179.5+1, 1), np.arange(-89.5, 89.5+1, 1))
+    c_vec = np.array(tec_interpolation.geo_to_cartesian_vec(c_lat, c_lon))
+    u = np.rollaxis(np.array(tec_interpolation.geo_to_cartesian_vec(lat, lon)), 0, 3)
+    condition = np.arccos(np.inner(u, c_vec)) < R_tspot / R_earth
+    return lat[condition], lon[condition]
+
+
+@pytest.mark.parametrize('radius', [300, 500, 1500])
+@pytest.mark.parametrize('c_lat, c_lon', [(0, 0), (10.2, 20.3), (-33.3, 179.9), (5.5, -180), (0, 180),
+                                          (-45.1, -179.6), (89.9, 0), (88.4, 123.4), (-89.5, -179.5), (-86.7, 30)])
+def test_the_index_finds_the_cells_of_the_scan(c_lat, c_lon, radius):
+    expected = set(zip(*brute_force_neighbourhood(c_lat, c_lon, radius)))
+    found = set(zip(*tec_interpolation.get_coord_around_pt(c_lat, c_lon, radius, max_size=10**6)))
+    assert found == expected and len(expected) > 0
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import rads_catalog
+import rads_extraction
+from rads_files import make_passes, write_asc, write_nc
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(rads_extraction, 'rads_cache_dir', str(tmp_path / 'rads_cache'))
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    directory = tmp_path / 'RADS'
+    directory.mkdir()
+    write_asc(directory / 'c2_test.asc', make_passes(n_passes=4))
+    write_nc(directory / 'j3_test.nc', make_passes(n_passes=3, t0=1.3e9))
+    return rads_catalog.build_catalog(str(directory), catalog_path=None)
+
+
+def no_pass_table(*args, **kwargs):
+    raise AssertionError('The pass table of the file is rebuilt')
+
+
+def test_catalog_lists_the_passes_of_all_files(catalog):
+    assert catalog['passes']['file'].tolist() == [0, 0, 0, 0, 1, 1, 1]
+    assert catalog['passes']['byte_offset'][:4].tolist()[0] == 0
+    assert (catalog['passes']['byte_offset'][:4] > 0).sum() == 3
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_extract_reads_the_selected_passes_through_their_offsets(catalog, monkeypatch, cached):
+    if cached:
+        rads_extraction.load_asc(catalog['files'][0])
+    monkeypatch.setattr(rads_extraction, 'pass_table', no_pass_table)
+    monkeypatch.setattr(rads_extraction, 'read_asc', no_pass_table)
+
+    # .nc files have no pass numbers, their passes are selected by time
+    asc, nc = make_passes(n_passes=4), make_passes(n_passes=3, t0=1.3e9)
+    by_number = rads_catalog.extract(catalog, as_seconds=True, pass_number=[2, 3])
+    by_time = rads_catalog.extract(catalog, as_seconds=True, time=(nc[1][0, 0], nc[2][-1, 0]))
+
+    for extraction, expected in ((by_number, np.concatenate(asc[1:3])), (by_time, np.concatenate(nc[1:3]))):
+        assert np.array_equal(extraction.seconds, expected[:, 0])
+        assert np.allclose(extraction.sla, expected[:, 3])
+        assert np.allclose(extraction.lon, rads_extraction.convert_longitudes_to_0_360(expected[:, 2]))
+
+
+def test_extract_applies_the_row_filter(catalog, monkeypatch):
+    full = rads_catalog.extract(catalog, as_seconds=True)
+    monkeypatch.setattr(rads_extraction, 'pass_table', no_pass_table)
+
+    extraction = rads_catalog.extract(catalog, as_seconds=True, where={'max_lat': 30})
+    assert np.array_equal(extraction.seconds, full.seconds[np.abs(full.lat) <= 30])
+    assert np.array_equal(extraction.sla, full.sla[np.abs(full.lat) <= 30])
+
+
+def test_extract_without_matching_passes_is_empty(catalog):
+    assert rads_catalog.extract(catalog, cycle=1).size == 0
+
+
+def test_nc_rows_are_read_in_runs():
+    variable = np.arange(100.0)
+    rows = np.array([1, 2, 3, 50, 51, 99])
+    assert rads_extraction.read_nc_rows(variable, rows, max_gap=10).tolist() == rows.tolist()
+    assert rads_extraction.read_nc_rows(variable, np.array([], dtype=int)).size == 0
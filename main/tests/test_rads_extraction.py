@@ -0,0 +1,270 @@
+import os
+
+import numpy as np
+import pytest
+
+import datetime_tools as dt_extra
+import rads_extraction
+from extraction_tools import Extraction
+from rads_files import make_passes, write_asc, write_nc
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(rads_extraction, 'rads_cache_dir', str(tmp_path / 'rads_cache'))
+
+
+def test_asc_files_are_split_at_the_headers(tmp_path):
+    passes = make_passes()
+    rads = rads_extraction.read_asc(write_asc(tmp_path / 'j3_test.asc', passes))
+
+    assert rads['offsets'].tolist() == [0, 20, 40, 60]
+    assert rads['meta']['pass'].tolist() == [1, 2, 3] and (rads['meta']['cycle'] == 178).all()
+    assert np.allclose(rads['sla'], np.concatenate(passes)[:, 3])
+
+
+@pytest.mark.parametrize('ext', ['.asc', '.nc'])
+def test_pass_tables_split_the_passes(tmp_path, ext):
+    passes = make_passes(n_passes=4)
+    write = write_asc if ext == '.asc' else write_nc
+    table = rads_extraction.pass_table(write(tmp_path / f'j3_test{ext}', passes))
+
+    assert table['row_start'].tolist() == [0, 20, 40, 60] and table['row_end'].tolist() == [20, 40, 60, 80]
+    assert table['t_start'].tolist() == [rows[0, 0] for rows in passes]
+    assert (table['satellite'] == 'j3').all()
+
+
+def test_nc_passes_are_split_where_the_latitude_turns(tmp_path):
+    passes = make_passes(n_passes=2)
+    # no gap in time, the second pass goes down from just below the top of the first
+    passes[1][:, 0] = passes[0][-1, 0] + 10 * np.arange(1, 21)
+    passes[1][:, 1] -= 1
+    table = rads_extraction.pass_table(write_nc(tmp_path / 'j3_test.nc', passes))
+    assert table['row_start'].tolist() == [0, 20]
+
+
+@pytest.mark.parametrize('cache', [True, False])
+def test_passes_are_extracted_by_ordinal(tmp_path, cache):
+    passes = make_passes()
+    file_path = write_asc(tmp_path / 'j3_test.asc', passes)
+
+    extraction = rads_extraction.extract_rads(file_path, pass_n=[3, 1], as_seconds=True, cache=cache)
+    assert np.allclose(extraction.seconds, np.concatenate([passes[2], passes[0]])[:, 0])
+    single = rads_extraction.extract_rads(file_path, pass_n=2, cache=cache)
+    assert np.allclose(single.sla, passes[1][:, 3])
+
+
+def test_no_passes_give_an_empty_extraction(tmp_path):
+    file_path = write_asc(tmp_path / 'j3_test.asc', make_passes())
+    empty_file = write_asc(tmp_path / 'j3_empty.asc', [])
+
+    for extraction in (rads_extraction.extract_rads(file_path, pass_n=[]), 
+                       rads_extraction.extract_rads(empty_file), 
+                       rads_extraction.extract_rads(file_path, query={'cycle': 1})):
+        assert extraction.size == 0 and extraction.time.size == 0
+
+
+def test_the_cache_holds_the_file_columns_only(tmp_path):
+    rads = rads_extraction.load_asc(write_asc(tmp_path / 'j3_test.asc', make_passes()))
+    assert 'time_str' not in rads and 'lon360' not in rads
+    cached = rads_extraction.read_cached_asc(str(tmp_path / 'j3_test.asc'))
+    assert sorted(cached) == sorted(rads)
+
+
+def counting_read_asc(monkeypatch):
+    calls = []
+    read_asc = rads_extraction.read_asc
+    monkeypatch.setattr(rads_extraction, 'read_asc', lambda path: calls.append(path) or read_asc(path))
+    return calls
+
+
+def test_cached_asc_files_are_parsed_once(tmp_path, monkeypatch):
+    passes = make_passes()
+    file_path = write_asc(tmp_path / 'j3_test.asc', passes)
+    calls = counting_read_asc(monkeypatch)
+
+    first = rads_extraction.load_asc(file_path)
+    for mmap in (False, True):
+        rads = rads_extraction.load_asc(file_path, mmap=mmap)
+        assert all(np.array_equal(rads[name], first[name]) for name in first)
+    assert len(calls) == 1
+    assert np.allclose(rads['sla'], np.concatenate(passes)[:, 3])
+
+
+def test_changed_asc_files_are_parsed_again(tmp_path, monkeypatch):
+    file_path = write_asc(tmp_path / 'j3_test.asc', make_passes())
+    rads_extraction.load_asc(file_path)
+    calls = counting_read_asc(monkeypatch)
+
+    # the file is rewritten with other values and another modification time
+    passes = make_passes(n_passes=2)
+    for rows in passes:
+        rows[:, 3] += 7
+    write_asc(file_path, passes)
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    rads = rads_extraction.load_asc(file_path)
+    assert len(calls) == 1
+    assert rads['offsets'].tolist() == [0, 20, 40] and np.allclose(rads['sla'], np.concatenate(passes)[:, 3])
+
+    # entries of another cache format are rebuilt as well
+    monkeypatch.setattr(rads_extraction, 'asc_cache_format', rads_extraction.asc_cache_format + 1)
+    assert rads_extraction.read_cached_asc(file_path) is None
+    rads_extraction.load_asc(file_path)
+    assert len(calls) == 2 and rads_extraction.read_cached_asc(file_path) is not None
+
+
+@pytest.mark.parametrize('cache', [True, False])
+def test_row_filters_parse_asc_files_once(tmp_path, monkeypatch, cache):
+    passes = make_passes()
+    file_path = write_asc(tmp_path / 'j3_test.asc', passes)
+    calls = counting_read_asc(monkeypatch)
+
+    extraction = rads_extraction.extract_rads(file_path, where={'max_lat': 30}, query={'cycle': 178}, cache=cache)
+    rows = np.concatenate(passes)
+    rows = rows[np.abs(rows[:, 1]) <= 30]
+    assert len(calls) == 1
+    assert np.array_equal(extraction.seconds, rows[:, 0]) and np.allclose(extraction.sla, rows[:, 3])
+    # the time strings are made for the extracted rows
+    assert extraction.time.tolist() == dt_extra.get_time_dates(rows[:, 0])
+
+
+def test_nc_row_filters_read_the_columns_in_stages(tmp_path, monkeypatch):
+    passes = make_passes(n_passes=4)
+    file_path = write_nc(tmp_path / 'j3_test.nc', passes)
+    sizes = []
+    read_nc_rows = rads_extraction.read_nc_rows
+    monkeypatch.setattr(rads_extraction, 'read_nc_rows', 
+                        lambda variable, rows: sizes.append((variable.name, rows.size)) or read_nc_rows(variable, rows))
+
+    where = {'time': (passes[1][0, 0], passes[2][-1, 0]), 'max_lat': 30}
+    extraction = rads_extraction.extract_rads(file_path, where=where, as_seconds=True)
+    rows = np.concatenate(passes[1:3])
+    rows = rows[np.abs(rows[:, 1]) <= 30]
+    assert np.array_equal(extraction.seconds, rows[:, 0]) and np.allclose(extraction.sla, rows[:, 3])
+    assert sizes == [('time', 80), ('lat', 40), ('lon', rows.shape[0]), ('sla', rows.shape[0])]
+
+
+def extraction_of(seconds):
+    seconds = np.asarray(seconds, dtype=float)
+    return Extraction(seconds / 1e8, seconds / 1e7, seconds, seconds=seconds, as_seconds=True)
+
+
+def test_extractions_are_aligned_on_their_seconds():
+    # the second extraction is shuffled, misses a time, has an extra one and a repeated one;
+    # 0.5 s apart are different measurements
+    first = extraction_of([10, 10.5, 11, 12, 13])
+    second = extraction_of([13, 12, 12, 99, 10.5, 10])
+
+    aligned = rads_extraction.align_extractions(first, second)
+    assert [extraction.seconds.tolist() for extraction in aligned] == [[10, 10.5, 12, 13]] * 2
+    assert aligned[1].sla.tolist() == [10, 10.5, 12, 13]
+    # the time strings are not made to align the extractions
+    assert all(extraction._time_str is None for extraction in (first, second, *aligned))
+
+    assert rads_extraction.match_extractions(first, second).seconds.tolist() == [13, 12, 12, 10.5, 10]
+    assert rads_extraction.simplify_extraction(second).seconds.tolist() == [13, 12, 99, 10.5, 10]
+
+
+def test_lists_with_time_strings_are_aligned():
+    first = [['00:00:10 01/01/1985', '00:00:20 01/01/1985'], np.zeros(2), np.zeros(2), np.array([1.0, 2.0])]
+    second = [['00:00:20 01/01/1985', '00:00:30 01/01/1985'], np.zeros(2), np.zeros(2), np.array([3.0, 4.0])]
+    aligned = rads_extraction.align_extractions(first, second)
+    assert aligned[0][0] == aligned[1][0] == ['00:00:20 01/01/1985']
+    assert aligned[0][3].tolist() == [2.0] and aligned[1][3].tolist() == [3.0]
+
+
+@pytest.mark.parametrize('cache', [True, False])
+def test_a_pass_holds_only_its_own_rows(tmp_path, cache):
+    # the passes used to be read with max_rows counted in lines, so a pass also got 
+    # as many rows of the next pass as there are header lines
+    passes = make_passes(n_passes=3)
+    file_path = write_asc(tmp_path / 'j3_test.asc', passes)
+
+    for n, rows in enumerate(passes, start=1):
+        extraction = rads_extraction.extract_rads(file_path, pass_n=n, as_seconds=True, cache=cache)
+        assert np.array_equal(extraction.seconds, rows[:, 0])
+        assert np.allclose(extraction.sla, rows[:, 3])
+    with_max_lat = rads_extraction.extract_rads(file_path, pass_n=2, max_lat=30, as_seconds=True, cache=cache)
+    assert np.array_equal(with_max_lat.seconds, passes[1][np.abs(passes[1][:, 1]) <= 30, 0])
+
+
+def test_file_roles_come_from_the_filenames():
+    assert rads_extraction.file_role('data/s3a_240122_gim.asc') == ('s3a_240122', 'gim')
+    assert rads_extraction.file_role('s3a_240122_no_iono.nc') == ('s3a_240122', 'uncorrected')
+    assert rads_extraction.file_role('s3a_240122_noiono.asc') == ('s3a_240122', 'uncorrected')
+    assert rads_extraction.file_role('s3a_240122.asc') == ('s3a_240122', 'corrected')
+
+
+def batch_files(tmp_path):
+    ''' A corrected and an uncorrected .asc file of s3a (missing its last pass), and a corrected .nc file of j3. '''
+    passes = make_passes()
+    uncorrected = [rows.copy() for rows in passes[:2]]
+    for rows in uncorrected:
+        rows[:, 3] += 1
+    return passes, [write_asc(tmp_path / 's3a_240122.asc', passes), 
+                    write_asc(tmp_path / 's3a_240122_noiono.asc', uncorrected), 
+                    write_nc(tmp_path / 'j3_240122.nc', make_passes(n_passes=2, t0=1.3e9))]
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_files_are_extracted_concurrently_as_one_by_one(tmp_path, processes):
+    _, file_paths = batch_files(tmp_path)
+    extractions = rads_extraction.extract_rads_files(file_paths + file_paths[:1], workers=3, processes=processes, 
+                                                     max_lat=30, as_seconds=True)
+
+    assert list(extractions) == file_paths
+    for file_path in file_paths:
+        expected = rads_extraction.extract_rads(file_path, max_lat=30, as_seconds=True)
+        assert np.array_equal(extractions[file_path].seconds, expected.seconds)
+        assert np.array_equal(extractions[file_path].sla, expected.sla)
+
+
+def test_batches_are_aligned_per_group(tmp_path):
+    passes, file_paths = batch_files(tmp_path)
+    groups = rads_extraction.extract_rads_batch(file_paths, as_seconds=True, workers=3)
+
+    assert sorted(groups) == ['j3_240122', 's3a_240122']
+    corrected, uncorrected = groups['s3a_240122']
+    rows = np.concatenate(passes[:2])
+    assert np.array_equal(corrected.seconds, rows[:, 0]) and np.array_equal(uncorrected.seconds, rows[:, 0])
+    assert np.allclose(uncorrected.sla - corrected.sla, 1)
+    (j3,) = groups['j3_240122']
+    assert j3.size == 40
+
+
+def streamed_file(tmp_path, ext, cache):
+    passes = make_passes(n_passes=4)
+    file_path = (write_asc if ext == '.asc' else write_nc)(tmp_path / f'j3_test{ext}', passes)
+    if cache:
+        rads_extraction.load_asc(file_path)
+    return passes, file_path
+
+
+@pytest.mark.parametrize('ext, cache', [('.asc', True), ('.asc', False), ('.nc', False)])
+def test_streamed_chunks_are_the_passes(tmp_path, ext, cache):
+    passes, file_path = streamed_file(tmp_path, ext, cache)
+    # blocks of 7 rows, so the passes span several blocks
+    chunks = list(rads_extraction.iter_rads(file_path, as_seconds=True, cache=cache, block_size=7))
+
+    assert [chunk.size for chunk in chunks] == [20] * 4
+    for chunk, rows in zip(chunks, passes):
+        assert np.array_equal(chunk.seconds, rows[:, 0]) and np.allclose(chunk.sla, rows[:, 3])
+        assert np.allclose(chunk.lon, rads_extraction.convert_longitudes_to_0_360(rows[:, 2]))
+
+
+@pytest.mark.parametrize('ext, cache', [('.asc', True), ('.asc', False), ('.nc', False)])
+def test_streamed_chunks_add_up_to_the_extraction(tmp_path, ext, cache):
+    _, file_path = streamed_file(tmp_path, ext, cache)
+    extraction = rads_extraction.extract_rads(file_path, as_seconds=True, cache=cache)
+
+    chunks = list(rads_extraction.iter_rads(file_path, chunk_size=15, as_seconds=True, cache=cache, block_size=7))
+    assert [chunk.size for chunk in chunks] == [15] * 5 + [5]
+    assert np.array_equal(np.concatenate([chunk.seconds for chunk in chunks]), extraction.seconds)
+    assert np.array_equal(np.concatenate([chunk.sla for chunk in chunks]), extraction.sla)
+
+    where = {'max_lat': 50, 'bbox': (-100, -90, 100, 90)}
+    filtered = rads_extraction.extract_rads(file_path, max_lat=30, where=where, as_seconds=True, cache=cache)
+    chunks = rads_extraction.iter_rads(file_path, max_lat=30, where=where, as_seconds=True, cache=cache, block_size=7)
+    assert np.array_equal(np.concatenate([chunk.seconds for chunk in chunks]), filtered.seconds)
+    assert 0 < filtered.size < extraction.size
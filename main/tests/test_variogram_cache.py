@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import cache_tools
+import tec_interpolation
+
+
+def test_variograms_are_keyed_on_the_epoch_without_hashing_the_map(monkeypatch, smooth_map):
+    def no_hash(gim_matrix):
+        raise AssertionError('the map was hashed')
+    monkeypatch.setattr(tec_interpolation, 'map_key', no_hash)
+
+    gim_key = ((1, 2, 2010), 40)
+    gim = smooth_map
+    tec_interpolation.tec_kriging(gim, 20.3, 10.2, radius=800, max_points=40, selection='nearest',
+                                  variogram_band=10, gim_key=gim_key)
+    misses = tec_interpolation.variogram_cache.misses
+    tec_interpolation.tec_kriging(gim, 25.3, 12.2, radius=800, max_points=40, selection='nearest',
+                                  variogram_band=10, gim_key=gim_key)
+
+    assert tec_interpolation.variogram_cache.misses == misses
+    assert tec_interpolation.variogram_key(gim_key, 12.2, 10, 75, 800, 40, 'nearest') in tec_interpolation.variogram_cache
+
+
+def test_epoch_keys_follow_the_timeslots():
+    assert tec_interpolation.epoch_keys('10:00:00 01/02/2010') == [((1, 2, 2010), 40)]
+    assert tec_interpolation.epoch_keys('10:07:30 01/02/2010') == [((1, 2, 2010), 40), ((1, 2, 2010), 41)]
+
+
+def test_resizing_keeps_the_bounds_that_are_not_given():
+    cache = cache_tools.LRUCache(max_entries=3, max_bytes=10**6)
+    for i in range(3):
+        cache.put(i, np.zeros(100))
+
+    cache.resize(max_bytes=2 * 800)
+    assert cache.max_entries == 3 and len(cache) == 2 and 0 not in cache
+    cache.resize(max_entries=1)
+    assert cache.max_bytes == 1600 and list(cache._data) == [2]
+    cache.resize(max_entries=None)
+    assert cache.max_entries is None and cache.max_bytes == 1600